@@ -30,7 +30,7 @@ from langchain_neo4j import Neo4jGraph
 #Import Starlette libraries
 from starlette.types import ASGIApp, Receive, Scope, Send
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.responses import HTMLResponse, RedirectResponse,JSONResponse
+from starlette.responses import HTMLResponse, RedirectResponse,JSONResponse,StreamingResponse
 from starlette.requests import Request
 
 #Import Local Libraries
@@ -38,10 +38,12 @@ from src.main import *
 from src.QA_integration import *
 from src.shared.utils import *
 from src.api_response import create_api_response
-from src.graphDB_DataAccess import graphDBdataAccess
+from src.llm import close_llm_clients
+from src.graphDB_DataAccess import graphDBdataAccess, asyncGraphDBdataAccess
 from src.graph_query import get_graph_results,get_chunktext_results
 from src.chunkid_entities import get_entities_from_chunkids
 from src.post_processing import create_vector_fulltext_indexes, create_entity_embedding, graph_schema_consolidation
+from src.diagnosis_index import build_diagnosis_index
 from sse_starlette.sse import EventSourceResponse
 from src.communities import create_communities
 from src.neighbours import get_neighbour_nodes
@@ -49,6 +51,7 @@ from src.logger import CustomLogger
 from src.ragas_eval import *
 from src.entities.source_node import sourceNode
 from src.chat_interaction import *
+from src.batch_qa import parse_batch_questions, get_batch_concurrency, abatch_QA_RAG
 
 logger = CustomLogger()
 CHUNK_DIR = os.path.join(os.path.dirname(__file__), "chunks")
@@ -83,10 +86,12 @@ class CustomGZipMiddleware:
         app: ASGIApp,
         paths: List[str],
         minimum_size: int = 1000,
-        compresslevel: int = 5
+        compresslevel: int = 5,
+        exclude_paths: List[str] = []
     ):
         self.app = app
         self.paths = paths
+        self.exclude_paths = exclude_paths
         self.minimum_size = minimum_size
         self.compresslevel = compresslevel
     
@@ -95,7 +100,8 @@ class CustomGZipMiddleware:
             return await self.app(scope, receive, send)
  
         path = scope["path"]
-        should_compress = any(path.startswith(gzip_path) for gzip_path in self.paths)
+        # Server-sent event streams must not be buffered by the compressor
+        should_compress = any(path.startswith(gzip_path) for gzip_path in self.paths) and not any(path.endswith(excluded) for excluded in self.exclude_paths)
         
         if not should_compress:
             return await self.app(scope, receive, send)
@@ -110,7 +116,7 @@ class CustomGZipMiddleware:
 app = FastAPI()
 app.add_middleware(XContentTypeOptions)
 app.add_middleware(XFrame, Option={'X-Frame-Options': 'DENY'})
-app.add_middleware(CustomGZipMiddleware, minimum_size=1000, compresslevel=5,paths=["/sources_list","/url/scan","/extract","/chat_bot","/chunk_entities","/get_neighbours","/graph_query","/schema","/populate_graph_schema","/get_unconnected_nodes_list","/get_duplicate_nodes","/fetch_chunktext"])
+app.add_middleware(CustomGZipMiddleware, minimum_size=1000, compresslevel=5,paths=["/sources_list","/url/scan","/extract","/chat_bot","/chunk_entities","/get_neighbours","/graph_query","/schema","/populate_graph_schema","/get_unconnected_nodes_list","/get_duplicate_nodes","/fetch_chunktext"],exclude_paths=["/stream","/batch"])
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -120,6 +126,15 @@ app.add_middleware(
 app.add_middleware(SessionMiddleware, secret_key=os.urandom(24))
 app.add_api_route("/health", health([healthy_condition, healthy]))
 
+@app.on_event("shutdown")
+async def close_async_drivers():
+    await ASYNC_SUMMARIZATION_SCHEDULER.join()
+    await CHAT_HISTORY_CACHE.close()
+    if ANN_INDEXES is not None:
+        await ANN_INDEXES.close()
+    await close_async_graph_drivers()
+    await close_llm_clients()
+
 # Serve static files (including favicon.ico)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -391,6 +406,18 @@ async def post_processing(uri=Form(), userName=Form(), password=Form(), database
             await asyncio.to_thread(create_communities, uri, userName, password, database)  
             
             logging.info(f'created communities')
+        elif "update_communities" in tasks:
+            api_name = 'update_communities'
+            await asyncio.to_thread(create_communities, uri, userName, password, database, incremental=True)
+            logging.info(f'updated communities')
+
+        if "build_diagnosis_index" in tasks:
+            api_name = 'post_processing/build_diagnosis_index'
+            await asyncio.to_thread(build_diagnosis_index, graph)
+            logging.info(f'Diagnosis index built')
+        if ANN_INDEXES is not None:
+            ANN_INDEXES.invalidate(uri, database)
+        GRAPH_SCHEMA_CACHE.invalidate(uri, database)
         graph = create_graph_database_connection(uri, userName, password, database)   
         graphDb_data_Access = graphDBdataAccess(graph)
         document_name = ""
@@ -420,14 +447,9 @@ async def chat_bot(uri=Form(),model=Form(None),userName=Form(), password=Form(),
     logging.info(f"QA_RAG called at {datetime.now()}")
     qa_rag_start_time = time.time()
     try:
-        if mode == "graph":
-            graph = Neo4jGraph( url=uri,username=userName,password=password,database=database,sanitize = True, refresh_schema=True)
-        else:
-            graph = create_graph_database_connection(uri, userName, password, database)
-        
-        graph_DB_dataAccess = graphDBdataAccess(graph)
-        write_access = graph_DB_dataAccess.check_account_access(database=database)
-        result = await asyncio.to_thread(QA_RAG,graph=graph,model=model,question=question,document_names=document_names,session_id=session_id,mode=mode,write_access=write_access)
+        driver = await get_async_graph_driver(uri, userName, password)
+        write_access = await asyncGraphDBdataAccess(driver, database).check_account_access()
+        result = await aQA_RAG(driver=driver,uri=uri,userName=userName,password=password,database=database,model=model,question=question,document_names=document_names,session_id=session_id,mode=mode,write_access=write_access)
 
         total_call_time = time.time() - qa_rag_start_time
         logging.info(f"Total Response time is  {total_call_time:.2f} seconds")
@@ -447,6 +469,78 @@ async def chat_bot(uri=Form(),model=Form(None),userName=Form(), password=Form(),
     finally:
         gc.collect()
 
+@app.post("/chat_bot/stream")
+async def chat_bot_stream(uri=Form(),model=Form(None),userName=Form(), password=Form(), database=Form(),question=Form(None), document_names=Form(None),session_id=Form(None),mode=Form(None),email=Form()):
+    """
+    [ENG]: Streaming variant of '/chat_bot'. Sends the answer as server-sent `token` events and finishes with a `metadata` event containing the sources and chat info.
+    [IDN]: Varian streaming dari '/chat_bot'. Mengirim jawaban sebagai server-sent event `token` dan diakhiri dengan event `metadata` yang berisi sources dan info chat.
+    """
+    logging.info(f"QA_RAG_stream called at {datetime.now()}")
+    qa_rag_start_time = time.time()
+    try:
+        driver = await get_async_graph_driver(uri, userName, password)
+        write_access = await asyncGraphDBdataAccess(driver, database).check_account_access()
+    except Exception as e:
+        job_status = "Failed"
+        message="Unable to get chat response"
+        error_message = str(e)
+        logging.exception(f'Exception in chat bot stream:{error_message}')
+        return create_api_response(job_status, message=message, error=error_message,data=mode)
+
+    async def generate():
+        try:
+            async for event in aQA_RAG_stream(driver=driver,uri=uri,userName=userName,password=password,database=database,model=model,question=question,document_names=document_names,session_id=session_id,mode=mode,write_access=write_access):
+                yield event
+        finally:
+            total_call_time = time.time() - qa_rag_start_time
+            logging.info(f"Total Streaming Response time is  {total_call_time:.2f} seconds")
+            json_obj = {'api_name':'chat_bot_stream','db_url':uri, 'userName':userName, 'database':database, 'question':question,'document_names':document_names,
+                             'session_id':session_id, 'mode':mode, 'logging_time': formatted_time(datetime.now(timezone.utc)), 'elapsed_api_time':f'{total_call_time:.2f}','email':email}
+            logger.log_struct(json_obj, "INFO")
+            gc.collect()
+
+    return EventSourceResponse(generate(), ping=15)
+
+@app.post("/chat_bot/batch")
+async def chat_bot_batch(uri=Form(),model=Form(None),userName=Form(), password=Form(), database=Form(),questions=Form(), document_names=Form(None),mode=Form(None),concurrency=Form(None),compute_metrics=Form(None),email=Form()):
+    """
+    [ENG]: Answer a JSON list of questions (strings or objects with `question`, `id`, `mode`, `document_names`) with bounded concurrency.
+    Results are streamed as NDJSON, one `result` line per question as soon as it is answered, and a final `summary` line.
+    With `compute_metrics=true`, each result also holds the '/metric' scores of its answer.
+    [IDN]: Menjawab daftar JSON pertanyaan (string atau objek dengan `question`, `id`, `mode`, `document_names`) dengan konkurensi terbatas.
+    Hasil dikirim sebagai NDJSON, satu baris `result` per pertanyaan segera setelah dijawab, dan satu baris `summary` di akhir.
+    Dengan `compute_metrics=true`, setiap hasil juga berisi skor '/metric' dari jawabannya.
+    """
+    logging.info(f"Batch QA called at {datetime.now()}")
+    batch_start_time = time.time()
+    try:
+        items = parse_batch_questions(questions, mode, document_names)
+        driver = await get_async_graph_driver(uri, userName, password)
+    except Exception as e:
+        job_status = "Failed"
+        message="Unable to start the batch chat"
+        error_message = str(e)
+        logging.exception(f'Exception in chat bot batch:{error_message}')
+        return create_api_response(job_status, message=message, error=error_message)
+
+    async def generate():
+        succeeded = 0
+        try:
+            async for record in abatch_QA_RAG(driver, uri, userName, password, database, model, items, get_batch_concurrency(concurrency), str(compute_metrics).lower() == "true"):
+                succeeded += record["status"] == "Success"
+                yield json.dumps(record, default=str) + "\n"
+            total_call_time = time.time() - batch_start_time
+            yield json.dumps({"type": "summary", "total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded, "elapsed_time": round(total_call_time, 2)}) + "\n"
+        finally:
+            total_call_time = time.time() - batch_start_time
+            logging.info(f"Batch of {len(items)} questions answered in {total_call_time:.2f} seconds")
+            json_obj = {'api_name':'chat_bot_batch','db_url':uri, 'userName':userName, 'database':database, 'questions':len(items),'document_names':document_names,
+                             'mode':mode, 'logging_time': formatted_time(datetime.now(timezone.utc)), 'elapsed_api_time':f'{total_call_time:.2f}','email':email}
+            logger.log_struct(json_obj, "INFO")
+            gc.collect()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @app.post("/chunk_entities")
 async def chunk_entities(uri=Form(),userName=Form(), password=Form(), database=Form(), nodedetails=Form(None),entities=Form(),mode=Form(),email=Form()):
     try:
@@ -523,8 +617,8 @@ async def graph_query(
 async def clear_chat_bot(uri=Form(),userName=Form(), password=Form(), database=Form(), session_id=Form(None),email=Form()):
     try:
         start = time.time()
-        graph = create_graph_database_connection(uri, userName, password, database)
-        result = await asyncio.to_thread(clear_chat_history,graph=graph,session_id=session_id)
+        driver = await get_async_graph_driver(uri, userName, password)
+        result = await aclear_chat_history(driver=driver,database=database,session_id=session_id)
         end = time.time()
         elapsed_time = end - start
         json_obj = {'api_name':'clear_chat_bot', 'db_url':uri, 'userName':userName, 'database':database, 'session_id':session_id, 'logging_time': formatted_time(datetime.now(timezone.utc)), 'elapsed_api_time':f'{elapsed_time:.2f}','email':email}
@@ -22,22 +22,23 @@ from fastapi import FastAPI, File, UploadFile, Form, Request, HTTPException
 from Secweb.XContentTypeOptions import XContentTypeOptions
 from Secweb.XFrameOptions import XFrame
 
-from langchain_neo4j import Neo4jGraph
-
 #Import Starlette libraries
 from starlette.types import ASGIApp, Receive, Scope, Send
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import HTMLResponse
+from sse_starlette.sse import EventSourceResponse
 
 #Import Local Libraries
 from src.main import *
 from src.QA_integration import *
 from src.shared.utils import *
 from src.api_response import create_api_response
-from src.graphDB_DataAccess import graphDBdataAccess
+from src.llm import close_llm_clients
+from src.graphDB_DataAccess import asyncGraphDBdataAccess
 from src.logger import CustomLogger
 from src.ragas_eval import *
 from src.chat_interaction import *
+from src.diagnosis_index import aexplain_candidates
 
 logger = CustomLogger()
 CHUNK_DIR = os.path.join(os.path.dirname(__file__), "chunks")
@@ -72,10 +73,12 @@ class CustomGZipMiddleware:
         app: ASGIApp,
         paths: List[str],
         minimum_size: int = 1000,
-        compresslevel: int = 5
+        compresslevel: int = 5,
+        exclude_paths: List[str] = []
     ):
         self.app = app
         self.paths = paths
+        self.exclude_paths = exclude_paths
         self.minimum_size = minimum_size
         self.compresslevel = compresslevel
     
@@ -84,7 +87,8 @@ class CustomGZipMiddleware:
             return await self.app(scope, receive, send)
  
         path = scope["path"]
-        should_compress = any(path.startswith(gzip_path) for gzip_path in self.paths)
+        # Server-sent event streams must not be buffered by the compressor
+        should_compress = any(path.startswith(gzip_path) for gzip_path in self.paths) and not any(path.endswith(excluded) for excluded in self.exclude_paths)
         
         if not should_compress:
             return await self.app(scope, receive, send)
@@ -99,7 +103,7 @@ class CustomGZipMiddleware:
 app = FastAPI()
 app.add_middleware(XContentTypeOptions)
 app.add_middleware(XFrame, Option={'X-Frame-Options': 'DENY'})
-app.add_middleware(CustomGZipMiddleware, minimum_size=1000, compresslevel=5,paths=["/sources_list","/url/scan","/extract","/chat_bot","/chunk_entities","/get_neighbours","/graph_query","/schema","/populate_graph_schema","/get_unconnected_nodes_list","/get_duplicate_nodes","/fetch_chunktext"])
+app.add_middleware(CustomGZipMiddleware, minimum_size=1000, compresslevel=5,paths=["/sources_list","/url/scan","/extract","/chat_bot","/chunk_entities","/get_neighbours","/graph_query","/schema","/populate_graph_schema","/get_unconnected_nodes_list","/get_duplicate_nodes","/fetch_chunktext"],exclude_paths=["/stream"])
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -109,6 +113,13 @@ app.add_middleware(
 app.add_middleware(SessionMiddleware, secret_key=os.urandom(24))
 app.add_api_route("/health", health([healthy_condition, healthy]))
 
+@app.on_event("shutdown")
+async def close_async_drivers():
+    await ASYNC_SUMMARIZATION_SCHEDULER.join()
+    await CHAT_HISTORY_CACHE.close()
+    await close_async_graph_drivers()
+    await close_llm_clients()
+
 # Serve static files (including favicon.ico)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -137,19 +148,25 @@ async def read_root():
     </html>
     """
 
+def get_diagnosis_question(session_id):
+    question = get_symptom_question(session_id)
+    if question is None:
+        raise Exception(f"No question given and no symptoms collected for session '{session_id}'")
+    return question
+
 @app.post("/chat_bot/diagnose")
-async def chat_bot(uri=Form(),model=Form(None),userName=Form(), password=Form(), database=Form(),question=Form(None), document_names=Form(None),session_id=Form(None),mode=Form(None),email=Form()):
+async def chat_bot(uri=Form(),model=Form(None),userName=Form(), password=Form(), database=Form(),question=Form(None), document_names=Form(None),session_id=Form(None),mode=Form(None),email=Form(),symptom_session_id=Form(None)):
+    """
+    [ENG]: Diagnose with the RAG chat. Without a question, the question is built from the symptoms collected in the consultation `symptom_session_id` (defaults to `session_id`).
+    [IDN]: Diagnosis dengan chat RAG. Tanpa pertanyaan, pertanyaan dibangun dari gejala yang terkumpul pada konsultasi `symptom_session_id` (default `session_id`).
+    """
     logging.info(f"QA_RAG called at {datetime.now()}")
     qa_rag_start_time = time.time()
     try:
-        if mode == "graph":
-            graph = Neo4jGraph( url=uri,username=userName,password=password,database=database,sanitize = True, refresh_schema=True)
-        else:
-            graph = create_graph_database_connection(uri, userName, password, database)
-        
-        graph_DB_dataAccess = graphDBdataAccess(graph)
-        write_access = graph_DB_dataAccess.check_account_access(database=database)
-        result = await asyncio.to_thread(QA_RAG,graph=graph,model=model,question=question,document_names=document_names,session_id=session_id,mode=mode,write_access=write_access)
+        question = question or await asyncio.to_thread(get_diagnosis_question, symptom_session_id or session_id)
+        driver = await get_async_graph_driver(uri, userName, password)
+        write_access = await asyncGraphDBdataAccess(driver, database).check_account_access()
+        result = await aQA_RAG(driver=driver,uri=uri,userName=userName,password=password,database=database,model=model,question=question,document_names=document_names,session_id=session_id,mode=mode,write_access=write_access)
 
         total_call_time = time.time() - qa_rag_start_time
         logging.info(f"Total Response time is  {total_call_time:.2f} seconds")
@@ -170,12 +187,90 @@ async def chat_bot(uri=Form(),model=Form(None),userName=Form(), password=Form(),
         gc.collect()
 
 
+@app.post("/chat_bot/diagnose/stream")
+async def chat_bot_diagnose_stream(uri=Form(),model=Form(None),userName=Form(), password=Form(), database=Form(),question=Form(None), document_names=Form(None),session_id=Form(None),mode=Form(None),email=Form(),symptom_session_id=Form(None)):
+    logging.info(f"QA_RAG_stream called at {datetime.now()}")
+    qa_rag_start_time = time.time()
+    try:
+        question = question or await asyncio.to_thread(get_diagnosis_question, symptom_session_id or session_id)
+        driver = await get_async_graph_driver(uri, userName, password)
+        write_access = await asyncGraphDBdataAccess(driver, database).check_account_access()
+    except Exception as e:
+        job_status = "Failed"
+        message="Unable to get chat response"
+        error_message = str(e)
+        logging.exception(f'Exception in chat bot stream:{error_message}')
+        return create_api_response(job_status, message=message, error=error_message,data=mode)
+
+    async def generate():
+        try:
+            async for event in aQA_RAG_stream(driver=driver,uri=uri,userName=userName,password=password,database=database,model=model,question=question,document_names=document_names,session_id=session_id,mode=mode,write_access=write_access):
+                yield event
+        finally:
+            total_call_time = time.time() - qa_rag_start_time
+            logging.info(f"Total Streaming Response time is  {total_call_time:.2f} seconds")
+            json_obj = {'api_name':'chat_bot_stream','db_url':uri, 'userName':userName, 'database':database, 'question':question,'document_names':document_names,
+                             'session_id':session_id, 'mode':mode, 'logging_time': formatted_time(datetime.now(timezone.utc)), 'elapsed_api_time':f'{total_call_time:.2f}','email':email}
+            logger.log_struct(json_obj, "INFO")
+            gc.collect()
+
+    return EventSourceResponse(generate(), ping=15)
+
+@app.post("/chat_bot/diagnose/candidates")
+async def chat_bot_diagnose_candidates(uri=Form(),userName=Form(), password=Form(), database=Form(),symptoms=Form(None),negated=Form(None),session_id=Form(None),top_k=Form(None),explain: bool = Form(False),model=Form(None),email=Form()):
+    """
+    [ENG]: Rank candidate diseases for a symptom set with the symptom to disease index (post-processing task `build_diagnosis_index`).
+    `symptoms` and `negated` are JSON lists, without them the symptom state of `session_id` is used. With `explain` the LLM explains the candidates from their subgraphs.
+    [IDN]: Mengurutkan kandidat penyakit untuk sekumpulan gejala dengan index gejala ke penyakit (task post-processing `build_diagnosis_index`).
+    `symptoms` dan `negated` berupa list JSON, tanpa keduanya state gejala dari `session_id` yang digunakan. Dengan `explain` LLM menjelaskan kandidat dari subgraph-nya.
+    """
+    start = time.time()
+    try:
+        if symptoms:
+            symptoms = json.loads(symptoms)
+            negated = json.loads(negated) if negated else []
+        elif session_id:
+            state = await asyncio.to_thread(get_symptom_state, session_id)
+            symptoms, negated = state["symptoms"], state["negated"]
+        else:
+            raise ValueError("Either symptoms or session_id is required")
+        if not symptoms:
+            raise ValueError("No symptoms to rank the diseases with")
+
+        driver = await get_async_graph_driver(uri, userName, password)
+        index = await DIAGNOSIS_INDEXES.aget(driver, database)
+        if index is None:
+            raise Exception("The diagnosis index is not built yet, run the post-processing task 'build_diagnosis_index'")
+        top_k = max(1, min(int(top_k), DIAGNOSIS_MAX_TOP_K)) if top_k else DIAGNOSIS_DEFAULT_TOP_K
+        result = index.rank(symptoms, negated, top_k)
+        result["ranking_time"] = round(time.time() - start, 4)
+
+        if explain and not model:
+            raise ValueError("A model is required to explain the candidates")
+        if explain and result["candidates"]:
+            result.update(await aexplain_candidates(driver, database, model, symptoms, negated, result["candidates"]))
+
+        elapsed_time = time.time() - start
+        json_obj = {'api_name':'chat_bot_diagnose_candidates','db_url':uri, 'userName':userName, 'database':database, 'session_id':session_id, 'explain':explain,
+                             'logging_time': formatted_time(datetime.now(timezone.utc)), 'elapsed_api_time':f'{elapsed_time:.2f}','email':email}
+        logger.log_struct(json_obj, "INFO")
+        return create_api_response('Success',data=result)
+    except Exception as e:
+        job_status = "Failed"
+        message="Unable to rank the candidate diseases"
+        error_message = str(e)
+        logging.exception(f'Exception in diagnose candidates:{error_message}')
+        return create_api_response(job_status, message=message, error=error_message)
+    finally:
+        gc.collect()
+
 @app.post("/clear_chat_bot")
 async def clear_chat_bot(uri=Form(),userName=Form(), password=Form(), database=Form(), session_id=Form(None),email=Form()):
     try:
         start = time.time()
-        graph = create_graph_database_connection(uri, userName, password, database)
-        result = await asyncio.to_thread(clear_chat_history,graph=graph,session_id=session_id)
+        driver = await get_async_graph_driver(uri, userName, password)
+        result = await aclear_chat_history(driver=driver,database=database,session_id=session_id)
+        await asyncio.to_thread(clear_symptom_state, session_id)
         end = time.time()
         elapsed_time = end - start
         json_obj = {'api_name':'clear_chat_bot', 'db_url':uri, 'userName':userName, 'database':database, 'session_id':session_id, 'logging_time': formatted_time(datetime.now(timezone.utc)), 'elapsed_api_time':f'{elapsed_time:.2f}','email':email}
@@ -203,8 +298,7 @@ async def chat_bot(
     start_time = time.time()
     try:
         context_dict = json.loads(context) if context else None
-        result = await asyncio.to_thread(
-            chat_interaction,
+        result = await achat_interaction(
             model=model,
             human_messages=human_messages,
             session_id=session_id,
@@ -225,10 +319,66 @@ async def chat_bot(
         gc.collect()
 
 
+@app.post("/chat_bot/interact/stream")
+async def chat_bot_interact_stream(
+    model: str = Form(),
+    human_messages: str = Form(),
+    session_id: str = Form(),
+    context: Optional[str] = Form(None),
+    diagnosis: bool = Form(False),
+    disease_context: Optional[str] = Form(None)
+):
+    """
+    [ENG]: Streaming variant of '/chat_bot/interact'. The doctor reply is sent as server-sent `token` events, the symptoms and chat info arrive in the final `metadata` event.
+    [IDN]: Varian streaming dari '/chat_bot/interact'. Balasan dokter dikirim sebagai server-sent event `token`, gejala dan info chat dikirim pada event `metadata` terakhir.
+    """
+    logging.info(f"Chat interaction stream called at {datetime.now()}")
+    try:
+        context_dict = json.loads(context) if context else None
+    except Exception as e:
+        job_status = "Failed"
+        message="Unable to parse the patient context"
+        error_message = str(e)
+        logging.exception(f'Exception in chat bot stream:{error_message}')
+        return create_api_response(job_status, message=message, error=error_message)
+
+    return EventSourceResponse(
+        achat_interaction_stream(
+            model=model,
+            human_messages=human_messages,
+            session_id=session_id,
+            context=context_dict,
+            diagnosis=diagnosis,
+            disease_context=disease_context
+        ),
+        ping=15
+    )
+
+
 @app.post("/check-symptoms")
 def check_symptoms(human_messages=Form(), model= Form(), session_id=Form()):
-    result = check_if_chat_is_symptoms(human_messages, model, session_id)
-    return {"is_symptoms": result}
+    result = classify_chat_symptoms(human_messages, model, session_id)
+    return {"is_symptoms": result["is_symptoms"], "tier": result["tier"], "confidence": result["confidence"]}
+
+
+@app.post("/chat_bot/symptoms")
+async def chat_bot_symptoms(session_id=Form()):
+    """
+    [ENG]: Symptoms collected so far in a consultation session (deduplicated, normalized, with the denied symptoms) and the diagnosis question built from them.
+    [IDN]: Gejala yang terkumpul sejauh ini pada sesi konsultasi (tanpa duplikat, ternormalisasi, beserta gejala yang disangkal) dan pertanyaan diagnosis yang dibangun darinya.
+    """
+    try:
+        result = await asyncio.to_thread(get_symptom_state, session_id)
+        result["question"] = build_symptom_question(result["symptoms"], result["negated"])
+        return create_api_response('Success',data=result)
+    except Exception as e:
+        job_status = "Failed"
+        message="Unable to get the symptom state"
+        error_message = str(e)
+        logging.exception(f'Exception in chat bot symptoms:{error_message}')
+        return create_api_response(job_status, message=message, error=error_message)
+    finally:
+        gc.collect()
 
 
 @app.post("/init_chat")
@@ -89,7 +89,7 @@ def test_graph_from_file_local(model_name):
 
 def test_chatbot_qna(model_name, mode='vector'):
    """Test chatbot QnA functionality for different modes."""
-   QA_n_RAG = QA_RAG(graph, model_name, 'Anda seorang dokter. Anda bertugas untuk diagnosis penyakit berdasarkan gejala pasien. Jelaskan penyakit tersebut dalam bahasa indonesia. Gejala yang dirasakan pasien: { sesak napas, nyeri dada, menggigil, batuk, detak jantung cepat, kelelahan, demam tinggi, tidak enak badan}', '[]', 1, mode)
+   QA_n_RAG = QA_RAG(URI, USERNAME, PASSWORD, DATABASE, model_name, 'Anda seorang dokter. Anda bertugas untuk diagnosis penyakit berdasarkan gejala pasien. Jelaskan penyakit tersebut dalam bahasa indonesia. Gejala yang dirasakan pasien: { sesak napas, nyeri dada, menggigil, batuk, detak jantung cepat, kelelahan, demam tinggi, tidak enak badan}', '[]', 1, mode)
    print(QA_n_RAG)
    print(len(QA_n_RAG['message']))
 
@@ -1,16 +1,16 @@
 import os
 import json
 import time
+import asyncio
 import logging
 
-import threading
 from datetime import datetime
 from typing import Any
 from dotenv import load_dotenv
 
+from langchain_neo4j import Neo4jGraph
 from langchain_neo4j import Neo4jVector
-from langchain_neo4j import Neo4jChatMessageHistory
-from langchain_neo4j import GraphCypherQAChain
+from langchain_neo4j.vectorstores.neo4j_vector import IndexType
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableBranch
@@ -19,7 +19,6 @@ from langchain_community.document_transformers import EmbeddingsRedundantFilter
 from langchain.retrievers.document_compressors import EmbeddingsFilter, DocumentCompressorPipeline
 from langchain_text_splitters import TokenTextSplitter
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_community.chat_message_histories import ChatMessageHistory 
 from langchain_core.callbacks import BaseCallbackHandler
 
 # LangChain chat models
@@ -27,8 +26,15 @@ from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 
 # Local imports
-from src.llm import get_llm
-from src.shared.utils import load_embedding_model
+from src.llm import get_llm, close_llm_clients
+from src.chat_history import WriteBehindChatHistoryCache
+from src.session_store import create_session_store
+from src.chat_summarizer import AsyncSummarizationScheduler
+from src.async_retriever import AsyncNeo4jVectorRetriever, reciprocal_rank_fusion
+from src.ann_index import create_ann_index_registry
+from src.context_packer import ContextPacker
+from src.graph_chain_cache import GraphSchemaCache, CypherCache, CachedGraphCypherQAChain, get_schema_version
+from src.shared.utils import load_embedding_model, create_graph_database_connection, close_db_connection, get_async_graph_driver, close_async_graph_drivers
 from src.shared.constants import *
 load_dotenv() 
 
@@ -36,17 +42,13 @@ EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL')
 EMBEDDING_FUNCTION , _ = load_embedding_model(EMBEDDING_MODEL) 
 
 class SessionChatHistory:
-    history_dict = {}
+    # CHAT_SESSION_STORE=sqlite keeps the local sessions in CHAT_SESSION_STORE_PATH so they are shared by all workers.
+    store = create_session_store(os.getenv('CHAT_SESSION_STORE', 'memory'), os.getenv('CHAT_SESSION_STORE_PATH', 'chat_sessions.db'))
 
     @classmethod
     def get_chat_history(cls, session_id):
         """Retrieve or create chat message history for a given session ID."""
-        if session_id not in cls.history_dict:
-            logging.info(f"Creating new ChatMessageHistory Local for session ID: {session_id}")
-            cls.history_dict[session_id] = ChatMessageHistory()
-        else:
-            logging.info(f"Retrieved existing ChatMessageHistory Local for session ID: {session_id}")
-        return cls.history_dict[session_id]
+        return cls.store.get_history(session_id)
     
 class CustomCallback(BaseCallbackHandler):
 
@@ -70,6 +72,8 @@ def get_total_tokens(ai_response, llm):
     try:
         if isinstance(llm, (ChatOpenAI, ChatGroq)):
             total_tokens = ai_response.response_metadata.get('token_usage', {}).get('total_tokens', 0)
+            if not total_tokens and getattr(ai_response, "usage_metadata", None):
+                total_tokens = ai_response.usage_metadata.get('total_tokens', 0)
         
         else:
             logging.warning(f"Unrecognized language model: {type(llm)}. Returning 0 tokens.")
@@ -81,32 +85,6 @@ def get_total_tokens(ai_response, llm):
 
     return total_tokens
 
-def clear_chat_history(graph, session_id,local=False):
-    try:
-        if not local:
-            history = Neo4jChatMessageHistory(
-                graph=graph,
-                session_id=session_id
-            )
-        else:
-            history = get_history_by_session_id(session_id)
-        
-        history.clear()
-
-        return {
-            "session_id": session_id, 
-            "message": "The chat history has been cleared.", 
-            "user": "chatbot"
-        }
-    
-    except Exception as e:
-        logging.error(f"Error clearing chat history for session {session_id}: {e}")
-        return {
-            "session_id": session_id, 
-            "message": "Failed to clear chat history.", 
-            "user": "chatbot"
-        }
-
 def get_sources_and_chunks(sources_used, docs):
     chunkdetails_list = []
     sources_used_set = set(sources_used)
@@ -158,15 +136,28 @@ def get_rag_chain(llm, system_template = CHAT_SYSTEM_TEMPLATE):
         logging.error(f"Error creating RAG chain: {e}")
         raise
 
-def format_documents(documents, model):
-    prompt_token_cutoff = 4
-    for model_names, value in CHAT_TOKEN_CUT_OFF.items():
-        if model in model_names:
-            prompt_token_cutoff = value
-            break
+def get_document_score(doc):
+    # Documents from the compression retriever carry their query similarity, fused documents carry their fusion score.
+    if hasattr(doc, "state"):
+        return doc.state.get("query_similarity_score", 0)
+    return doc.metadata.get("fusion_score", 0)
+
+def format_document(doc, content):
+    source = doc.metadata.get('source', "unknown")
+    return (
+        "Document start\n"
+        f"This Document belongs to the source {source}\n"
+        f"Content: {content}\n"
+        "Document end\n"
+    )
 
-    sorted_documents = sorted(documents, key = lambda doc: doc.state.get("query_similarity_score", 0), reverse = True)
-    sorted_documents = sorted_documents[:prompt_token_cutoff]
+def format_documents(documents, model):
+    """[ENG]: Format the retrieved documents as the prompt context. The documents are packed into the token budget of the model 
+    by `ContextPacker`, best scored documents first.
+    [IDN]: Memformat dokumen yang diambil sebagai konteks prompt. Dokumen disusun ke dalam batas token model 
+    oleh `ContextPacker`, dimulai dari dokumen dengan skor terbaik."""
+    sorted_documents = sorted(documents, key = get_document_score, reverse = True)
+    packed_documents = ContextPacker(model).pack(sorted_documents, format_document)
 
     formatted_docs = list()
     sources = set()
@@ -174,7 +165,7 @@ def format_documents(documents, model):
     global_communities = list()
 
 
-    for doc in sorted_documents:
+    for doc, content in packed_documents:
         try:
             source = doc.metadata.get('source', "unknown")
             sources.add(source)
@@ -182,81 +173,59 @@ def format_documents(documents, model):
             entities = doc.metadata['entities'] if 'entities'in doc.metadata.keys() else entities
             global_communities = doc.metadata["communitydetails"] if 'communitydetails' in doc.metadata.keys() else global_communities
 
-            formatted_doc = (
-                "Document start\n"
-                f"This Document belongs to the source {source}\n"
-                f"Content: {doc.page_content}\n"
-                "Document end\n"
-            )
-            formatted_docs.append(formatted_doc)
+            formatted_docs.append(format_document(doc, content))
         
         except Exception as e:
             logging.error(f"Error formatting document: {e}")
     
     return "\n\n".join(formatted_docs), sources, entities, global_communities
 
-def process_documents(docs, question, messages, llm, model,chat_mode_settings):
-    start_time = time.time() 
-    try:
-        formatted_docs, sources, entitydetails, communities = format_documents(docs, model)
-        
-        rag_chain = get_rag_chain(llm = llm)
-        
-        ai_response = rag_chain.invoke({
-            "messages": messages[:-1],
-            "context": formatted_docs,
-            "input": question
-        })
+def get_node_details(docs, sources, entitydetails, communities, chat_mode_settings):
+    """[ENG]: Build the sources, node details and entities of a chat response from the retrieved documents.
+    [IDN]: Membangun sources, node details, dan entities dari respons chat berdasarkan dokumen yang diambil."""
+    result = {'sources': list(), 'nodedetails': dict(), 'entities': dict()}
+    node_details = {"chunkdetails":list(),"entitydetails":list(),"communitydetails":list()}
+    entities = {'entityids':list(),"relationshipids":list()}
 
-        result = {'sources': list(), 'nodedetails': dict(), 'entities': dict()}
-        node_details = {"chunkdetails":list(),"entitydetails":list(),"communitydetails":list()}
-        entities = {'entityids':list(),"relationshipids":list()}
+    if chat_mode_settings["mode"] == CHAT_FUSION_MODE:
+        return get_fusion_node_details(docs, sources)
 
-        if chat_mode_settings["mode"] == CHAT_ENTITY_VECTOR_MODE:
-            node_details["entitydetails"] = entitydetails
+    if chat_mode_settings["mode"] == CHAT_ENTITY_VECTOR_MODE:
+        node_details["entitydetails"] = entitydetails
 
-        elif chat_mode_settings["mode"] == CHAT_GLOBAL_VECTOR_FULLTEXT_MODE:
-            node_details["communitydetails"] = communities
-        else:
-            sources_and_chunks = get_sources_and_chunks(sources, docs)
-            result['sources'] = sources_and_chunks['sources']
-            node_details["chunkdetails"] = sources_and_chunks["chunkdetails"]
-            entities.update(entitydetails)
+    elif chat_mode_settings["mode"] == CHAT_GLOBAL_VECTOR_FULLTEXT_MODE:
+        node_details["communitydetails"] = communities
+    else:
+        sources_and_chunks = get_sources_and_chunks(sources, docs)
+        result['sources'] = sources_and_chunks['sources']
+        node_details["chunkdetails"] = sources_and_chunks["chunkdetails"]
+        entities.update(entitydetails)
 
-        result["nodedetails"] = node_details
-        result["entities"] = entities
+    result["nodedetails"] = node_details
+    result["entities"] = entities
+    return result
 
-        content = ai_response.content
-        total_tokens = get_total_tokens(ai_response, llm)
-        
-        predict_time = time.time() - start_time
-        logging.info(f"Final response predicted in {predict_time:.2f} seconds")
+def get_fusion_node_details(docs, sources):
+    """[ENG]: `get_node_details` for the fusion mode, each document contributes the details of the retriever (mode) that found it.
+    [IDN]: `get_node_details` untuk mode fusion, setiap dokumen memberikan detail sesuai retriever (mode) yang menemukannya."""
+    node_details = {"chunkdetails":list(),"entitydetails":list(),"communitydetails":list()}
+    entities = {'entityids':list(),"relationshipids":list()}
+    chunk_docs = list()
 
-    except Exception as e:
-        logging.error(f"Error processing documents: {e}")
-        raise
-    
-    return content, result, total_tokens, formatted_docs
-
-def retrieve_documents(doc_retriever, messages):
-    start_time = time.time()
+    for doc in docs:
+        retriever = doc.metadata.get("retriever")
+        if retriever == CHAT_ENTITY_VECTOR_MODE:
+            node_details["entitydetails"] = doc.metadata.get("entities", list())
+        elif retriever == CHAT_GLOBAL_VECTOR_FULLTEXT_MODE:
+            node_details["communitydetails"] = doc.metadata.get("communitydetails", list())
+        else:
+            chunk_docs.append(doc)
+            for key, ids in doc.metadata.get("entities", {}).items():
+                entities.setdefault(key, list()).extend(id for id in ids if id not in entities[key])
 
-    try:
-        handler = CustomCallback()
-        docs = doc_retriever.invoke({"messages": messages},{"callbacks":[handler]})
-        transformed_question = handler.transformed_question
-        if transformed_question:
-            logging.info(f"Transformed question : {transformed_question}")
-        doc_retrieval_time = time.time() - start_time
-        logging.info(f"Documents retrieved in {doc_retrieval_time:.2f} seconds")
-        
-    except Exception as e:
-        error_message = f"Error retrieving documents: {str(e)}"
-        logging.error(error_message)
-        docs = None
-        transformed_question = None
-    
-    return docs, transformed_question
+    sources_and_chunks = get_sources_and_chunks([source for source in sources if source != "unknown"], chunk_docs)
+    node_details["chunkdetails"] = sources_and_chunks["chunkdetails"]
+    return {'sources': sources_and_chunks['sources'], 'nodedetails': node_details, 'entities': entities}
 
 def create_document_retriever_chain(llm, retriever):
     """[ENG]: Create a document retriever chain that transforms the user's question before passing it to the retriever.
@@ -345,122 +314,284 @@ def initialize_neo4j_vector(graph, chat_mode_settings):
         raise
     return neo_db
 
-def create_retriever(neo_db, document_names, chat_mode_settings,search_k, score_threshold,ef_ratio):
-    if document_names and chat_mode_settings["document_filter"]:
-        retriever = neo_db.as_retriever(
-            search_type="similarity_score_threshold",
-            search_kwargs={
-                'k': search_k,
-                'effective_search_ratio': ef_ratio,
-                'score_threshold': score_threshold,
-                'filter': {'fileName': {'$in': document_names}}
-            }
-        )
-        logging.info(f"Successfully created retriever with search_k={search_k}, score_threshold={score_threshold} for documents {document_names}")
-    else:
-        retriever = neo_db.as_retriever(
-            search_type="similarity_score_threshold",
-            search_kwargs={'k': search_k,'effective_search_ratio': ef_ratio, 'score_threshold': score_threshold}
+def get_effective_search_ratio():
+    return int(os.getenv("EFFECTIVE_SEARCH_RATIO", "2")) if os.getenv("EFFECTIVE_SEARCH_RATIO", "2").isdigit() else 2
+
+def build_chat_response(content, result, total_tokens, formatted_docs, question, model_version, chat_mode_settings):
+    metric_details = {"question":question,"contexts":formatted_docs,"answer":content}
+    return {
+        "session_id": "",
+        "message": content,
+        "info": {
+            "sources": result["sources"],
+            "model": model_version,
+            "nodedetails": result["nodedetails"],
+            "total_tokens": total_tokens,
+            "response_time": 0,
+            "mode": chat_mode_settings["mode"],
+            "entities": result["entities"],
+            "metric_details": metric_details,
+        },
+        "user": "chatbot"
+    }
+
+def format_chat_event(event, data):
+    """[ENG]: Format a server-sent event for the streaming chat endpoints.
+    [IDN]: Memformat server-sent event untuk endpoint chat streaming."""
+    return {"event": event, "data": json.dumps(data, default=str)}
+
+GRAPH_SCHEMA_CACHE = GraphSchemaCache()
+CYPHER_CACHE = CypherCache()
+
+def create_graph_chain(model, graph, schema_version=None):
+    """[ENG]: Create the graph chat chain. One LLM client generates the Cypher and answers, and the Cypher of questions 
+    already answered on the same schema version is reused from `CYPHER_CACHE`.
+    [IDN]: Membuat chain chat graph. Satu klien LLM membuat Cypher dan menjawab, dan Cypher dari pertanyaan 
+    yang sudah pernah dijawab pada versi skema yang sama dipakai ulang dari `CYPHER_CACHE`."""
+    try:
+        logging.info(f"Graph QA Chain using LLM model: {model}")
+
+        llm,model_name = get_llm(model)
+        graph_chain = CachedGraphCypherQAChain.from_llm(
+            cypher_llm=llm,
+            qa_llm=llm,
+            validate_cypher= True,
+            graph=graph,
+            # verbose=True, 
+            allow_dangerous_requests=True,
+            return_intermediate_steps = True,
+            top_k=3,
+            exclude_types=[DIAGNOSIS_INDEX_LABEL],
+            cypher_cache=CYPHER_CACHE,
+            schema_version=schema_version or get_schema_version(graph.get_schema)
         )
-        logging.info(f"Successfully created retriever with search_k={search_k}, score_threshold={score_threshold}")
-    return retriever
 
-def get_neo4j_retriever(graph, document_names,chat_mode_settings, score_threshold=CHAT_SEARCH_KWARG_SCORE_THRESHOLD):
+        logging.info("GraphCypherQAChain instance created successfully.")
+        return graph_chain, llm, model_name
+
+    except Exception as e:
+        logging.error(f"An error occurred while creating the GraphCypherQAChain instance. : {e}") 
+        raise
+
+def get_chat_mode_settings(mode, settings_map=CHAT_MODE_CONFIG_MAP):
+    default_settings = settings_map[CHAT_DEFAULT_MODE]
+    try:
+        # Copy the settings, the shared map must not be mutated by concurrent requests.
+        chat_mode_settings = dict(settings_map.get(mode, default_settings))
+        chat_mode_settings["mode"] = mode
+        
+        logging.info(f"Chat mode settings: {chat_mode_settings}")
+    
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}", exc_info=True)
+        raise
+
+    return chat_mode_settings
+    
+def get_document_filter_warning(chat_mode_settings):
+    return {
+        "session_id": "",  
+        "message": "Please deselect all documents in the table before using this chat mode",
+        "info": {
+            "sources": [],
+            "model": "",
+            "nodedetails": [],
+            "total_tokens": 0,
+            "response_time": 0,
+            "mode": chat_mode_settings["mode"],
+            "entities": [],
+            "metric_details": [],
+        },
+        "user": "chatbot"
+    }
+
+# Chat path. The functions below await the LLM, the embeddings, the vector search and the chat history,
+# so a waiting request does not hold a worker thread. `QA_RAG` is a blocking wrapper for scripts.
+VECTOR_STORE_CACHE = {}
+CHAT_HISTORY_CACHE = WriteBehindChatHistoryCache()
+ANN_INDEXES = create_ann_index_registry(os.environ.get("CHAT_ANN_INDEX_DIR"))
+
+async def create_async_chat_message_history(driver, database, session_id, write_access=True):
+    """
+    [ENG]: Create the chat history of a session. The Neo4j history uses the shared async driver 
+    and is served from the write-behind cache, without write access the local session history is used (opened in a worker thread, it may be SQLite).
+    [IDN]: Membuat riwayat chat dari sebuah sesi. Riwayat Neo4j menggunakan driver async bersama 
+    dan dilayani dari cache write-behind, tanpa akses tulis riwayat sesi lokal yang digunakan (dibuka di thread worker, dapat berupa SQLite).
+    """
     try:
+        if write_access:
+            return CHAT_HISTORY_CACHE.get_history(session_id, driver, database)
+        return await asyncio.to_thread(get_history_by_session_id, session_id)
 
-        neo_db = initialize_neo4j_vector(graph, chat_mode_settings)
-        # document_names= list(map(str.strip, json.loads(document_names)))
-        search_k = chat_mode_settings["top_k"]
-        ef_ratio = int(os.getenv("EFFECTIVE_SEARCH_RATIO", "2")) if os.getenv("EFFECTIVE_SEARCH_RATIO", "2").isdigit() else 2
-        retriever = create_retriever(neo_db, document_names,chat_mode_settings, search_k, score_threshold,ef_ratio)
-        return retriever
+    except Exception as e:
+        logging.error(f"Error creating cached chat history: {e}")
+        raise
+
+async def aclear_chat_history(driver, database, session_id):
+    try:
+        history = CHAT_HISTORY_CACHE.get_history(session_id, driver, database)
+        await history.aclear()
+        await CHAT_HISTORY_CACHE.flush()
+
+        return {
+            "session_id": session_id, 
+            "message": "The chat history has been cleared.", 
+            "user": "chatbot"
+        }
+
+    except Exception as e:
+        logging.error(f"Error clearing chat history for session {session_id}: {e}")
+        return {
+            "session_id": session_id, 
+            "message": "Failed to clear chat history.", 
+            "user": "chatbot"
+        }
+
+async def aget_vector_store(uri, userName, password, database, chat_mode_settings):
+    """
+    [ENG]: Return the `Neo4jVector` holding the index settings of a chat mode. It is resolved once per database 
+    (in a worker thread, because `Neo4jVector` only has a sync driver) and cached, the searches themselves run on the async driver.
+    [IDN]: Mengembalikan `Neo4jVector` yang berisi pengaturan index dari suatu mode chat. Objek ini dibuat sekali per database 
+    (di worker thread, karena `Neo4jVector` hanya memiliki driver sync) lalu disimpan, pencariannya sendiri berjalan pada driver async.
+    """
+    key = (uri, userName, database, chat_mode_settings.get("index_name"), chat_mode_settings.get("keyword_index", ""), chat_mode_settings.get("retrieval_query"))
+    neo_db = VECTOR_STORE_CACHE.get(key)
+    if neo_db is None:
+        def load_vector_store():
+            graph = create_graph_database_connection(uri, userName, password, database)
+            try:
+                return initialize_neo4j_vector(graph, chat_mode_settings)
+            finally:
+                close_db_connection(graph, "chat_bot")
+
+        neo_db = await asyncio.to_thread(load_vector_store)
+        VECTOR_STORE_CACHE[key] = neo_db
+    return neo_db
+
+async def aget_neo4j_retriever(driver, uri, userName, password, database, document_names, chat_mode_settings, score_threshold=CHAT_SEARCH_KWARG_SCORE_THRESHOLD):
+    try:
+        neo_db = await aget_vector_store(uri, userName, password, database, chat_mode_settings)
+        search_kwargs = {
+            'k': chat_mode_settings["top_k"],
+            'effective_search_ratio': get_effective_search_ratio(),
+            'score_threshold': score_threshold
+        }
+        if document_names and chat_mode_settings["document_filter"]:
+            search_kwargs['filter'] = {'fileName': {'$in': document_names}}
+        ann_index = None
+        if ANN_INDEXES is not None and 'filter' not in search_kwargs and neo_db._index_type == IndexType.NODE:
+            ann_index = await ANN_INDEXES.get(driver, uri, database, neo_db)
+        return AsyncNeo4jVectorRetriever(
+            neo_db=neo_db, driver=driver, database=database, search_kwargs=search_kwargs,
+            ann_index=ann_index, ann_nprobe=ANN_INDEXES.nprobe if ANN_INDEXES is not None else None
+        )
     except Exception as e:
         index_name = chat_mode_settings.get("index_name")
         logging.error(f"Error retrieving Neo4jVector index  {index_name} or creating retriever: {e}")
-        raise Exception(f"An error occurred while retrieving the Neo4jVector index or creating the retriever. Please drop and create a new vector index '{index_name}': {e}") from e 
+        raise Exception(f"An error occurred while retrieving the Neo4jVector index or creating the retriever. Please drop and create a new vector index '{index_name}': {e}") from e
 
-def setup_chat(model, graph, document_names, chat_mode_settings):
+async def asetup_chat(model, driver, uri, userName, password, database, document_names, chat_mode_settings):
     start_time = time.time()
     try:
         if model == "diffbot":
             model = os.getenv('DEFAULT_DIFFBOT_CHAT_MODEL')
-        
+
         llm, model_name = get_llm(model=model)
         logging.info(f"Model called in chat: {model} (version: {model_name})")
 
-        retriever = get_neo4j_retriever(graph=graph, chat_mode_settings=chat_mode_settings, document_names=document_names)
+        retriever = await aget_neo4j_retriever(driver, uri, userName, password, database, document_names, chat_mode_settings)
         doc_retriever = create_document_retriever_chain(llm, retriever)
-        
+
         chat_setup_time = time.time() - start_time
         logging.info(f"Chat setup completed in {chat_setup_time:.2f} seconds")
-        
+
     except Exception as e:
         logging.error(f"Error during chat setup: {e}", exc_info=True)
         raise
-    
+
     return llm, doc_retriever, model_name
 
-def process_chat_response(messages, history, question, model, graph, document_names, chat_mode_settings):
+async def aretrieve_documents(doc_retriever, messages):
+    start_time = time.time()
+
     try:
-        llm, doc_retriever, model_version = setup_chat(model, graph, document_names, chat_mode_settings)
-        
-        docs, transformed_question = retrieve_documents(doc_retriever, messages)  
+        handler = CustomCallback()
+        docs = await doc_retriever.ainvoke({"messages": messages},{"callbacks":[handler]})
+        transformed_question = handler.transformed_question
+        if transformed_question:
+            logging.info(f"Transformed question : {transformed_question}")
+        doc_retrieval_time = time.time() - start_time
+        logging.info(f"Documents retrieved in {doc_retrieval_time:.2f} seconds")
 
-        if docs:
-            content, result, total_tokens,formatted_docs = process_documents(docs, question, messages, llm, model, chat_mode_settings)
-        else:
-            content = "I couldn't find any relevant documents to answer your question."
-            result = {"sources": list(), "nodedetails": list(), "entities": list()}
-            total_tokens = 0
-            formatted_docs = ""
-        
-        ai_response = AIMessage(content=content)
-        messages.append(ai_response)
-
-        summarization_thread = threading.Thread(target=summarize_and_log, args=(history, messages, llm))
-        summarization_thread.start()
-        logging.info("Summarization thread started.")
-        # summarize_and_log(history, messages, llm)
-        metric_details = {"question":question,"contexts":formatted_docs,"answer":content}
-        return {
-            "session_id": "",  
-            "message": content,
-            "info": {
-                # "metrics" : metrics,
-                "sources": result["sources"],
-                "model": model_version,
-                "nodedetails": result["nodedetails"],
-                "total_tokens": total_tokens,
-                "response_time": 0,
-                "mode": chat_mode_settings["mode"],
-                "entities": result["entities"],
-                "metric_details": metric_details,
-            },
-            
-            "user": "chatbot"
-        }
-    
     except Exception as e:
-        logging.exception(f"Error processing chat response at {datetime.now()}: {str(e)}")
-        return {
-            "session_id": "",
-            "message": "Something went wrong",
-            "info": {
-                "metrics" : [],
-                "sources": [],
-                "nodedetails": [],
-                "total_tokens": 0,
-                "response_time": 0,
-                "error": f"{type(e).__name__}: {str(e)}",
-                "mode": chat_mode_settings["mode"],
-                "entities": [],
-                "metric_details": {},
-            },
-            "user": "chatbot"
-        }
+        error_message = f"Error retrieving documents: {str(e)}"
+        logging.error(error_message)
+        docs = None
+        transformed_question = None
+
+    return docs, transformed_question
+
+async def aprocess_documents(docs, question, messages, llm, model, chat_mode_settings):
+    start_time = time.time()
+    try:
+        formatted_docs, sources, entitydetails, communities = format_documents(docs, model)
+
+        rag_chain = get_rag_chain(llm = llm)
 
-def summarize_and_log(history, stored_messages, llm):
-    logging.info("Starting summarization in a separate thread.")
+        ai_response = await rag_chain.ainvoke({
+            "messages": messages[:-1],
+            "context": formatted_docs,
+            "input": question
+        })
+
+        result = get_node_details(docs, sources, entitydetails, communities, chat_mode_settings)
+
+        content = ai_response.content
+        total_tokens = get_total_tokens(ai_response, llm)
+
+        predict_time = time.time() - start_time
+        logging.info(f"Final response predicted in {predict_time:.2f} seconds")
+
+    except Exception as e:
+        logging.error(f"Error processing documents: {e}")
+        raise
+
+    return content, result, total_tokens, formatted_docs
+
+async def astream_documents(docs, question, messages, llm, model, chat_mode_settings, output):
+    """[ENG]: Stream the answer over the retrieved documents, the final content, node details and token count are stored in `output`.
+    [IDN]: Men-stream jawaban atas dokumen yang diambil, konten akhir, detail node, dan jumlah token disimpan di `output`."""
+    start_time = time.time()
+    try:
+        formatted_docs, sources, entitydetails, communities = format_documents(docs, model)
+        output["formatted_docs"] = formatted_docs
+
+        rag_chain = get_rag_chain(llm = llm)
+
+        ai_response = None
+        async for chunk in rag_chain.astream({
+            "messages": messages[:-1],
+            "context": formatted_docs,
+            "input": question
+        }):
+            ai_response = chunk if ai_response is None else ai_response + chunk
+            if chunk.content:
+                output["content"] = ai_response.content
+                yield chunk.content
+
+        output["result"] = get_node_details(docs, sources, entitydetails, communities, chat_mode_settings)
+        output["content"] = ai_response.content if ai_response is not None else ""
+        output["total_tokens"] = get_total_tokens(ai_response, llm) if ai_response is not None else 0
+
+        predict_time = time.time() - start_time
+        logging.info(f"Final response streamed in {predict_time:.2f} seconds")
+
+    except Exception as e:
+        logging.error(f"Error streaming documents: {e}")
+        raise
+
+async def asummarize_and_log(history, stored_messages, llm):
+    logging.info("Starting summarization.")
     if not stored_messages:
         logging.info("No messages to summarize.")
         return False
@@ -479,12 +610,10 @@ def summarize_and_log(history, stored_messages, llm):
         )
         summarization_chain = summarization_prompt | llm
 
-        summary_message = summarization_chain.invoke({"chat_history": stored_messages})
+        summary_message = await summarization_chain.ainvoke({"chat_history": stored_messages})
 
-        with threading.Lock():
-            history.clear()
-            history.add_user_message("Our current conversation summary till now")
-            history.add_message(summary_message)
+        await history.aclear()
+        await history.aadd_messages([HumanMessage(content="Our current conversation summary till now"), summary_message])
 
         history_summarized_time = time.time() - start_time
         logging.info(f"Chat History summarized in {history_summarized_time:.2f} seconds")
@@ -493,36 +622,199 @@ def summarize_and_log(history, stored_messages, llm):
 
     except Exception as e:
         logging.error(f"An error occurred while summarizing messages: {e}", exc_info=True)
-        return False 
-    
-def create_graph_chain(model, graph):
+        return False
+
+def is_fusion_mode(mode):
+    return bool(mode) and (mode == CHAT_FUSION_MODE or mode.startswith(CHAT_FUSION_MODE + ":"))
+
+def get_fusion_mode_settings(mode, settings_map=CHAT_MODE_CONFIG_MAP):
+    """
+    [ENG]: Settings of the fusion mode. `mode` is "fusion" (CHAT_FUSION_DEFAULT_MODES) or "fusion:<mode>,<mode>,...".
+    [IDN]: Pengaturan mode fusion. `mode` berupa "fusion" (CHAT_FUSION_DEFAULT_MODES) atau "fusion:<mode>,<mode>,...".
+    """
+    _, _, selected = mode.partition(":")
+    modes = [name.strip() for name in selected.split(",") if name.strip()] or list(CHAT_FUSION_DEFAULT_MODES)
+    unsupported = [name for name in modes if name not in settings_map]
+    if unsupported:
+        raise ValueError(f"Unsupported chat modes for fusion: {unsupported}. Supported modes: {list(settings_map)}")
+
+    chat_mode_settings = {"mode": CHAT_FUSION_MODE, "modes": modes, "document_filter": any(settings_map[name]["document_filter"] for name in modes)}
+    logging.info(f"Chat mode settings: {chat_mode_settings}")
+    return chat_mode_settings
+
+async def atransform_question(llm, messages):
+    """[ENG]: Async counterpart of the question transformation in `create_document_retriever_chain`.
+    [IDN]: Pasangan async dari transformasi pertanyaan pada `create_document_retriever_chain`."""
+    if len(messages) == 1:
+        return messages[-1].content
+    query_transform_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", QUESTION_TRANSFORM_TEMPLATE),
+            MessagesPlaceholder(variable_name="messages")
+        ]
+    )
+    transformed_question = await (query_transform_prompt | llm | StrOutputParser()).ainvoke({"messages": messages})
+    logging.info(f"Transformed question : {transformed_question}")
+    return transformed_question
+
+def get_fusion_document_key(doc):
+    # Chunk based modes return one document per source file, the same file found by several modes is fused.
+    source = doc.metadata.get("source")
+    if source:
+        return ("source", source)
+    return (doc.metadata.get("retriever"), doc.page_content)
+
+def merge_fused_documents(score, docs):
+    """Keep the most complete document of a fused group and merge the chunk details of the group."""
+    doc = max(docs, key=lambda candidate: len(candidate.page_content))
+    chunkdetails = dict()
+    for candidate in docs:
+        for chunkdetail in candidate.metadata.get("chunkdetails", []):
+            previous = chunkdetails.get(chunkdetail.get("id"))
+            if previous is None or chunkdetail.get("score", 0) > previous.get("score", 0):
+                chunkdetails[chunkdetail.get("id")] = chunkdetail
+    if chunkdetails:
+        doc.metadata["chunkdetails"] = list(chunkdetails.values())
+    doc.metadata["fusion_score"] = score
+    doc.metadata["retrievers"] = sorted({candidate.metadata.get("retriever") for candidate in docs})
+    return doc
+
+async def aretrieve_fusion_documents(llm, messages, driver, uri, userName, password, database, document_names, chat_mode_settings):
+    """
+    [ENG]: Run the retrievers of the selected modes concurrently on the shared async driver and fuse their results with 
+    reciprocal-rank fusion. The question is transformed and embedded once for all retrievers.
+    Returns the fused documents and the latency / document count of every retriever.
+    [IDN]: Menjalankan retriever dari mode yang dipilih secara bersamaan pada driver async bersama dan menggabungkan hasilnya dengan 
+    reciprocal-rank fusion. Pertanyaan ditransformasi dan di-embed sekali untuk semua retriever.
+    Mengembalikan dokumen hasil fusion dan latensi / jumlah dokumen dari setiap retriever.
+    """
+    start_time = time.time()
+    # Modes that cannot filter on documents are skipped when documents are selected.
+    modes = [name for name in chat_mode_settings["modes"] if not document_names or CHAT_MODE_CONFIG_MAP[name]["document_filter"]]
+
+    query = await atransform_question(llm, messages)
+    embedding = await EMBEDDING_FUNCTION.aembed_query(query)
+
+    async def run_retriever(mode):
+        retriever_start_time = time.time()
+        try:
+            retriever = await aget_neo4j_retriever(driver, uri, userName, password, database, document_names, get_chat_mode_settings(mode=mode))
+            docs = await retriever.aget_documents_by_vector(query, embedding)
+            for doc in docs:
+                doc.metadata["retriever"] = mode
+            return docs, {"latency": round(time.time() - retriever_start_time, 2), "documents": len(docs)}
+        except Exception as e:
+            logging.error(f"Fusion retriever {mode} failed: {e}")
+            return [], {"latency": round(time.time() - retriever_start_time, 2), "documents": 0, "error": f"{type(e).__name__}: {str(e)}"}
+
+    results = await asyncio.gather(*(run_retriever(mode) for mode in modes))
+    retriever_report = {mode: report for mode, (_, report) in zip(modes, results)}
+
+    fused = reciprocal_rank_fusion([docs for docs, _ in results], key=get_fusion_document_key, k=CHAT_FUSION_RRF_K)
+    docs = [merge_fused_documents(score, group) for score, group in fused]
+
+    logging.info(f"Fusion retrieval of {len(docs)} documents from {retriever_report} in {time.time() - start_time:.2f} seconds")
+    return docs, retriever_report
+
+async def aretrieve_chat_documents(messages, model, driver, uri, userName, password, database, document_names, chat_mode_settings):
+    """[ENG]: Retrieve the documents of a chat turn, returns the llm, the documents, the model version and the fusion retriever report (None for single modes).
+    [IDN]: Mengambil dokumen untuk satu giliran chat, mengembalikan llm, dokumen, versi model, dan laporan retriever fusion (None untuk mode tunggal)."""
+    if chat_mode_settings["mode"] == CHAT_FUSION_MODE:
+        if model == "diffbot":
+            model = os.getenv('DEFAULT_DIFFBOT_CHAT_MODEL')
+        llm, model_version = get_llm(model=model)
+        docs, retriever_report = await aretrieve_fusion_documents(llm, messages, driver, uri, userName, password, database, document_names, chat_mode_settings)
+        return llm, docs, model_version, retriever_report
+
+    llm, doc_retriever, model_version = await asetup_chat(model, driver, uri, userName, password, database, document_names, chat_mode_settings)
+    docs, transformed_question = await aretrieve_documents(doc_retriever, messages)
+    return llm, docs, model_version, None
+
+async def aprocess_chat_response(messages, history, question, model, driver, uri, userName, password, database, document_names, chat_mode_settings, session_id=None):
     try:
-        logging.info(f"Graph QA Chain using LLM model: {model}")
+        llm, docs, model_version, retriever_report = await aretrieve_chat_documents(messages, model, driver, uri, userName, password, database, document_names, chat_mode_settings)
 
-        cypher_llm,model_name = get_llm(model)
-        qa_llm,model_name = get_llm(model)
-        graph_chain = GraphCypherQAChain.from_llm(
-            cypher_llm=cypher_llm,
-            qa_llm=qa_llm,
-            validate_cypher= True,
-            graph=graph,
-            # verbose=True, 
-            allow_dangerous_requests=True,
-            return_intermediate_steps = True,
-            top_k=3
-        )
+        if docs:
+            content, result, total_tokens, formatted_docs = await aprocess_documents(docs, question, messages, llm, model, chat_mode_settings)
+        else:
+            content = "I couldn't find any relevant documents to answer your question."
+            result = {"sources": list(), "nodedetails": list(), "entities": list()}
+            total_tokens = 0
+            formatted_docs = ""
 
-        logging.info("GraphCypherQAChain instance created successfully.")
-        return graph_chain, qa_llm, model_name
+        messages.append(AIMessage(content=content))
+
+        queue_history_update(session_id, history, messages, llm)
+        chat_response = build_chat_response(content, result, total_tokens, formatted_docs, question, model_version, chat_mode_settings)
+        if retriever_report is not None:
+            chat_response["info"]["retrievers"] = retriever_report
+        return chat_response
 
     except Exception as e:
-        logging.error(f"An error occurred while creating the GraphCypherQAChain instance. : {e}") 
-        raise
+        logging.exception(f"Error processing chat response at {datetime.now()}: {str(e)}")
+        return {
+            "session_id": "",
+            "message": "Something went wrong",
+            "info": {
+                "metrics" : [],
+                "sources": [],
+                "nodedetails": [],
+                "total_tokens": 0,
+                "response_time": 0,
+                "error": f"{type(e).__name__}: {str(e)}",
+                "mode": chat_mode_settings["mode"],
+                "entities": [],
+                "metric_details": {},
+            },
+            "user": "chatbot"
+        }
 
-def get_graph_response(graph_chain, question):
+async def astream_chat_response(messages, history, question, model, driver, uri, userName, password, database, document_names, chat_mode_settings, response, session_id=None):
+    """[ENG]: Streaming variant of `aprocess_chat_response`. Async generators cannot return a value, 
+    so the final response dictionary is stored in `response["result"]` once the stream is done.
+    [IDN]: Varian streaming dari `aprocess_chat_response`. Async generator tidak dapat mengembalikan nilai, 
+    sehingga dictionary respons akhir disimpan di `response["result"]` setelah stream selesai."""
+    llm, docs, model_version, retriever_report = await aretrieve_chat_documents(messages, model, driver, uri, userName, password, database, document_names, chat_mode_settings)
+
+    output = {
+        "content": "",
+        "result": {"sources": list(), "nodedetails": list(), "entities": list()},
+        "total_tokens": 0,
+        "formatted_docs": "",
+    }
+    completed = False
     try:
-        cypher_res = graph_chain.invoke({"query": question})
-        
+        if docs:
+            async for token in astream_documents(docs, question, messages, llm, model, chat_mode_settings, output):
+                yield format_chat_event("token", {"token": token})
+        else:
+            output["content"] = "I couldn't find any relevant documents to answer your question."
+            yield format_chat_event("token", {"token": output["content"]})
+        completed = True
+    finally:
+        # Keep the history consistent even if the client disconnects in the middle of the stream.
+        if output["content"]:
+            messages.append(AIMessage(content=output["content"]))
+            queue_history_update(session_id, history, messages, llm)
+            logging.info(f"Chat history update queued (stream completed: {completed}).")
+
+    response["result"] = build_chat_response(output["content"], output["result"], output["total_tokens"], output["formatted_docs"], question, model_version, chat_mode_settings)
+    if retriever_report is not None:
+        response["result"]["info"]["retrievers"] = retriever_report
+
+ASYNC_SUMMARIZATION_SCHEDULER = AsyncSummarizationScheduler(asummarize_and_log)
+
+def queue_history_update(session_id, history, messages, llm):
+    """Queue the history write (or summary) of a chat turn, a turn without history (`history` is None) is not stored."""
+    if history is None:
+        return
+    ASYNC_SUMMARIZATION_SCHEDULER.submit(session_id, history, messages, llm, messages[-2:])
+
+async def aget_graph_response(graph_chain, question):
+    try:
+        # GraphCypherQAChain has no native async implementation, `ainvoke` runs its sync call in the default executor.
+        cypher_res = await graph_chain.ainvoke({"query": question})
+
         response = cypher_res.get("result")
         cypher_query = ""
         context = []
@@ -530,7 +822,7 @@ def get_graph_response(graph_chain, question):
         for step in cypher_res.get("intermediate_steps", []):
             if "query" in step:
                 cypher_string = step["query"]
-                cypher_query = cypher_string.replace("cypher\n", "").replace("\n", " ").strip() 
+                cypher_query = cypher_string.replace("cypher\n", "").replace("\n", " ").strip()
             elif "context" in step:
                 context = step["context"]
         return {
@@ -538,27 +830,27 @@ def get_graph_response(graph_chain, question):
             "cypher_query": cypher_query,
             "context": context
         }
-    
+
     except Exception as e:
         logging.error(f"An error occurred while getting the graph response : {e}")
 
-def process_graph_response(model, graph, question, messages, history):
+async def aprocess_graph_response(model, uri, userName, password, database, question, messages, history, session_id=None):
+    model_version = ""
+    graph = None
     try:
-        graph_chain, qa_llm, model_version = create_graph_chain(model, graph)
-        
-        graph_response = get_graph_response(graph_chain, question)
-        
+        graph = await asyncio.to_thread(Neo4jGraph, url=uri, username=userName, password=password, database=database, sanitize=True, refresh_schema=False)
+        schema_version = await asyncio.to_thread(GRAPH_SCHEMA_CACHE.apply, graph, uri, database)
+        graph_chain, qa_llm, model_version = create_graph_chain(model, graph, schema_version)
+
+        graph_response = await aget_graph_response(graph_chain, question)
+
         ai_response_content = graph_response.get("response", "Something went wrong")
-        ai_response = AIMessage(content=ai_response_content)
-        
-        messages.append(ai_response)
-        # summarize_and_log(history, messages, qa_llm)
-        summarization_thread = threading.Thread(target=summarize_and_log, args=(history, messages, qa_llm))
-        summarization_thread.start()
-        logging.info("Summarization thread started.")
+        messages.append(AIMessage(content=ai_response_content))
+
+        queue_history_update(session_id, history, messages, qa_llm)
         metric_details = {"question":question,"contexts":graph_response.get("context", ""),"answer":ai_response_content}
-        result = {
-            "session_id": "", 
+        return {
+            "session_id": "",
             "message": ai_response_content,
             "info": {
                 "model": model_version,
@@ -570,13 +862,11 @@ def process_graph_response(model, graph, question, messages, history):
             },
             "user": "chatbot"
         }
-        
-        return result
-    
+
     except Exception as e:
         logging.exception(f"Error processing graph response at {datetime.now()}: {str(e)}")
         return {
-            "session_id": "",  
+            "session_id": "",
             "message": "Something went wrong",
             "info": {
                 "model": model_version,
@@ -588,75 +878,99 @@ def process_graph_response(model, graph, question, messages, history):
             },
             "user": "chatbot"
         }
+    finally:
+        if graph is not None:
+            close_db_connection(graph, "chat_bot")
 
-def create_neo4j_chat_message_history(graph, session_id, write_access=True):
+async def aQA_RAG(driver, uri, userName, password, database, model, question, document_names, session_id, mode, write_access=True, store_history=True):
     """
-    [ENG]: Creates and returns a Neo4jChatMessageHistory instance.
-    [IDN]: Membuat dan return instance berupa Neo4jChatMessageHistory.
+    [ENG]: Answer a chat question. `driver` is the shared async Neo4j driver used for the
+    chat history and the vector search, the credentials are only used to resolve the index settings and for graph mode.
+    With `store_history=False` the question is answered without a chat history and nothing is stored (batch questions).
+    [IDN]: Menjawab pertanyaan chat. `driver` adalah driver Neo4j async bersama untuk
+    riwayat chat dan pencarian vektor, kredensial hanya digunakan untuk mengambil pengaturan index dan untuk mode graph.
+    Dengan `store_history=False` pertanyaan dijawab tanpa riwayat chat dan tidak ada yang disimpan (pertanyaan batch).
     """
-    try:
-        if write_access: 
-            history = Neo4jChatMessageHistory(
-                graph=graph,
-                session_id=session_id
-            )
-            return history
-        
-        history = get_history_by_session_id(session_id)
-        return history
-
-    except Exception as e:
-        logging.error(f"Error creating Neo4jChatMessageHistory: {e}")
-        raise 
-
-def get_chat_mode_settings(mode, settings_map=CHAT_MODE_CONFIG_MAP):
-    default_settings = settings_map[CHAT_DEFAULT_MODE]
-    try:
-        chat_mode_settings = settings_map.get(mode, default_settings)
-        chat_mode_settings["mode"] = mode
-        
-        logging.info(f"Chat mode settings: {chat_mode_settings}")
-    
-    except Exception as e:
-        logging.error(f"Unexpected error: {e}", exc_info=True)
-        raise
-
-    return chat_mode_settings
-    
-def QA_RAG(graph, model, question, document_names, session_id, mode, write_access=True):
     logging.info(f"Chat Mode: {mode}")
 
-    history = create_neo4j_chat_message_history(graph, session_id, write_access)
-    messages = history.messages
+    if store_history:
+        history = await create_async_chat_message_history(driver, database, session_id, write_access)
+        messages = list(await history.aget_messages())
+    else:
+        history, messages = None, []
 
     user_question = HumanMessage(content = question)
     messages.append(user_question)
 
     if mode == CHAT_GRAPH_MODE:
-        result = process_graph_response(model, graph, question, messages, history)
+        result = await aprocess_graph_response(model, uri, userName, password, database, question, messages, history, session_id)
     else:
-        chat_mode_settings = get_chat_mode_settings(mode=mode)
+        chat_mode_settings = get_fusion_mode_settings(mode) if is_fusion_mode(mode) else get_chat_mode_settings(mode=mode)
         document_names= list(map(str.strip, json.loads(document_names)))
         if document_names and not chat_mode_settings["document_filter"]:
-            result =  {
-                "session_id": "",  
-                "message": "Please deselect all documents in the table before using this chat mode",
-                "info": {
-                    "sources": [],
-                    "model": "",
-                    "nodedetails": [],
-                    "total_tokens": 0,
-                    "response_time": 0,
-                    "mode": chat_mode_settings["mode"],
-                    "entities": [],
-                    "metric_details": [],
-                },
-                "user": "chatbot"
-            }
+            result = get_document_filter_warning(chat_mode_settings)
         else:
-            result = process_chat_response(messages, history, question, model, graph, document_names,chat_mode_settings)
+            result = await aprocess_chat_response(messages, history, question, model, driver, uri, userName, password, database, document_names, chat_mode_settings, session_id)
 
     result["session_id"] = session_id
-    
+
     return result
 
+async def aQA_RAG_stream(driver, uri, userName, password, database, model, question, document_names, session_id, mode, write_access=True):
+    """[ENG]: Streaming variant of `aQA_RAG`, yields `token` events, then a `metadata` event with the response (or an `error` event).
+    [IDN]: Varian streaming dari `aQA_RAG`, menghasilkan event `token`, lalu event `metadata` berisi respons (atau event `error`)."""
+    logging.info(f"Chat Mode (stream): {mode}")
+    start_time = time.time()
+    try:
+        history = await create_async_chat_message_history(driver, database, session_id, write_access)
+        messages = list(await history.aget_messages())
+
+        user_question = HumanMessage(content = question)
+        messages.append(user_question)
+
+        if mode == CHAT_GRAPH_MODE:
+            # GraphCypherQAChain only returns the final answer, so it is sent as a single token.
+            result = await aprocess_graph_response(model, uri, userName, password, database, question, messages, history, session_id)
+            yield format_chat_event("token", {"token": result["message"]})
+        else:
+            chat_mode_settings = get_fusion_mode_settings(mode) if is_fusion_mode(mode) else get_chat_mode_settings(mode=mode)
+            document_names= list(map(str.strip, json.loads(document_names)))
+            if document_names and not chat_mode_settings["document_filter"]:
+                result = get_document_filter_warning(chat_mode_settings)
+                yield format_chat_event("token", {"token": result["message"]})
+            else:
+                response = {}
+                async for event in astream_chat_response(messages, history, question, model, driver, uri, userName, password, database, document_names, chat_mode_settings, response, session_id):
+                    yield event
+                result = response["result"]
+
+        result["session_id"] = session_id
+        result["info"]["response_time"] = round(time.time() - start_time, 2)
+        yield format_chat_event("metadata", result)
+
+    except Exception as e:
+        logging.exception(f"Error streaming chat response at {datetime.now()}: {str(e)}")
+        yield format_chat_event("error", {
+            "session_id": session_id,
+            "message": "Something went wrong",
+            "error": f"{type(e).__name__}: {str(e)}",
+        })
+
+def QA_RAG(uri, userName, password, database, model, question, document_names, session_id, mode, write_access=True):
+    """
+    [ENG]: Blocking wrapper of `aQA_RAG` for scripts and tests. Runs the chat turn on its own event loop and waits for the
+    chat history writes before the loop is closed, the drivers and LLM clients bound to the loop are closed as well.
+    [IDN]: Wrapper blocking dari `aQA_RAG` untuk script dan test. Menjalankan giliran chat pada event loop sendiri dan menunggu
+    penulisan riwayat chat sebelum loop ditutup, driver dan klien LLM yang terikat pada loop juga ditutup.
+    """
+    async def run():
+        try:
+            driver = await get_async_graph_driver(uri, userName, password)
+            return await aQA_RAG(driver, uri, userName, password, database, model, question, document_names, session_id, mode, write_access)
+        finally:
+            await ASYNC_SUMMARIZATION_SCHEDULER.join()
+            await CHAT_HISTORY_CACHE.close()
+            await close_async_graph_drivers()
+            await close_llm_clients()
+
+    return asyncio.run(run())
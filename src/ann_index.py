@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+from neo4j import READ_ACCESS, RoutingControl
+from src.shared.constants import (
+    CHAT_ANN_INDEX_REFRESH_SECONDS,
+    CHAT_ANN_INDEX_NPROBE,
+    CHAT_ANN_INDEX_MIN_LIST_SIZE,
+    CHAT_ANN_INDEX_KMEANS_SAMPLE_SIZE,
+    CHAT_ANN_INDEX_KMEANS_ITERATIONS,
+)
+
+COUNT_EMBEDDINGS_QUERY = """
+MATCH (n:`{label}`) WHERE n.`{property}` IS NOT NULL AND size(n.`{property}`) = $dimension
+RETURN count(n) AS count
+"""
+
+SNAPSHOT_EMBEDDINGS_QUERY = """
+MATCH (n:`{label}`) WHERE n.`{property}` IS NOT NULL AND size(n.`{property}`) = $dimension
+RETURN elementId(n) AS id, n.`{property}` AS embedding
+"""
+
+CURRENT_VERSION_FILE = "CURRENT"
+BUILD_LOCK_FILE = "build.lock"
+BUILD_LOCK_TIMEOUT_SECONDS = 60 * 60
+SNAPSHOT_BATCH_SIZE = 10000
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def assign_lists(vectors, centroids, batch_size=SNAPSHOT_BATCH_SIZE):
+    """Index of the closest centroid (highest cosine similarity) of every row."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        batch = np.asarray(vectors[start:start + batch_size])
+        assignments[start:start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+    return assignments
+
+def train_centroids(vectors, nlist, sample_size=CHAT_ANN_INDEX_KMEANS_SAMPLE_SIZE, iterations=CHAT_ANN_INDEX_KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means on a sample of the (normalized) vectors."""
+    rng = np.random.default_rng(seed)
+    sample_ids = np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))
+    sample = np.asarray(vectors[sample_ids])
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Empty lists keep their previous centroid.
+        centroids[counts > 0] = normalize_rows(sums[counts > 0])
+    return centroids
+
+class IVFVectorIndex:
+    """
+    [ENG]: Inverted-file (IVF) index over normalized float32 embeddings, memory-mapped from a version directory.
+    The vectors are stored grouped by list, so a search reads `nprobe` contiguous slices and scores them exactly.
+    Scores use the Neo4j cosine vector index scale: (1 + cosine) / 2.
+
+    [IDN]: Index inverted-file (IVF) atas embedding float32 yang sudah dinormalisasi, di-memory-map dari direktori versi.
+    Vektor disimpan berkelompok per list, sehingga pencarian membaca `nprobe` potongan yang berurutan dan menilainya secara eksak.
+    Skor menggunakan skala index vektor cosine Neo4j: (1 + cosine) / 2.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "ids.json")) as f:
+            self.ids = json.load(f)
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+
+    @property
+    def version(self):
+        return os.path.basename(self.path)
+
+    @property
+    def built_at(self):
+        return self.meta["built_at"]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, embedding, k, nprobe=CHAT_ANN_INDEX_NPROBE) -> List[Tuple[str, float]]:
+        """Return up to `k` (element id, score) pairs, best first."""
+        if not self.ids:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        probes = np.argsort(-(self.centroids @ query))[:nprobe]
+        positions = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in probes])
+        if not len(positions):
+            return []
+        similarities = np.concatenate([self.vectors[self.offsets[i]:self.offsets[i + 1]] @ query for i in probes])
+        top = np.argpartition(-similarities, k - 1)[:k] if len(similarities) > k else np.arange(len(similarities))
+        top = top[np.argsort(-similarities[top])]
+        return [(self.ids[positions[i]], float((1.0 + similarities[i]) / 2.0)) for i in top]
+
+    @staticmethod
+    def build(path, ids, vectors, min_list_size=CHAT_ANN_INDEX_MIN_LIST_SIZE):
+        """
+        Write an index for `ids` and their normalized `vectors` (a float32 array or memmap) into `path`.
+        About sqrt(n) lists are trained, fewer when the lists would hold less than `min_list_size` vectors.
+        """
+        os.makedirs(path, exist_ok=True)
+        count, dimension = vectors.shape
+        nlist = max(1, min(int(np.sqrt(count)), count // min_list_size))
+        if nlist > 1:
+            centroids = train_centroids(vectors, nlist)
+            assignments = assign_lists(vectors, centroids)
+        else:
+            centroids = normalize_rows(np.asarray(vectors, dtype=np.float32).mean(axis=0, keepdims=True)) if count else np.zeros((1, dimension), dtype=np.float32)
+            assignments = np.zeros(count, dtype=np.int32)
+
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+        grouped = np.lib.format.open_memmap(os.path.join(path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(count, dimension))
+        for start in range(0, count, SNAPSHOT_BATCH_SIZE):
+            grouped[start:start + SNAPSHOT_BATCH_SIZE] = vectors[order[start:start + SNAPSHOT_BATCH_SIZE]]
+        grouped.flush()
+        del grouped
+        np.save(os.path.join(path, "centroids.npy"), centroids.astype(np.float32))
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+        with open(os.path.join(path, "ids.json"), "w") as f:
+            json.dump([ids[i] for i in order], f)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"built_at": time.time(), "count": count, "dimension": dimension, "lists": nlist}, f)
+
+class AnnIndexRegistry:
+    """
+    [ENG]: Local ANN mirrors of the Neo4j vector indexes, stored under `directory` and shared by the workers of the host.
+    An index is snapshotted from the graph (streamed through the async driver) the first time it is asked for,
+    again once it is older than `refresh_interval`, and after `invalidate` (post processing). Builds are written to a new
+    version directory and published through the `CURRENT` file, one worker builds at a time (lock file).
+    While an index is missing, `get` returns None and the retriever keeps using the Neo4j vector index.
+
+    [IDN]: Salinan ANN lokal dari index vektor Neo4j, disimpan di `directory` dan digunakan bersama oleh worker pada host.
+    Index diambil (snapshot) dari graph (di-stream melalui driver async) saat pertama kali diminta,
+    lagi setelah lebih tua dari `refresh_interval`, dan setelah `invalidate` (post processing). Hasil build ditulis ke direktori
+    versi baru dan dipublikasikan melalui file `CURRENT`, hanya satu worker yang mem-build dalam satu waktu (file lock).
+    Selama index belum ada, `get` mengembalikan None dan retriever tetap menggunakan index vektor Neo4j.
+    """
+    def __init__(self, directory, refresh_interval=CHAT_ANN_INDEX_REFRESH_SECONDS, nprobe=CHAT_ANN_INDEX_NPROBE):
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.nprobe = nprobe
+        self._indexes = {}
+        self._stale = set()
+        self._database_keys = {}
+        self._builds = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _key(self, uri, database, index_name):
+        return hashlib.sha256(f"{uri}|{database}|{index_name}".encode()).hexdigest()[:32]
+
+    def _load_current(self, key):
+        """Load the published version of an index if this worker does not hold it yet."""
+        try:
+            with open(os.path.join(self.directory, key, CURRENT_VERSION_FILE)) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        index = self._indexes.get(key)
+        if index is None or index.version != version:
+            try:
+                index = IVFVectorIndex(os.path.join(self.directory, key, version))
+            except FileNotFoundError:
+                return index
+            self._indexes[key] = index
+            logging.info(f"Loaded ANN index {key} version {version} with {len(index)} vectors")
+        return index
+
+    async def get(self, driver, uri, database, neo_db) -> Optional[IVFVectorIndex]:
+        """Return the local index of `neo_db`'s vector index, or None while it is not built yet."""
+        key = self._key(uri, database, neo_db.index_name)
+        self._database_keys.setdefault((uri, database), set()).add(key)
+        index = self._load_current(key)
+        stale = index is None or key in self._stale or time.time() - index.built_at > self.refresh_interval
+        if stale and key not in self._builds:
+            self._stale.discard(key)
+            task = asyncio.create_task(self._build(key, driver, database, neo_db))
+            self._builds[key] = task
+            task.add_done_callback(lambda _: self._builds.pop(key, None))
+        return index
+
+    def invalidate(self, uri, database):
+        """Rebuild every index of the database on its next use, called after the graph embeddings changed."""
+        self._stale.update(self._database_keys.get((uri, database), ()))
+
+    def _acquire_lock(self, key):
+        lock_path = os.path.join(self.directory, key, BUILD_LOCK_FILE)
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        try:
+            if time.time() - os.path.getmtime(lock_path) > BUILD_LOCK_TIMEOUT_SECONDS:
+                os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return lock_path
+        except FileExistsError:
+            return None
+
+    async def _snapshot(self, driver, database, neo_db, path):
+        """Stream the embeddings of the index label into a normalized float32 memmap."""
+        label, embedding_property, dimension = neo_db.node_label, neo_db.embedding_node_property, neo_db.embedding_dimension
+        records, _, _ = await driver.execute_query(
+            COUNT_EMBEDDINGS_QUERY.format(label=label, property=embedding_property), {"dimension": dimension}, database_=database, routing_=RoutingControl.READ
+        )
+        capacity = records[0]["count"]
+        raw = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(capacity, dimension))
+        ids, batch = [], []
+
+        def write_batch():
+            start = len(ids) - len(batch)
+            raw[start:len(ids)] = normalize_rows(np.asarray(batch, dtype=np.float32))
+            batch.clear()
+
+        async with driver.session(database=database, default_access_mode=READ_ACCESS) as session:
+            result = await session.run(SNAPSHOT_EMBEDDINGS_QUERY.format(label=label, property=embedding_property), {"dimension": dimension})
+            async for record in result:
+                # Nodes created after the count are left for the next snapshot.
+                if len(ids) == capacity:
+                    break
+                ids.append(record["id"])
+                batch.append(record["embedding"])
+                if len(batch) == SNAPSHOT_BATCH_SIZE:
+                    write_batch()
+        if batch:
+            write_batch()
+        raw.flush()
+        return ids, raw[:len(ids)]
+
+    async def _build(self, key, driver, database, neo_db):
+        lock_path = self._acquire_lock(key)
+        if lock_path is None:
+            logging.info(f"ANN index {neo_db.index_name} is being built by another worker")
+            return
+        start = time.time()
+        index_dir = os.path.join(self.directory, key)
+        version = str(int(start * 1000))
+        version_dir = os.path.join(index_dir, version)
+        try:
+            os.makedirs(version_dir)
+            raw_path = os.path.join(version_dir, "snapshot.npy")
+            ids, vectors = await self._snapshot(driver, database, neo_db, raw_path)
+            await asyncio.to_thread(IVFVectorIndex.build, version_dir, ids, vectors)
+            del vectors
+            os.remove(raw_path)
+
+            current_path = os.path.join(index_dir, CURRENT_VERSION_FILE)
+            previous = self._indexes.get(key)
+            with open(current_path + ".tmp", "w") as f:
+                f.write(version)
+            os.replace(current_path + ".tmp", current_path)
+            # Keep the previous version, other workers may still be loading it.
+            keep = {version, previous.version if previous else None, CURRENT_VERSION_FILE, BUILD_LOCK_FILE}
+            for name in os.listdir(index_dir):
+                if name not in keep:
+                    shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+            self._load_current(key)
+            logging.info(f"Built ANN index {neo_db.index_name} with {len(ids)} vectors in {time.time() - start:.2f} seconds")
+        except Exception as e:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            logging.error(f"Failed to build ANN index {neo_db.index_name}: {e}", exc_info=True)
+        finally:
+            os.remove(lock_path)
+
+    async def close(self):
+        """Cancel the running builds, used on shutdown."""
+        for task in list(self._builds.values()):
+            task.cancel()
+        if self._builds:
+            await asyncio.gather(*self._builds.values(), return_exceptions=True)
+
+def create_ann_index_registry(directory=None, **kwargs):
+    """
+    [ENG]: Create the local ANN index registry, or return None when no `directory` is configured (Neo4j vector indexes only).
+    [IDN]: Membuat registry index ANN lokal, atau mengembalikan None jika `directory` tidak dikonfigurasi (hanya index vektor Neo4j).
+    """
+    if not directory:
+        return None
+    logging.info(f"Local ANN index enabled: {directory}")
+    return AnnIndexRegistry(directory, **kwargs)
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pydantic import Field
+from neo4j import RoutingControl
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_neo4j import Neo4jVector
+from langchain_neo4j.vectorstores.neo4j_vector import (
+    SearchType,
+    IndexType,
+    _get_search_index_query,
+    construct_metadata_filter,
+    dict_to_yaml_str,
+    remove_lucene_chars,
+)
+from src.shared.constants import CHAT_ANN_INDEX_NPROBE
+
+def build_vector_search_query(neo_db: Neo4jVector, embedding: List[float], query: str, k: int, filter: Optional[Dict[str, Any]] = None, effective_search_ratio: int = 1) -> Tuple[str, Dict[str, Any]]:
+    """
+    [ENG]: Build the Cypher query and parameters that `Neo4jVector.similarity_search_with_score_by_vector` would run,
+    using the index settings already resolved on `neo_db`, so the search can be executed with another (async) driver.
+
+    [IDN]: Membangun query Cypher dan parameter yang akan dijalankan oleh `Neo4jVector.similarity_search_with_score_by_vector`,
+    menggunakan pengaturan index yang sudah didapat pada `neo_db`, sehingga pencarian dapat dijalankan dengan driver lain (async).
+    """
+    if filter:
+        if not neo_db.support_metadata_filter:
+            raise ValueError("Metadata filtering is only supported in Neo4j version 5.18 or greater")
+        if neo_db.search_type == SearchType.HYBRID:
+            raise ValueError("Metadata filtering can't be use in combination with a hybrid search approach")
+        parallel_query = "CYPHER runtime = parallel parallelRuntimeSupport=all " if neo_db._is_enterprise else ""
+        base_index_query = parallel_query + (
+            f"MATCH (n:`{neo_db.node_label}`) WHERE "
+            f"n.`{neo_db.embedding_node_property}` IS NOT NULL AND "
+            f"size(n.`{neo_db.embedding_node_property}`) = "
+            f"toInteger({neo_db.embedding_dimension}) AND "
+        )
+        base_cosine_query = (
+            " WITH n as node, vector.similarity.cosine("
+            f"n.`{neo_db.embedding_node_property}`, "
+            "$embedding) AS score ORDER BY score DESC LIMIT toInteger($k) "
+        )
+        filter_snippets, filter_params = construct_metadata_filter(filter)
+        index_query = base_index_query + filter_snippets + base_cosine_query
+    else:
+        index_query = _get_search_index_query(neo_db.search_type, neo_db._index_type, neo_db.neo4j_version_is_5_23_or_above)
+        filter_params = {}
+
+    if neo_db.retrieval_query:
+        retrieval_query = neo_db.retrieval_query
+    elif neo_db._index_type == IndexType.RELATIONSHIP:
+        retrieval_query = (
+            f"RETURN relationship.`{neo_db.text_node_property}` AS text, score, "
+            f"relationship {{.*, `{neo_db.text_node_property}`: Null, "
+            f"`{neo_db.embedding_node_property}`: Null, id: Null }} AS metadata"
+        )
+    else:
+        retrieval_query = (
+            f"RETURN node.`{neo_db.text_node_property}` AS text, score, "
+            f"node {{.*, `{neo_db.text_node_property}`: Null, "
+            f"`{neo_db.embedding_node_property}`: Null, id: Null }} AS metadata"
+        )
+
+    parameters = {
+        "index": neo_db.index_name,
+        "k": k,
+        "embedding": embedding,
+        "keyword_index": neo_db.keyword_index_name,
+        "query": remove_lucene_chars(query),
+        "ef": effective_search_ratio,
+        **filter_params,
+    }
+    return index_query + retrieval_query, parameters
+
+VECTOR_INDEX_CALL = "CALL db.index.vector.queryNodes($index, $k * $ef, $embedding) YIELD node, score "
+ANN_CANDIDATES_CALL = "UNWIND $candidates AS candidate MATCH (node) WHERE elementId(node) = candidate.id WITH node, candidate.score AS score "
+# Vector indexes whose search query can't take the local ANN candidates, they are searched in Neo4j (logged once per index).
+ANN_UNSUPPORTED_INDEXES = set()
+
+def build_ann_search_query(neo_db: Neo4jVector, candidates: List[Tuple[str, float]], embedding: List[float], query: str, k: int, effective_search_ratio: int = 1) -> Tuple[str, Dict[str, Any]]:
+    """
+    [ENG]: Same query as `build_vector_search_query` (without filter), but the vector index call is replaced by the
+    (element id, score) candidates of the local ANN index, so Neo4j only expands the graph around them.
+    The fulltext part of a hybrid search still runs in Neo4j.
+
+    [IDN]: Query yang sama dengan `build_vector_search_query` (tanpa filter), tetapi pemanggilan index vektor diganti dengan
+    kandidat (element id, skor) dari index ANN lokal, sehingga Neo4j hanya menelusuri graph di sekitar kandidat tersebut.
+    Bagian fulltext dari pencarian hybrid tetap dijalankan di Neo4j.
+    """
+    read_query, parameters = build_vector_search_query(neo_db, embedding, query, k, effective_search_ratio=effective_search_ratio)
+    if VECTOR_INDEX_CALL not in read_query:
+        raise ValueError(f"The local ANN index can't be used with the {neo_db._index_type} index of '{neo_db.index_name}'")
+    parameters["candidates"] = [{"id": element_id, "score": score} for element_id, score in candidates]
+    return read_query.replace(VECTOR_INDEX_CALL, ANN_CANDIDATES_CALL), parameters
+
+def records_to_documents(records) -> List[Tuple[Document, float]]:
+    """
+    [ENG]: Convert vector search records (`text`, `score`, `metadata`) into (Document, score) pairs.
+    [IDN]: Mengubah record hasil pencarian vektor (`text`, `score`, `metadata`) menjadi pasangan (Document, score).
+    """
+    docs = []
+    for record in records:
+        text = record["text"]
+        if text is None:
+            raise ValueError("Inspect the `retrieval_query` and ensure it doesn't return None for the `text` column")
+        docs.append((
+            Document(
+                page_content=dict_to_yaml_str(text) if isinstance(text, dict) else text,
+                metadata={key: value for key, value in record["metadata"].items() if value is not None},
+            ),
+            record["score"],
+        ))
+    return docs
+
+class AsyncNeo4jVectorRetriever(BaseRetriever):
+    """
+    [ENG]: Retriever equivalent to `Neo4jVector.as_retriever(search_type="similarity_score_threshold")`,
+    but the query is embedded with `aembed_query` and the search runs on the async Neo4j driver.
+    `neo_db` is only used for its resolved index settings, its own (sync) driver is never used.
+    With an `ann_index` (see src/ann_index.py), unfiltered searches take their vector candidates from the local index.
+
+    [IDN]: Retriever yang setara dengan `Neo4jVector.as_retriever(search_type="similarity_score_threshold")`,
+    tetapi query di-embed dengan `aembed_query` dan pencarian dijalankan pada driver Neo4j async.
+    `neo_db` hanya dipakai untuk pengaturan index yang sudah didapat, driver (sync) miliknya tidak pernah dipakai.
+    Dengan `ann_index` (lihat src/ann_index.py), pencarian tanpa filter mengambil kandidat vektor dari index lokal.
+    """
+    neo_db: Neo4jVector
+    driver: Any
+    database: Optional[str] = None
+    search_kwargs: Dict[str, Any] = Field(default_factory=dict)
+    ann_index: Optional[Any] = None
+    ann_nprobe: Optional[int] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        raise NotImplementedError("AsyncNeo4jVectorRetriever only supports async retrieval, use `ainvoke`.")
+
+    async def asimilarity_search_with_score(self, query: str, embedding: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+        if embedding is None:
+            embedding = await self.neo_db.embeddings.aembed_query(query)
+        k = self.search_kwargs.get("k", 4)
+        effective_search_ratio = self.search_kwargs.get("effective_search_ratio", 1)
+        read_query = None
+        if self.ann_index is not None and not self.search_kwargs.get("filter") and self.neo_db.index_name not in ANN_UNSUPPORTED_INDEXES:
+            nprobe = self.ann_nprobe or CHAT_ANN_INDEX_NPROBE
+            candidates = await asyncio.to_thread(self.ann_index.search, embedding, k * effective_search_ratio, nprobe)
+            try:
+                read_query, parameters = build_ann_search_query(self.neo_db, candidates, embedding, query, k, effective_search_ratio)
+            except ValueError as e:
+                ANN_UNSUPPORTED_INDEXES.add(self.neo_db.index_name)
+                logging.warning(f"{e}, falling back to the Neo4j vector search")
+        if read_query is None:
+            read_query, parameters = build_vector_search_query(
+                self.neo_db,
+                embedding,
+                query,
+                k=k,
+                filter=self.search_kwargs.get("filter"),
+                effective_search_ratio=effective_search_ratio,
+            )
+        records, _, _ = await self.driver.execute_query(read_query, parameters, database_=self.database, routing_=RoutingControl.READ)
+        return records_to_documents([record.data() for record in records])
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return await self.aget_documents_by_vector(query)
+
+    async def aget_documents_by_vector(self, query: str, embedding: Optional[List[float]] = None) -> List[Document]:
+        """Retrieve the documents with an already computed query embedding, so several retrievers can share one embedding call."""
+        docs_and_scores = await self.asimilarity_search_with_score(query, embedding)
+        score_threshold = self.search_kwargs.get("score_threshold")
+        if score_threshold is not None:
+            docs_and_scores = [(doc, score) for doc, score in docs_and_scores if score >= score_threshold]
+            if not docs_and_scores:
+                logging.info(f"No relevant docs were retrieved using the relevance score threshold {score_threshold}")
+        return [doc for doc, _ in docs_and_scores]
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Document]], key: Callable[[Document], Any], k: int = 60) -> List[Tuple[float, List[Document]]]:
+    """
+    [ENG]: Fuse ranked document lists with reciprocal-rank fusion: a document scores sum(1 / (k + rank)) over the lists it appears in.
+    Documents with the same `key` are grouped. Returns (score, documents) pairs, best first.
+
+    [IDN]: Menggabungkan daftar dokumen yang sudah diurutkan dengan reciprocal-rank fusion: skor dokumen adalah sum(1 / (k + rank)) dari daftar tempat dokumen itu muncul.
+    Dokumen dengan `key` yang sama dikelompokkan. Mengembalikan pasangan (skor, dokumen), dari yang terbaik.
+    """
+    scores = {}
+    groups = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            doc_key = key(doc)
+            scores[doc_key] = scores.get(doc_key, 0.0) + 1.0 / (k + rank)
+            groups.setdefault(doc_key, []).append(doc)
+    return [(scores[doc_key], groups[doc_key]) for doc_key in sorted(scores, key=scores.get, reverse=True)]
@@ -0,0 +1,96 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List
+from src.QA_integration import aQA_RAG
+from src.ragas_eval import get_ragas_metrics
+from src.shared.constants import CHAT_DEFAULT_MODE, CHAT_BATCH_MAX_QUESTIONS, CHAT_BATCH_DEFAULT_CONCURRENCY, CHAT_BATCH_MAX_CONCURRENCY
+
+def parse_batch_questions(questions, mode=None, document_names=None) -> List[Dict[str, Any]]:
+    """
+    [ENG]: Parse the JSON list of batch questions. An item is either a question string or an object with `question`
+    and optionally `id`, `mode` and `document_names`, missing fields use the batch defaults.
+    [IDN]: Mem-parsing daftar JSON pertanyaan batch. Setiap item berupa string pertanyaan atau objek dengan `question`
+    dan opsional `id`, `mode`, dan `document_names`, field yang tidak ada memakai nilai default batch.
+    """
+    items = json.loads(questions)
+    if not isinstance(items, list) or not items:
+        raise ValueError("questions must be a non-empty JSON list")
+    if len(items) > CHAT_BATCH_MAX_QUESTIONS:
+        raise ValueError(f"A batch can hold at most {CHAT_BATCH_MAX_QUESTIONS} questions, got {len(items)}")
+
+    default_document_names = json.loads(document_names) if document_names else []
+    parsed = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"question": item}
+        if not isinstance(item, dict) or not item.get("question"):
+            raise ValueError(f"Question {index} has no question text")
+        parsed.append({
+            "index": index,
+            "id": item.get("id", index),
+            "question": item["question"],
+            "mode": item.get("mode") or mode or CHAT_DEFAULT_MODE,
+            "document_names": item.get("document_names", default_document_names),
+        })
+    return parsed
+
+def get_batch_concurrency(concurrency=None):
+    if not concurrency:
+        return CHAT_BATCH_DEFAULT_CONCURRENCY
+    return max(1, min(int(concurrency), CHAT_BATCH_MAX_CONCURRENCY))
+
+async def acalculate_answer_metrics(question, result, model):
+    """Ragas scores (faithfulness, answer relevancy, context entity recall) of one answer, as `/metric` computes them."""
+    metric_details = result.get("info", {}).get("metric_details") or {}
+    context = metric_details.get("contexts", "")
+    answer = metric_details.get("answer", result.get("message", ""))
+    scores = await asyncio.to_thread(get_ragas_metrics, question, [str(context)], [str(answer)], model)
+    if scores is None or "error" in scores:
+        return {"error": (scores or {}).get("error", "Ragas evaluation returned null")}
+    return {metric: values[0] for metric, values in scores.items()}
+
+async def abatch_QA_RAG(driver, uri, userName, password, database, model, items, concurrency=CHAT_BATCH_DEFAULT_CONCURRENCY, compute_metrics=False) -> AsyncIterator[Dict[str, Any]]:
+    """
+    [ENG]: Answer a batch of questions with `aQA_RAG`, at most `concurrency` at a time, and yield one record per question
+    as soon as it is answered (not in input order, use `index` or `id`). Every question is answered without a chat history,
+    no session is created and nothing is queued for summarization. The driver, vector stores and LLM setup are shared by the whole batch.
+
+    [IDN]: Menjawab sekumpulan pertanyaan dengan `aQA_RAG`, maksimal `concurrency` sekaligus, dan menghasilkan satu record per pertanyaan
+    segera setelah dijawab (tidak sesuai urutan input, gunakan `index` atau `id`). Setiap pertanyaan dijawab tanpa riwayat chat,
+    tidak ada sesi yang dibuat dan tidak ada yang diantrekan untuk peringkasan. Driver, vector store, dan setup LLM digunakan bersama oleh seluruh batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    batch_id = uuid.uuid4().hex
+
+    async def answer(item):
+        async with semaphore:
+            start_time = time.time()
+            record = {"type": "result", "index": item["index"], "id": item["id"], "question": item["question"], "mode": item["mode"]}
+            try:
+                result = await aQA_RAG(
+                    driver=driver, uri=uri, userName=userName, password=password, database=database, model=model,
+                    question=item["question"], document_names=json.dumps(item["document_names"]),
+                    session_id=f"batch-{batch_id}-{item['index']}", mode=item["mode"], store_history=False
+                )
+                record["status"] = "Failed" if result.get("info", {}).get("error") else "Success"
+                record["result"] = result
+                if compute_metrics and record["status"] == "Success":
+                    record["metrics"] = await acalculate_answer_metrics(item["question"], result, model)
+            except Exception as e:
+                logging.exception(f"Batch question {item['index']} failed: {e}")
+                record["status"] = "Failed"
+                record["error"] = str(e)
+            record["response_time"] = round(time.time() - start_time, 2)
+            return record
+
+    tasks = [asyncio.create_task(answer(item)) for item in items]
+    try:
+        for next_record in asyncio.as_completed(tasks):
+            yield await next_record
+    finally:
+        # The client went away or the batch failed: do not keep answering.
+        for task in tasks:
+            task.cancel()
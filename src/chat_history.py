@@ -0,0 +1,323 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, messages_from_dict
+from src.shared.constants import CHAT_HISTORY_CACHE_TTL_SECONDS, CHAT_HISTORY_CACHE_MAX_SESSIONS, CHAT_HISTORY_FLUSH_INTERVAL_SECONDS
+
+SESSION_NODE_LABEL = "Session"
+CHAT_HISTORY_WINDOW = 3
+
+GET_SESSION_MESSAGES_QUERY = """
+MATCH (s:`{node_label}`)-[:LAST_MESSAGE]->(last_message)
+WHERE s.id = $session_id
+MATCH p=(last_message)<-[:NEXT*0..{window}]-()
+WITH p, length(p) AS length
+ORDER BY length DESC LIMIT 1
+UNWIND reverse(nodes(p)) AS node
+RETURN {{data:{{content: node.content}}, type:node.type}} AS result
+"""
+
+# Appends all messages of a turn in a single write, keeping the LAST_MESSAGE / NEXT chain used by Neo4jChatMessageHistory.
+ADD_SESSION_MESSAGES_QUERY = """
+MERGE (s:`{node_label}` {{id:$session_id}})
+WITH s
+OPTIONAL MATCH (s)-[lm:LAST_MESSAGE]->(last_message)
+WITH s, lm, last_message
+UNWIND range(0, size($messages) - 1) AS index
+CREATE (new:Message)
+SET new += $messages[index]
+WITH s, lm, last_message, index, new
+ORDER BY index
+WITH s, lm, last_message, collect(new) AS new_messages
+FOREACH (index IN range(0, size(new_messages) - 2) |
+    FOREACH (previous IN [new_messages[index]] |
+        FOREACH (next IN [new_messages[index + 1]] |
+            CREATE (previous)-[:NEXT]->(next))))
+FOREACH (previous IN CASE WHEN last_message IS NULL THEN [] ELSE [last_message] END |
+    FOREACH (first IN [new_messages[0]] |
+        CREATE (previous)-[:NEXT]->(first)))
+DELETE lm
+WITH s, new_messages
+FOREACH (last IN [new_messages[-1]] |
+    CREATE (s)-[:LAST_MESSAGE]->(last))
+"""
+
+CLEAR_SESSION_MESSAGES_QUERY = """
+MATCH (s:`{node_label}`)-[:LAST_MESSAGE]->(last_message)
+WHERE s.id = $session_id
+MATCH p=(last_message)<-[:NEXT*0..]-()
+WITH p, length(p) AS length
+ORDER BY length DESC LIMIT 1
+UNWIND nodes(p) AS node
+DETACH DELETE node
+"""
+
+class Neo4jSessionChatHistory(BaseChatMessageHistory):
+    """
+    [ENG]: Chat message history stored in Neo4j with the same graph layout as `Neo4jChatMessageHistory`
+    (`Session` -[:LAST_MESSAGE]-> `Message` <-[:NEXT]- ...), usable from sync and async code.
+    Sync methods use `driver`, async methods use `async_driver`, so async callers never block a thread on database I/O.
+    Unlike `Neo4jChatMessageHistory`, the drivers are shared and never closed by the history object.
+
+    [IDN]: Riwayat pesan chat yang disimpan di Neo4j dengan struktur graf yang sama seperti `Neo4jChatMessageHistory`
+    (`Session` -[:LAST_MESSAGE]-> `Message` <-[:NEXT]- ...), dapat digunakan dari kode sync maupun async.
+    Method sync menggunakan `driver`, method async menggunakan `async_driver`, sehingga pemanggil async tidak memblokir thread untuk I/O database.
+    Berbeda dengan `Neo4jChatMessageHistory`, driver digunakan bersama dan tidak pernah ditutup oleh objek riwayat.
+    """
+
+    def __init__(self, session_id, driver=None, async_driver=None, database: Optional[str] = None,
+                 node_label: str = SESSION_NODE_LABEL, window: int = CHAT_HISTORY_WINDOW):
+        if not session_id:
+            raise ValueError("Please ensure that the session_id parameter is provided")
+        if driver is None and async_driver is None:
+            raise ValueError("Either a sync or an async Neo4j driver is required")
+        self._session_id = session_id
+        self._driver = driver
+        self._async_driver = async_driver
+        self._database = database
+        self._node_label = node_label
+        self._window = window
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    def _messages_query(self):
+        return GET_SESSION_MESSAGES_QUERY.format(node_label=self._node_label, window=self._window * 2)
+
+    def _add_query(self):
+        return ADD_SESSION_MESSAGES_QUERY.format(node_label=self._node_label)
+
+    def _clear_query(self):
+        return CLEAR_SESSION_MESSAGES_QUERY.format(node_label=self._node_label)
+
+    @staticmethod
+    def _to_rows(messages: Sequence[BaseMessage]):
+        return [{"type": message.type, "content": message.content} for message in messages]
+
+    def _require_sync_driver(self):
+        if self._driver is None:
+            raise RuntimeError("This chat history was created with an async driver only, use the async methods.")
+        return self._driver
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """Retrieve the messages from Neo4j"""
+        records, _, _ = self._require_sync_driver().execute_query(
+            self._messages_query(), {"session_id": self._session_id}, database_=self._database
+        )
+        return messages_from_dict([record["result"] for record in records])
+
+    @messages.setter
+    def messages(self, messages: List[BaseMessage]) -> None:
+        raise NotImplementedError("Direct assignment to 'messages' is not allowed. Use the 'add_messages' instead.")
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append the messages to the session in one write"""
+        if not messages:
+            return
+        self._require_sync_driver().execute_query(
+            self._add_query(), {"session_id": self._session_id, "messages": self._to_rows(messages)}, database_=self._database
+        )
+
+    def clear(self) -> None:
+        """Clear session memory from Neo4j"""
+        self._require_sync_driver().execute_query(
+            self._clear_query(), {"session_id": self._session_id}, database_=self._database
+        )
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        if self._async_driver is None:
+            return await super().aget_messages()
+        records, _, _ = await self._async_driver.execute_query(
+            self._messages_query(), {"session_id": self._session_id}, database_=self._database
+        )
+        return messages_from_dict([record["result"] for record in records])
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if self._async_driver is None:
+            return await super().aadd_messages(messages)
+        if not messages:
+            return
+        await self._async_driver.execute_query(
+            self._add_query(), {"session_id": self._session_id, "messages": self._to_rows(messages)}, database_=self._database
+        )
+
+    async def aclear(self) -> None:
+        if self._async_driver is None:
+            return await super().aclear()
+        await self._async_driver.execute_query(
+            self._clear_query(), {"session_id": self._session_id}, database_=self._database
+        )
+        logging.info(f"Cleared chat history for session ID: {self._session_id}")
+
+APPEND_OPERATION = "append"
+CLEAR_OPERATION = "clear"
+
+class _CachedSession:
+    def __init__(self, key, backing):
+        self.key = key
+        self.backing = backing
+        self.messages = None
+        self.loaded_at = 0
+        self.pending = []
+        self.lock = asyncio.Lock()
+
+class WriteBehindChatHistoryCache:
+    """
+    [ENG]: In-process cache of the Neo4j chat histories used by the async chat path.
+    Each session keeps the same message window that Neo4j would return, so a chat turn reads its history from memory.
+    Writes update the cached window immediately and are queued per session; a background task flushes them every
+    `flush_interval` seconds, compacted to at most one clear and one append per session, in the order they were made.
+    Entries older than `ttl_seconds` (a few seconds) are re-read from Neo4j, so another worker's writes become visible after the TTL.
+    Within the TTL a worker does not see the writes of the other workers (or their unflushed writes), so the cache is only
+    safe when the load balancer routes all requests of a session to the same worker (session-affine routing).
+
+    [IDN]: Cache in-process untuk riwayat chat Neo4j yang digunakan oleh jalur chat async.
+    Setiap sesi menyimpan jendela pesan yang sama dengan yang akan dikembalikan Neo4j, sehingga satu giliran chat membaca riwayatnya dari memori.
+    Penulisan langsung memperbarui jendela di cache dan diantrekan per sesi; task latar belakang menulisnya setiap
+    `flush_interval` detik, diringkas menjadi maksimal satu clear dan satu append per sesi, sesuai urutan penulisannya.
+    Entri yang lebih lama dari `ttl_seconds` (beberapa detik) dibaca ulang dari Neo4j, sehingga penulisan worker lain terlihat setelah TTL.
+    Selama TTL sebuah worker tidak melihat penulisan worker lain (atau penulisan mereka yang belum di-flush), sehingga cache hanya
+    aman jika load balancer mengarahkan semua request sebuah sesi ke worker yang sama (session-affine routing).
+    """
+    def __init__(self, window=CHAT_HISTORY_WINDOW, ttl_seconds=CHAT_HISTORY_CACHE_TTL_SECONDS, max_sessions=CHAT_HISTORY_CACHE_MAX_SESSIONS, flush_interval=CHAT_HISTORY_FLUSH_INTERVAL_SECONDS):
+        self.window_size = window * 2 + 1
+        self.window = window
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.flush_interval = flush_interval
+        self._sessions = OrderedDict()
+        self._flush_task = None
+
+    def get_history(self, session_id, driver, database=None):
+        key = (id(driver), database, session_id)
+        state = self._sessions.get(key)
+        if state is None:
+            state = _CachedSession(key, Neo4jSessionChatHistory(session_id=session_id, async_driver=driver, database=database, window=self.window))
+            self._sessions[key] = state
+            self._evict()
+        else:
+            self._sessions.move_to_end(key)
+        return CachedChatMessageHistory(self, state)
+
+    def _evict(self):
+        # Only sessions without unflushed writes can be dropped.
+        for key in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if not self._sessions[key].pending:
+                del self._sessions[key]
+
+    def _resolve(self, state):
+        # A history object may outlive the eviction of its session, its writes go to the session currently cached.
+        current = self._sessions.get(state.key)
+        if current is None:
+            self._sessions[state.key] = state
+            return state
+        return current
+
+    def _apply(self, messages, operations):
+        for operation, batch in operations:
+            messages = [] if operation == CLEAR_OPERATION else (messages + batch)[-self.window_size:]
+        return messages
+
+    async def load(self, state):
+        state = self._resolve(state)
+        if state.messages is not None and time.monotonic() - state.loaded_at < self.ttl_seconds:
+            return state.messages
+        async with state.lock:
+            if state.pending:
+                await self._flush_locked(state)
+            messages = await state.backing.aget_messages()
+            # Writes made while Neo4j was being read are still pending, apply them on top.
+            state.messages = self._apply(messages, state.pending)
+            state.loaded_at = time.monotonic()
+        return state.messages
+
+    def write(self, state, operation, messages=None):
+        state = self._resolve(state)
+        operations = [(operation, list(messages or []))]
+        state.pending.extend(operations)
+        if operation == CLEAR_OPERATION:
+            state.messages = []
+            state.loaded_at = time.monotonic()
+        elif state.messages is not None:
+            state.messages = self._apply(state.messages, operations)
+        self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while any(state.pending for state in list(self._sessions.values())):
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def _flush_locked(self, state):
+        operations, state.pending = state.pending, []
+        clear = any(operation == CLEAR_OPERATION for operation, _ in operations)
+        if clear:
+            last_clear = max(index for index, (operation, _) in enumerate(operations) if operation == CLEAR_OPERATION)
+            operations = operations[last_clear + 1:]
+        messages = [message for _, batch in operations for message in batch]
+        try:
+            if clear:
+                await state.backing.aclear()
+            if messages:
+                await state.backing.aadd_messages(messages)
+        except Exception:
+            # Keep the writes (in order) for the next flush.
+            state.pending = ([(CLEAR_OPERATION, [])] if clear else []) + [(APPEND_OPERATION, messages)] + state.pending
+            raise
+
+    async def flush(self):
+        for state in list(self._sessions.values()):
+            if not state.pending:
+                continue
+            async with state.lock:
+                try:
+                    await self._flush_locked(state)
+                except Exception as e:
+                    logging.error(f"Failed to flush chat history for session ID {state.backing.session_id}: {e}")
+
+    async def close(self):
+        """Flush every pending write, used on shutdown."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+class CachedChatMessageHistory(BaseChatMessageHistory):
+    """
+    [ENG]: Chat history of one session served by `WriteBehindChatHistoryCache`. Only the async methods are supported.
+    [IDN]: Riwayat chat satu sesi yang dilayani oleh `WriteBehindChatHistoryCache`. Hanya method async yang didukung.
+    """
+    def __init__(self, cache, state):
+        self._cache = cache
+        self._state = state
+
+    @property
+    def session_id(self):
+        return self._state.backing.session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        raise NotImplementedError("CachedChatMessageHistory only supports async access, use `aget_messages`.")
+
+    def clear(self) -> None:
+        raise NotImplementedError("CachedChatMessageHistory only supports async access, use `aclear`.")
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        return list(await self._cache.load(self._state))
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if messages:
+            self._cache.write(self._state, APPEND_OPERATION, messages)
+
+    async def aclear(self) -> None:
+        self._cache.write(self._state, CLEAR_OPERATION)
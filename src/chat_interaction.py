@@ -1,14 +1,220 @@
-import json
+import os
+import time
+import asyncio
 import logging
 from datetime import datetime
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, AsyncIterator
+from pydantic import BaseModel, Field
 from langchain.schema import SystemMessage, HumanMessage, AIMessage
-from src.QA_integration import get_history_by_session_id, get_total_tokens
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
+from src.QA_integration import get_history_by_session_id, get_total_tokens, format_chat_event, EMBEDDING_FUNCTION
+from src.symptom_classifier import EmbeddingSymptomClassifier, classify_symptom_message
+from src.symptom_state import create_symptom_state_store, format_symptom_state, build_symptom_question
+from src.diagnosis_index import create_diagnosis_index_registry
 from src.llm import get_llm
 
 logging.basicConfig(format='%(asctime)s - %(message)s',level='INFO')
 
-def chat_interaction(
+SYMPTOM_EMBEDDING_CLASSIFIER = EmbeddingSymptomClassifier(EMBEDDING_FUNCTION)
+# Symptoms collected over the consultation, same backend as the local chat sessions.
+SYMPTOM_STATES = create_symptom_state_store(os.getenv('CHAT_SESSION_STORE', 'memory'), os.getenv('CHAT_SESSION_STORE_PATH', 'chat_sessions.db'))
+# Symptom to disease indexes stored in the graph by the `build_diagnosis_index` post-processing task.
+DIAGNOSIS_INDEXES = create_diagnosis_index_registry()
+
+def build_patient_context(context: Optional[Dict] = None) -> str:
+    """
+    [ENG]: Build the patient information block used in the doctor system prompt.
+    [IDN]: Membangun blok informasi pasien yang digunakan pada system prompt dokter.
+    """
+    if not context:
+        return ""
+    return (
+        f"Informasi Pasien:\n"
+        f"Nama: {context.get('name', 'Tidak disebutkan')}\n"
+        f"Usia: {context.get('age', 'Tidak disebutkan')}\n"
+        f"Berat Badan: {context.get('weight', 'Tidak disebutkan')} kg\n"
+        f"Tinggi Badan: {context.get('height', 'Tidak disebutkan')} cm\n"
+        f"Deskripsi: {context.get('description', 'Tidak ada deskripsi tambahan')}\n\n"
+    )
+
+def build_system_prompt(context_str: str, diagnosis: bool, disease_context: Optional[str] = None) -> str:
+    """
+    [ENG]: Build the doctor system prompt for the diagnosis (informational) or consultation mode.
+    [IDN]: Membangun system prompt dokter untuk mode diagnosis (informasi) atau konsultasi.
+    """
+    if diagnosis:
+        return (
+            f"Anda adalah seorang dokter yang memberikan informasi kepada pasien penderita penyakit. "
+            f"{context_str}"
+            "Berikan penjelasan berdasarkan konteks penyakit pasien yang ada."
+            "Apabila tidak ada konteks yang relevan, berikan informasi umum dan jangan membuat informasi baru."
+            "Jelaskan dengan bahasa yang mudah dipahami."
+            "Jangan lakukan penanganan, hanya berikan informasi."
+            "Tidak perlu memperkenalkan diri Anda."
+            "Jawab dalam maksimum 2 kalimat."
+            "Jawab dalam bahasa Indonesia."
+            f"Penyakit pasien: {disease_context}"
+        )
+    return (
+        f"Ada seorang pasien dengan, {context_str}"
+        "Anda adalah seorang dokter yang sedang memberikan konsultasi."
+        "Selalu tanyakan gejala lain yang dirasakan pasien."
+        "Fokus pada pengumpulan informasi yang relevan untuk diagnosis."
+        "Jangan sebut nama penyakit apapun."
+        "Jawab dalam kurang dari 14 kata."
+    )
+
+def build_extraction_prompt(human_messages: str, previous_ai_message: Optional[str] = None) -> str:
+    """
+    [ENG]: Build the prompt that extracts the symptoms mentioned in the patient message as JSON.
+    [IDN]: Membangun prompt untuk mengekstrak gejala yang disebutkan pada pesan pasien dalam format JSON.
+    """
+    return (
+        "Analisis pesan pasien berikut dan ekstrak apabila terdapat keluhan medis atau gejala dalam format JSON.\n"
+        
+        # Add context from previous AI message if available
+        f"{'Pertanyaan sebelumnya dari dokter: ' + previous_ai_message if previous_ai_message else ''}\n\n"
+        
+        "Berikan hasil dalam format JSON:\n"
+        "{\n"
+        '  "gejala": ["pusing", "batuk", "lemas"],\n'
+        '  "tidak_ada": ["demam"]\n'
+        "}\n\n"
+
+        "Contoh:\n"
+        "Pertanyaan: 'Apakah Anda merasa pusing atau mual?'\n"
+        "Pesan Pasien: 'Engga, tetapi saya kesulitan ereksi'\n"
+        "Jawaban: { \"gejala\": [\"kesulitan ereksi\"], \"tidak_ada\": [\"pusing\", \"mual\"]}\n\n"
+
+        "Contoh:\n"
+        "Pertanyaan: 'Apakah Anda merasa pusing atau mual?'\n"
+        "Pesan Pasien: 'Iya'\n"
+        "Jawaban: { \"gejala\": [\"pusing\", \"mual\"], \"tidak_ada\": []}\n\n"
+        
+        "Catatan penting:\n"
+        "- Jika pasien menjawab 'ya', 'iya', 'ada', 'betul', dll. terhadap pertanyaan tentang gejala tertentu, ekstrak gejala tersebut\n"
+        "- Gunakan konteks dari pertanyaan sebelumnya untuk memahami jawaban pasien yang singkat\n"
+        "- Jika pasien menyangkal gejala yang ditanyakan ('tidak', 'engga', dll.), masukkan gejala tersebut ke \"tidak_ada\"\n"
+        "- Apabila tidak ada gejala, isi dengan { \"gejala\": [], \"tidak_ada\": []}\n\n"
+        
+        "Hanya jawab dengan format JSON.\n"
+        f"Pesan pasien: {human_messages}"
+    )
+
+def start_chat_turn(chat_history, system_prompt: str, human_messages: str) -> List:
+    """
+    [ENG]: Save the patient message (and the system prompt of a new session) to the history and return the whole conversation.
+    The history may live in another process (see src/session_store.py), so the returned list is a copy.
+    [IDN]: Menyimpan pesan pasien (dan system prompt untuk sesi baru) ke riwayat dan mengembalikan seluruh percakapan.
+    Riwayat dapat berada di proses lain (lihat src/session_store.py), sehingga list yang dikembalikan adalah salinan.
+    """
+    messages = list(chat_history.messages)
+    new_messages = [] if messages else [SystemMessage(content=system_prompt)]
+    new_messages.append(HumanMessage(content=human_messages))
+    chat_history.add_messages(new_messages)
+    return messages + new_messages
+
+def get_previous_ai_message(messages: List) -> Optional[str]:
+    """
+    [ENG]: Return the doctor question that the latest patient message answers, if any.
+    [IDN]: Mengembalikan pertanyaan dokter yang dijawab oleh pesan pasien terakhir, jika ada.
+    """
+    if len(messages) >= 2 and isinstance(messages[-1], HumanMessage) and isinstance(messages[-2], AIMessage):
+        return messages[-2].content
+    return None
+
+class SymptomExtraction(BaseModel):
+    """Symptoms mentioned by the patient (gejala yang disebutkan pasien)."""
+    gejala: List[str] = Field(default_factory=list, description="Daftar gejala atau keluhan medis pasien")
+    tidak_ada: List[str] = Field(default_factory=list, description="Daftar gejala yang disangkal pasien")
+
+def get_symptom_extractor(llm):
+    """
+    [ENG]: Runnable that returns the extracted symptoms as `SymptomExtraction`. Uses the structured output of the model
+    when available, otherwise the JSON answer is parsed (code fences and surrounding text are tolerated).
+    [IDN]: Runnable yang mengembalikan gejala hasil ekstraksi sebagai `SymptomExtraction`. Menggunakan structured output model
+    jika tersedia, jika tidak jawaban JSON di-parse (code fence dan teks di sekitarnya ditoleransi).
+    """
+    try:
+        return llm.with_structured_output(SymptomExtraction)
+    except NotImplementedError:
+        return llm | JsonOutputParser(pydantic_object=SymptomExtraction)
+
+def parse_symptoms(symptom_response) -> Optional[Dict]:
+    """
+    [ENG]: Normalize the answer of the symptom extractor to `{"gejala": [...], "tidak_ada": [...]}` (mentioned and denied symptoms).
+    [IDN]: Menormalkan jawaban ekstraktor gejala menjadi `{"gejala": [...], "tidak_ada": [...]}` (gejala yang disebutkan dan disangkal).
+    """
+    logging.info(f"Symptom extraction response: {symptom_response}")
+
+    if isinstance(symptom_response, SymptomExtraction):
+        return {"gejala": symptom_response.gejala, "tidak_ada": symptom_response.tidak_ada}
+    if isinstance(symptom_response, dict):
+        parsed = {}
+        for key in ("gejala", "tidak_ada"):
+            symptoms = symptom_response.get(key) or []
+            parsed[key] = [str(symptom) for symptom in symptoms] if isinstance(symptoms, list) else [str(symptoms)]
+        return parsed
+    logging.warning("Failed to parse symptom extraction output")
+    return {"gejala": [], "tidak_ada": []}
+
+async def aextract_symptoms(llm, human_messages: str, messages: List) -> Optional[Dict]:
+    """
+    [ENG]: Extract the symptoms of the latest patient message. `messages` must already contain the patient message.
+    [IDN]: Mengekstrak gejala dari pesan pasien terakhir. `messages` harus sudah berisi pesan pasien tersebut.
+    """
+    extraction_prompt = build_extraction_prompt(human_messages, get_previous_ai_message(messages))
+    try:
+        symptom_response = await get_symptom_extractor(llm).ainvoke([HumanMessage(content=extraction_prompt)])
+    except OutputParserException as e:
+        logging.warning(f"Failed to parse symptom extraction output: {e}")
+        symptom_response = None
+    except Exception as e:
+        # The extraction runs next to the doctor reply, a failing extractor must not fail the chat turn.
+        logging.error(f"Symptom extraction failed: {e}", exc_info=True)
+        return {"gejala": [], "tidak_ada": []}
+    return parse_symptoms(symptom_response)
+
+async def atimed_extract_symptoms(llm, human_messages: str, messages: List, timings: Dict[str, float]) -> Optional[Dict]:
+    start_time = time.time()
+    try:
+        return await aextract_symptoms(llm, human_messages, messages)
+    finally:
+        timings["symptom_extraction"] = round(time.time() - start_time, 2)
+
+def record_symptoms(session_id: str, symptoms_summary: Optional[Dict]) -> Optional[Dict]:
+    """
+    [ENG]: Merge the symptoms of this turn into the symptom state of the session and return the updated state.
+    [IDN]: Menggabungkan gejala giliran ini ke state gejala sesi dan mengembalikan state yang diperbarui.
+    """
+    if symptoms_summary is None:
+        return None
+    try:
+        return format_symptom_state(session_id, SYMPTOM_STATES.update(session_id, symptoms_summary))
+    except Exception as e:
+        logging.error(f"Failed to update the symptom state of session '{session_id}': {e}")
+        return None
+
+def get_symptom_state(session_id: str) -> Dict[str, Any]:
+    """
+    [ENG]: Symptoms collected over the consultation of a session: `symptoms`, `negated`, `turns` and `updated_at`.
+    [IDN]: Gejala yang terkumpul selama konsultasi sebuah sesi: `symptoms`, `negated`, `turns`, dan `updated_at`.
+    """
+    return format_symptom_state(session_id, SYMPTOM_STATES.get(session_id))
+
+def get_symptom_question(session_id: str) -> Optional[str]:
+    """
+    [ENG]: Diagnosis question built from the symptom state of a session, None when no symptom was collected.
+    [IDN]: Pertanyaan diagnosis yang dibangun dari state gejala sebuah sesi, None jika belum ada gejala yang terkumpul.
+    """
+    state = get_symptom_state(session_id)
+    return build_symptom_question(state["symptoms"], state["negated"])
+
+def clear_symptom_state(session_id: str):
+    SYMPTOM_STATES.clear(session_id)
+
+async def achat_interaction(
     model: str,
     human_messages: str,
     session_id: str,
@@ -17,144 +223,122 @@ def chat_interaction(
     disease_context: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    [ENG]: Handle medical chat interactions with diagnosis and informational modes.
-    [IDN]: Mengelola interaksi obrolan medis dengan mode diagnosis dan informasi.
-
-    Args:
-        model: LLM model instance (Groq or Diffbot)
-        human_messages: Current user message
-        session_id: Unique session identifier for chat history
-        context: User context including age, name, weight, height (JSON)
-        diagnosis: Boolean flag for diagnosis mode
-        disease_context: Specific disease context for informational mode
-        is_initial: bool = False
-    
-    Returns:
-        Dict containing response, symptoms (if applicable), and chat metadata
+    [ENG]: Answer the patient message and extract its symptoms at the same time. The LLM calls are awaited and the
+    chat history and symptom store calls (which may block on SQLite or another process) run in a worker thread.
+    [IDN]: Menjawab pesan pasien dan mengekstrak gejalanya secara bersamaan. Pemanggilan LLM di-await dan
+    pemanggilan riwayat chat serta penyimpanan gejala (yang dapat memblokir pada SQLite atau proses lain) berjalan di thread worker.
     """
     try:
         llm, model_name = get_llm(model)
-        chat_history = get_history_by_session_id(session_id)
-        messages = chat_history.messages
-
-        context_str = ""
-        if context:
-            context_str = (
-                f"Informasi Pasien:\n"
-                f"Nama: {context.get('name', 'Tidak disebutkan')}\n"
-                f"Usia: {context.get('age', 'Tidak disebutkan')}\n"
-                f"Berat Badan: {context.get('weight', 'Tidak disebutkan')} kg\n"
-                f"Tinggi Badan: {context.get('height', 'Tidak disebutkan')} cm\n"
-                f"Deskripsi: {context.get('description', 'Tidak ada deskripsi tambahan')}\n\n"
-            )
+        chat_history = await asyncio.to_thread(get_history_by_session_id, session_id)
+        system_prompt = build_system_prompt(build_patient_context(context), diagnosis, disease_context)
+        messages = await asyncio.to_thread(start_chat_turn, chat_history, system_prompt, human_messages)
+
+        timings = {}
+
+        async def areply():
+            reply_start_time = time.time()
+            try:
+                return await llm.ainvoke(list(messages))
+            finally:
+                timings["reply"] = round(time.time() - reply_start_time, 2)
 
         if diagnosis:
-            system_prompt = (
-                f"Anda adalah seorang dokter yang memberikan informasi kepada pasien penderita penyakit. "
-                f"{context_str}"
-                "Berikan penjelasan berdasarkan konteks penyakit pasien yang ada."
-                "Apabila tidak ada konteks yang relevan, berikan informasi umum dan jangan membuat informasi baru."
-                "Jelaskan dengan bahasa yang mudah dipahami."
-                "Jangan lakukan penanganan, hanya berikan informasi."
-                "Tidak perlu memperkenalkan diri Anda."
-                "Jawab dalam maksimum 2 kalimat."
-                "Jawab dalam bahasa Indonesia."
-                f"Penyakit pasien: {disease_context}"
-            )
+            symptoms_summary, chat_response = None, await areply()
         else:
-            system_prompt = (
-                f"Ada seorang pasien dengan, {context_str}"
-                "Anda adalah seorang dokter yang sedang memberikan konsultasi."
-                "Selalu tanyakan gejala lain yang dirasakan pasien."
-                "Fokus pada pengumpulan informasi yang relevan untuk diagnosis."
-                "Jangan sebut nama penyakit apapun."
-                "Jawab dalam kurang dari 14 kata."
-            )
-
-        if not messages:
-            chat_history.add_message(SystemMessage(content=system_prompt))
-        
-        chat_history.add_message(HumanMessage(content=human_messages))
-
-        if not diagnosis:
-            # Get previous AI message if it exists
-            previous_ai_message = None
-            if len(messages) >= 2 and isinstance(messages[-1], HumanMessage) and isinstance(messages[-2], AIMessage):
-                previous_ai_message = messages[-2].content
-            
-            extraction_prompt = (
-                "Analisis pesan pasien berikut dan ekstrak apabila terdapat keluhan medis atau gejala dalam format JSON.\n"
-                
-                # Add context from previous AI message if available
-                f"{'Pertanyaan sebelumnya dari dokter: ' + previous_ai_message if previous_ai_message else ''}\n\n"
-                
-                "Berikan hasil dalam format JSON:\n"
-                "{\n"
-                '  "gejala": ["pusing", "batuk", "lemas"]\n'
-                "}\n\n"
-
-                "Contoh:\n"
-                "Pertanyaan: 'Apakah Anda merasa pusing atau mual?'\n"
-                "Pesan Pasien: 'Engga, tetapi saya kesulitan ereksi'\n"
-                "Jawaban: { \"gejala\": [\"kesulitan ereksi\"]}\n\n"
-
-                "Contoh:\n"
-                "Pertanyaan: 'Apakah Anda merasa pusing atau mual?'\n"
-                "Pesan Pasien: 'Iya'\n"
-                "Jawaban: { \"gejala\": [\"pusing\", \"mual\"]}\n\n"
-                
-                "Catatan penting:\n"
-                "- Jika pasien menjawab 'ya', 'iya', 'ada', 'betul', dll. terhadap pertanyaan tentang gejala tertentu, ekstrak gejala tersebut\n"
-                "- Gunakan konteks dari pertanyaan sebelumnya untuk memahami jawaban pasien yang singkat\n"
-                "- Apabila tidak ada gejala, isi dengan { \"gejala\": []}\n\n"
-                
-                "Hanya jawab dengan format JSON.\n"
-                f"Pesan pasien: {human_messages}"
-            )
-            
-            symptom_response = llm.invoke([HumanMessage(content=extraction_prompt)])
-            print(symptom_response)
-            
-            if isinstance(symptom_response, AIMessage):
-                extracted_symptoms = symptom_response.content.strip()
-            else:
-                extracted_symptoms = "{}"
-
-        # Get llm response for the main conversation
-        chat_response = llm.invoke(messages)
+            symptoms_summary, chat_response = await asyncio.gather(atimed_extract_symptoms(llm, human_messages, messages, timings), areply())
         total_tokens = get_total_tokens(chat_response, llm)
-        
-        # Process symptoms if in consultation mode
-        symptoms_summary = None
-        if not diagnosis and extracted_symptoms:
-            try:
-                symptoms_summary = json.loads(extracted_symptoms)
-            except json.JSONDecodeError:
-                logging.warning("Failed to parse symptom extraction JSON")
-                symptoms_summary = {
-                    "gejala": [],
-                }
 
-        # Save AI response to history
-        chat_history.add_message(AIMessage(content=chat_response.content))
+        await asyncio.to_thread(chat_history.add_message, AIMessage(content=chat_response.content))
+        symptom_state = await asyncio.to_thread(record_symptoms, session_id, symptoms_summary)
 
         return {
             "session_id": session_id,
             "message": chat_response.content,
             "symptoms_summary": symptoms_summary,
+            "symptom_state": symptom_state,
             "timestamp": datetime.now().isoformat(),
             "info": {
                 "model": model_name,
                 "total_tokens": total_tokens,
                 "response_time": 0,
+                "timings": timings,
             },
             "user": "chatbot"
         }
 
     except Exception as e:
-        logging.error(f"Error in chat_interaction: {str(e)}")
+        logging.error(f"Error in achat_interaction: {str(e)}")
         raise Exception(f"Failed to process chat interaction: {str(e)}")
-    
+
+async def achat_interaction_stream(
+    model: str,
+    human_messages: str,
+    session_id: str,
+    context: Optional[Dict] = None,
+    diagnosis: bool = False,
+    disease_context: Optional[str] = None
+) -> AsyncIterator[Dict[str, str]]:
+    """
+    [ENG]: Streaming variant of `achat_interaction`, yields `token` events, then a `metadata` event with the response (or an `error` event).
+    [IDN]: Varian streaming dari `achat_interaction`, menghasilkan event `token`, lalu event `metadata` berisi respons (atau event `error`).
+    """
+    start_time = time.time()
+    try:
+        llm, model_name = get_llm(model)
+        chat_history = await asyncio.to_thread(get_history_by_session_id, session_id)
+        system_prompt = build_system_prompt(build_patient_context(context), diagnosis, disease_context)
+        messages = await asyncio.to_thread(start_chat_turn, chat_history, system_prompt, human_messages)
+
+        timings = {}
+        symptoms_task = None
+        if not diagnosis:
+            symptoms_task = asyncio.create_task(atimed_extract_symptoms(llm, human_messages, messages, timings))
+
+        reply_start_time = time.time()
+        chat_response = None
+        try:
+            async for chunk in llm.astream(list(messages)):
+                chat_response = chunk if chat_response is None else chat_response + chunk
+                if chunk.content:
+                    yield format_chat_event("token", {"token": chunk.content})
+        except BaseException:
+            if symptoms_task is not None:
+                symptoms_task.cancel()
+            raise
+        finally:
+            # Save whatever was generated, also when the client disconnects in the middle of the stream.
+            if chat_response is not None and chat_response.content:
+                # Shielded, so a cancelled request still finishes the write.
+                await asyncio.shield(asyncio.to_thread(chat_history.add_message, AIMessage(content=chat_response.content)))
+
+        timings["reply"] = round(time.time() - reply_start_time, 2)
+        total_tokens = get_total_tokens(chat_response, llm) if chat_response is not None else 0
+        symptoms_summary = await symptoms_task if symptoms_task is not None else None
+        symptom_state = await asyncio.to_thread(record_symptoms, session_id, symptoms_summary)
+        yield format_chat_event("metadata", {
+            "session_id": session_id,
+            "message": chat_response.content if chat_response is not None else "",
+            "symptoms_summary": symptoms_summary,
+            "symptom_state": symptom_state,
+            "timestamp": datetime.now().isoformat(),
+            "info": {
+                "model": model_name,
+                "total_tokens": total_tokens,
+                "response_time": round(time.time() - start_time, 2),
+                "timings": timings,
+            },
+            "user": "chatbot"
+        })
+
+    except Exception as e:
+        logging.error(f"Error in achat_interaction_stream: {str(e)}")
+        yield format_chat_event("error", {
+            "session_id": session_id,
+            "message": "Failed to process chat interaction",
+            "error": str(e),
+        })
+
 def initial_greeting(session_id: str, context: Optional[Dict] = None) -> Dict[str, Any]:
     """
     [ENG]: Generate the initial greeting message for medical consultation.
@@ -186,34 +370,14 @@ def initial_greeting(session_id: str, context: Optional[Dict] = None) -> Dict[st
         "user": "chatbot"
     }
 
-def check_if_chat_is_symptoms(human_messages: str, model: str, session_id: str) -> bool:
+def llm_check_if_chat_is_symptoms(human_messages: str, model: str, previous_ai_message: Optional[str] = None) -> bool:
     """
-    [ENG]: Check if the chat message contains symptoms extraction request.
-    [IDN]: Periksa apakah pesan obrolan berisi permintaan ekstraksi gejala.
-   
-    Args:
-        human_messages: User chat message
-        model: Model name/identifier for the LLM
-       
-    Returns:
-        Boolean flag indicating if the chat message is a symptom extraction request
+    [ENG]: LLM tier of the symptom check, asks the model whether the message is about symptoms.
+    [IDN]: Tingkat LLM dari pemeriksaan gejala, menanyakan ke model apakah pesan membahas gejala.
     """
     try:
         llm, model_name = get_llm(model)
-        
-        # Get chat history using session_id
-        chat_history = get_history_by_session_id(session_id)
-        messages = chat_history.messages
-        
-        # Get previous AI message if it exists
-        previous_ai_message = None
-        if len(messages) >= 1 and isinstance(messages[-1], HumanMessage):
-            # Find the most recent AI message before the current human message
-            for i in range(len(messages)-2, -1, -1):
-                if isinstance(messages[i], AIMessage):
-                    previous_ai_message = messages[i].content
-                    break
-        
+
         system_prompt = (
             "Anda adalah seorang dokter yang ahli dalam mendeteksi apakah seseorang sedang "
             "membicarakan tentang gejala penyakit atau kondisi kesehatan mereka. "
@@ -263,8 +427,42 @@ def check_if_chat_is_symptoms(human_messages: str, model: str, session_id: str)
         return any(indicator in result for indicator in positive_indicators)
        
     except Exception as e:
-        logging.error(f"Error in check_if_chat_is_symptoms: {str(e)}")
+        logging.error(f"Error in llm_check_if_chat_is_symptoms: {str(e)}")
         # Default to True in case of error to be safe
         return True
 
+def get_last_ai_message(messages: List) -> Optional[str]:
+    for message in reversed(messages):
+        if isinstance(message, AIMessage):
+            return message.content
+    return None
+
+def classify_chat_symptoms(human_messages: str, model: str, session_id: str) -> Dict[str, Any]:
+    """
+    [ENG]: Check if the chat message is about symptoms. Obvious messages are decided locally (lexicon, then embedding similarity),
+    the LLM is only asked when both are unsure. Returns `is_symptoms` with the deciding `tier`, `confidence` and `latency`.
+    [IDN]: Periksa apakah pesan obrolan membahas gejala. Pesan yang jelas diputuskan secara lokal (leksikon, lalu kemiripan embedding),
+    LLM hanya ditanya jika keduanya tidak yakin. Mengembalikan `is_symptoms` beserta `tier` yang memutuskan, `confidence`, dan `latency`.
+
+    Args:
+        human_messages: User chat message
+        model: Model name/identifier for the LLM fallback
+        session_id: Session whose last doctor question gives the context of short answers
+    """
+    # The message is checked before it is added to the history, so the last AI message is the doctor question it answers.
+    previous_ai_message = get_last_ai_message(get_history_by_session_id(session_id).messages)
+    return classify_symptom_message(
+        human_messages,
+        previous_ai_message,
+        embedding_classifier=SYMPTOM_EMBEDDING_CLASSIFIER,
+        llm_classifier=lambda message, previous: llm_check_if_chat_is_symptoms(message, model, previous),
+    )
+
+def check_if_chat_is_symptoms(human_messages: str, model: str, session_id: str) -> bool:
+    """
+    [ENG]: Check if the chat message contains symptoms extraction request, see `classify_chat_symptoms`.
+    [IDN]: Periksa apakah pesan obrolan berisi permintaan ekstraksi gejala, lihat `classify_chat_symptoms`.
+    """
+    return classify_chat_symptoms(human_messages, model, session_id)["is_symptoms"]
+
 # print(chat_interaction("groq_llama3_70b", "Akhir-akhir ini saya ngerasa kepala sering nggeliyeng kepala serasa muter muter gitu dok.", "1", {"name": "Budi", "age": 30, "weight": 70, "height": 170, "description": "Ada riwayat diabetes"}, False, None))
\ No newline at end of file
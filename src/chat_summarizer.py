@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from src.shared.constants import CHAT_SUMMARY_MESSAGE_THRESHOLD, CHAT_SUMMARY_TOKEN_THRESHOLD, CHAT_SUMMARY_MAX_WORKERS
+
+APPEND_JOB = "append"
+SUMMARIZE_JOB = "summarize"
+
+def estimate_tokens(messages):
+    """Rough token count of chat messages (about 4 characters per token), good enough for a threshold."""
+    return sum(len(str(message.content)) for message in messages) // 4
+
+class BaseSummarizationScheduler:
+    """
+    [ENG]: Per-session job queues of the chat history scheduler. Every chat turn enqueues an `append` of its new messages,
+    followed by a `summarize` when the history passed the message or token threshold.
+    A session is drained by one worker at a time, so writes to the same history never interleave,
+    and summaries that have not started yet are replaced by the newest one (a burst of turns gives one summary over all of them).
+
+    [IDN]: Antrian job per sesi dari scheduler riwayat chat. Setiap giliran chat menambahkan job `append` pesan barunya,
+    diikuti `summarize` jika riwayat melewati batas jumlah pesan atau token.
+    Satu sesi hanya diproses oleh satu worker dalam satu waktu, sehingga penulisan ke riwayat yang sama tidak saling tumpang tindih,
+    dan ringkasan yang belum dimulai diganti oleh yang terbaru (banyak giliran beruntun menghasilkan satu ringkasan atas semuanya).
+    """
+    def __init__(self, message_threshold=CHAT_SUMMARY_MESSAGE_THRESHOLD, token_threshold=CHAT_SUMMARY_TOKEN_THRESHOLD):
+        self.message_threshold = message_threshold
+        self.token_threshold = token_threshold
+        self._lock = threading.Lock()
+        self._queues = {}
+
+    def needs_summary(self, messages):
+        return len(messages) >= self.message_threshold or estimate_tokens(messages) >= self.token_threshold
+
+    def _enqueue(self, session_id, history, messages, llm, new_messages):
+        """
+        Queue the jobs of a chat turn: the new messages are always appended, then a summary is queued when `messages` passed a threshold.
+        The summary reads the stored history when it runs, so it covers every turn appended before it. Returns True when the session has no running worker yet.
+        """
+        with self._lock:
+            start_worker = session_id not in self._queues
+            queue = self._queues.setdefault(session_id, deque())
+            queue.append((APPEND_JOB, history, list(new_messages), llm))
+            if self.needs_summary(messages):
+                coalesced = sum(1 for job in queue if job[0] == SUMMARIZE_JOB)
+                if coalesced:
+                    self._queues[session_id] = queue = deque(job for job in queue if job[0] != SUMMARIZE_JOB)
+                    logging.info(f"Coalesced {coalesced} pending summaries for session ID: {session_id}")
+                queue.append((SUMMARIZE_JOB, history, None, llm))
+        return start_worker
+
+    def _next_job(self, session_id):
+        with self._lock:
+            queue = self._queues.get(session_id)
+            if not queue:
+                self._queues.pop(session_id, None)
+                return None
+            return queue.popleft()
+
+    def pending_sessions(self):
+        with self._lock:
+            return len(self._queues)
+
+class AsyncSummarizationScheduler(BaseSummarizationScheduler):
+    """
+    [ENG]: Runs the chat history jobs of the async chat path as event loop tasks, at most `max_workers` at a time.
+    [IDN]: Menjalankan job riwayat chat dari jalur chat async sebagai task event loop, maksimal `max_workers` sekaligus.
+    """
+    def __init__(self, asummarize, max_workers=CHAT_SUMMARY_MAX_WORKERS, **kwargs):
+        super().__init__(**kwargs)
+        self._asummarize = asummarize
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._tasks = set()
+
+    def submit(self, session_id, history, messages, llm, new_messages):
+        if self._enqueue(session_id, history, messages, llm, new_messages):
+            task = asyncio.create_task(self._drain(session_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, session_id):
+        while (job := self._next_job(session_id)) is not None:
+            kind, history, messages, llm = job
+            try:
+                async with self._semaphore:
+                    if kind == SUMMARIZE_JOB:
+                        await self._asummarize(history, list(await history.aget_messages()), llm)
+                    else:
+                        await history.aadd_messages(messages)
+            except Exception as e:
+                logging.error(f"Chat history {kind} failed for session ID {session_id}: {e}", exc_info=True)
+
+    async def join(self):
+        """Wait for the queued chat history jobs, used on shutdown."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -1,11 +1,15 @@
 import os
+import hashlib
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from graphdatascience import GraphDataScience
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from src.llm import get_llm
-from src.shared.utils import load_embedding_model
+from src.shared.utils import load_shared_embedding_model
+from src.shared.constants import COMMUNITY_SUMMARY_CONCURRENCY, COMMUNITY_SUMMARY_WRITE_BATCH_SIZE, COMMUNITY_EMBEDDING_BATCH_SIZE, COMMUNITY_DELETE_BATCH_SIZE
+from src.community_summarizer import CommunitySummarizer
+from src.community_detection import CypherRunner, write_communities_in_process
+from src.community_summary_cache import create_community_summary_cache, get_community_hash, get_parent_community_hash
 
 COMMUNITY_PROJECTION_NAME = "communities"
 NODE_PROJECTION = "!Chunk&!Document&!__Community__"
@@ -13,7 +17,10 @@ NODE_PROJECTION_ENTITY = "__Entity__"
 MAX_WORKERS = 10
 MAX_COMMUNITY_LEVELS = 3 
 MIN_COMMUNITY_SIZE = 1 
+# Seeded (incremental) runs are deterministic, so an unchanged graph gives the same communities.
+COMMUNITY_RANDOM_SEED = 42
 COMMUNITY_CREATION_DEFAULT_MODEL = "groq_llama3_70b"
+COUNT_GDS_PROCEDURES = "SHOW PROCEDURES YIELD name WHERE name STARTS WITH 'gds.' RETURN count(*) AS count"
 
 CREATE_COMMUNITY_GRAPH_PROJECTION = """
 MATCH (source:{node_projection})-[]->(target:{node_projection})
@@ -31,6 +38,27 @@ RETURN
   g.graphName AS graph_name, g.nodeCount AS nodes, g.relationshipCount AS rels
 """
 
+# Same projection with a `seed` node property: the level 0 (most detailed) community of the previous run, and a fresh id for new entities.
+CREATE_SEEDED_COMMUNITY_GRAPH_PROJECTION = """
+OPTIONAL MATCH (e:{node_projection}) WHERE e.communities IS NOT NULL
+WITH coalesce(max(e.communities[0]), 0) + 1 AS offset
+MATCH (source:{node_projection})-[]->(target:{node_projection})
+WITH offset, source, target, count(*) as weight
+WITH gds.graph.project(
+               '{project_name}',
+               source,
+               target,
+               {{
+               sourceNodeProperties: {{ seed: coalesce(source.communities[0], offset + id(source)) }},
+               targetNodeProperties: {{ seed: coalesce(target.communities[0], offset + id(target)) }},
+               relationshipProperties: {{ weight: weight }}
+               }},
+               {{undirectedRelationshipTypes: ['*']}}
+               ) AS g
+RETURN
+  g.graphName AS graph_name, g.nodeCount AS nodes, g.relationshipCount AS rels
+"""
+
 CREATE_COMMUNITY_CONSTRAINT = "CREATE CONSTRAINT IF NOT EXISTS FOR (c:__Community__) REQUIRE c.id IS UNIQUE;"
 CREATE_COMMUNITY_LEVELS = """
 MATCH (e:`__Entity__`)
@@ -59,50 +87,62 @@ CALL {
 RETURN count(*)
 """
 
-CREATE_COMMUNITY_RANKS = """
-MATCH (c:__Community__)<-[:IN_COMMUNITY*]-(:!Chunk&!Document&!__Community__)<-[HAS_ENTITY]-(:Chunk)<-[]-(d:Document)
-WITH c, count(distinct d) AS rank
-SET c.community_rank = rank;
-"""
-
-CREATE_PARENT_COMMUNITY_RANKS = """
-MATCH (c:__Community__)<-[:PARENT_COMMUNITY*]-(:__Community__)<-[:IN_COMMUNITY*]-(:!Chunk&!Document&!__Community__)<-[HAS_ENTITY]-(:Chunk)<-[]-(d:Document)
-WITH c, count(distinct d) AS rank
-SET c.community_rank = rank;
+# Ranks (distinct documents) and weights (distinct chunks) are computed bottom-up: the chunk and document sets of the
+# level 0 communities are read once and merged into their parents level by level in Python.
+GET_COMMUNITY_SOURCES = """
+MATCH (c:`__Community__`)<-[:IN_COMMUNITY]-(:!Chunk&!Document&!__Community__)<-[:HAS_ENTITY]-(chunk:Chunk)
+WHERE c.level = 0
+WITH c, collect(DISTINCT chunk) AS chunks
+RETURN c.id AS communityId,
+       [chunk IN chunks | id(chunk)] AS chunks,
+       [chunk IN chunks | [(chunk)-[:PART_OF]->(d:Document) | id(d)][0]] AS documents
 """
 
-CREATE_COMMUNITY_WEIGHTS = """
-MATCH (n:`__Community__`)<-[:IN_COMMUNITY]-()<-[:HAS_ENTITY]-(c)
-WITH n, count(distinct c) AS chunkCount
-SET n.weight = chunkCount
+GET_COMMUNITY_HIERARCHY = """
+MATCH (child:`__Community__`)-[:PARENT_COMMUNITY]->(parent:`__Community__`)
+RETURN child.id AS childId, parent.id AS parentId, parent.level AS level
 """
 
-CREATE_PARENT_COMMUNITY_WEIGHTS = """
-MATCH (n:`__Community__`)<-[:PARENT_COMMUNITY*]-(:`__Community__`)<-[:IN_COMMUNITY]-()<-[:HAS_ENTITY]-(c)
-WITH n, count(distinct c) AS chunkCount
-SET n.weight = chunkCount
+WRITE_COMMUNITY_RANKS_AND_WEIGHTS = """
+UNWIND $rows AS row
+MATCH (c:`__Community__` {id: row.communityId})
+SET c.community_rank = row.rank,
+    c.weight = row.weight
 """
+COMMUNITY_RANK_WRITE_BATCH_SIZE = 1000
 
+# One page of level 0 communities (keyset pagination on the community id), the relationships inside a community are found with a
+# join on the community assignment of both end nodes instead of a subgraph expansion per community.
 GET_COMMUNITY_INFO = """
-MATCH (c:`__Community__`)<-[:IN_COMMUNITY]-(e)
-WHERE c.level = 0
+MATCH (c:`__Community__`)
+WHERE c.level = 0 AND c.id > $after AND ($community_ids IS NULL OR c.id IN $community_ids)
+WITH c ORDER BY c.id LIMIT $page_size
+MATCH (c)<-[:IN_COMMUNITY]-(e)
 WITH c, collect(e) AS nodes
-WHERE size(nodes) > 1
-CALL apoc.path.subgraphAll(nodes[0], {
-	whitelistNodes:nodes
-})
-YIELD relationships
+CALL {
+    WITH c
+    MATCH (c)<-[:IN_COMMUNITY]-(source)-[r]->(target)-[:IN_COMMUNITY]->(c)
+    RETURN collect({start: source.id, type: type(r), end: target.id}) AS rels
+}
 RETURN c.id AS communityId,
        [n in nodes | {id: n.id, description: n.description, type: [el in labels(n) WHERE el <> '__Entity__'][0]}] AS nodes,
-       [r in relationships | {start: startNode(r).id, type: type(r), end: endNode(r).id}] AS rels
+       rels
+ORDER BY communityId
 """
+COMMUNITY_INFO_PAGE_SIZE = 200
 
+# Parents of one level, summarized from the summaries of their direct children (the level below).
 GET_PARENT_COMMUNITY_INFO = """
-MATCH (p:`__Community__`)<-[:PARENT_COMMUNITY*]-(c:`__Community__`)
-WHERE p.summary is null and c.summary is not null
+MATCH (p:`__Community__`)
+WHERE p.level = $level AND p.summary IS NULL
+MATCH (p)<-[:PARENT_COMMUNITY]-(c:`__Community__`)
+WHERE c.summary IS NOT NULL
 RETURN p.id as communityId, collect(c.summary) as texts
 """
 
+GET_MAX_COMMUNITY_LEVEL = "MATCH (c:`__Community__`) RETURN coalesce(max(c.level), 0) AS max_level"
+CREATE_COMMUNITY_LEVEL_INDEX = "CREATE INDEX community_level IF NOT EXISTS FOR (c:`__Community__`) ON (c.level)"
+
 STORE_COMMUNITY_SUMMARIES = """
 UNWIND $data AS row
 MERGE (c:__Community__ {id:row.community})
@@ -145,12 +185,107 @@ RETURN c.id as communityId, c.summary as text
 
 WRITE_COMMUNITY_EMBEDDINGS = """
 UNWIND $rows AS row
-MATCH (c) WHERE c.id = row.communityId
+MATCH (c:`__Community__` {id: row.communityId})
 CALL db.create.setNodeVectorProperty(c, "embedding", row.embedding)
 """  
 
-DROP_COMMUNITIES = "MATCH (c:`__Community__`) DETACH DELETE c"
-DROP_COMMUNITY_PROPERTY = "MATCH (e:`__Entity__`) REMOVE e.communities"
+# Deletes run in transactions of $batch_size rows, at most $limit rows per query so the progress can be logged between queries.
+DROP_COMMUNITIES = """
+MATCH (c:`__Community__`)
+WITH c LIMIT $limit
+CALL (c) {
+    DETACH DELETE c
+} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS count
+"""
+DROP_COMMUNITY_PROPERTY = """
+MATCH (e:`__Entity__`)
+WHERE e.communities IS NOT NULL
+WITH e LIMIT $limit
+CALL (e) {
+    REMOVE e.communities
+} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS count
+"""
+COMMUNITY_DELETE_BATCHES_PER_QUERY = 10
+
+GET_ENTITY_COMMUNITIES = """
+MATCH (e:`__Entity__`)
+WHERE e.communities IS NOT NULL
+RETURN elementId(e) AS elementId, e.communities AS communities
+"""
+
+# Entities that lost all their relationships are not part of the projection, so their previous assignment is stale.
+DROP_STALE_COMMUNITY_PROPERTY = """
+MATCH (e:`__Entity__`)
+WHERE e.communities IS NOT NULL AND NOT (e)--(:!Chunk&!Document&!__Community__)
+WITH e LIMIT $limit
+CALL (e) {
+    REMOVE e.communities
+} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS count
+"""
+
+GET_COMMUNITY_PROPERTIES = """
+MATCH (c:`__Community__`)
+RETURN c.id AS communityId, c.summary AS summary, c.title AS title, c.community_rank AS community_rank, c.weight AS weight, c.embedding AS embedding
+"""
+
+RESTORE_COMMUNITY_PROPERTIES = """
+UNWIND $rows AS row
+MATCH (c:`__Community__` {id: row.communityId})
+SET c.summary = row.summary,
+    c.title = row.title,
+    c.community_rank = row.community_rank,
+    c.weight = row.weight,
+    c.embedding = CASE WHEN row.embedding IS NULL THEN null ELSE c.embedding END
+WITH c, row
+WHERE row.embedding IS NOT NULL
+CALL db.create.setNodeVectorProperty(c, "embedding", row.embedding)
+"""
+RESTORE_COMMUNITY_BATCH_SIZE = 500
+
+# Incremental runs update the community nodes in place, so the communities stay readable while they are rebuilt.
+# The ids are reused by the new assignment: relationships that no longer match it are dropped,
+# the properties of the changed communities are cleared and only the ids that disappeared are deleted.
+DROP_STALE_IN_COMMUNITY = """
+MATCH (e:`__Entity__`)-[r:IN_COMMUNITY]->(c:`__Community__`)
+WHERE e.communities IS NULL OR c.id <> '0-' + toString(e.communities[0])
+WITH r LIMIT $limit
+CALL (r) {
+    DELETE r
+} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS count
+"""
+
+GET_COMMUNITY_PARENTS = """
+MATCH (e:`__Entity__`)
+WHERE size(e.communities) > 1
+UNWIND range(1, size(e.communities) - 1) AS level
+RETURN DISTINCT toString(level - 1) + '-' + toString(e.communities[level - 1]) AS childId,
+       toString(level) + '-' + toString(e.communities[level]) AS parentId
+"""
+
+DROP_PARENT_COMMUNITY_RELATIONSHIPS = """
+UNWIND $rows AS row
+MATCH (:`__Community__` {id: row.childId})-[r:PARENT_COMMUNITY]->(:`__Community__` {id: row.parentId})
+DELETE r
+"""
+
+CLEAR_COMMUNITY_PROPERTIES = """
+UNWIND $community_ids AS community_id
+MATCH (c:`__Community__` {id: community_id})
+REMOVE c.summary, c.title, c.community_rank, c.weight, c.embedding
+"""
+
+DROP_COMMUNITIES_BY_ID = """
+UNWIND $community_ids AS community_id
+MATCH (c:`__Community__` {id: community_id})
+CALL (c) {
+    DETACH DELETE c
+} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS count
+"""
 
 ENTITY_VECTOR_INDEX_NAME = "entity_vector"
 ENTITY_VECTOR_EMBEDDING_DIMENSION = 384
@@ -182,7 +317,7 @@ OPTIONS {{
 
 COMMUNITY_FULLTEXT_INDEX_NAME = "community_keyword"
 COMMUNITY_FULLTEXT_INDEX_DROP_QUERY = f"DROP INDEX  {COMMUNITY_FULLTEXT_INDEX_NAME} IF EXISTS;"
-COMMUNITY_INDEX_FULL_TEXT_QUERY = f"CREATE FULLTEXT INDEX {COMMUNITY_FULLTEXT_INDEX_NAME} FOR (n:`__Community__`) ON EACH [n.summary]" 
+COMMUNITY_INDEX_FULL_TEXT_QUERY = f"CREATE FULLTEXT INDEX {COMMUNITY_FULLTEXT_INDEX_NAME} IF NOT EXISTS FOR (n:`__Community__`) ON EACH [n.summary]" 
 
 def get_gds_driver(uri, username, password, database):
     """[ENG]: Create a connection to the Graph Data Science library.
@@ -200,7 +335,35 @@ def get_gds_driver(uri, username, password, database):
         logging.error(err)
         raise Exception(err)
 
-def create_community_graph_projection(gds, project_name=COMMUNITY_PROJECTION_NAME, node_projection=NODE_PROJECTION):
+def get_community_runner(uri, username, password, database):
+    """[ENG]: Return the GDS driver when the Graph Data Science plugin is installed, otherwise a `CypherRunner` and the communities are detected in process.
+    [IDN]: Mengembalikan driver GDS jika plugin Graph Data Science terpasang, jika tidak `CypherRunner` dan community dideteksi di dalam proses."""
+    runner = CypherRunner(uri, username, password, database)
+    try:
+        gds_available = int(runner.run_cypher(COUNT_GDS_PROCEDURES)["count"][0]) > 0
+    except Exception:
+        runner.close()
+        raise
+    if not gds_available:
+        logging.warning("GDS is not available in the database, communities are detected in process.")
+        return runner
+    runner.close()
+    return get_gds_driver(uri, username, password, database)
+
+def detect_and_write_communities(gds, seeded=False):
+    """[ENG]: Write the `communities` property of the entities with Leiden from GDS, or with the in-process engine when `gds` is a `CypherRunner`.
+    With `seeded`, the previous level 0 (most detailed) community of every entity is the initial community (incremental runs).
+    [IDN]: Menulis properti `communities` dari entitas dengan Leiden dari GDS, atau dengan engine di dalam proses jika `gds` adalah `CypherRunner`.
+    Dengan `seeded`, community level 0 (paling detail) sebelumnya dari setiap entitas menjadi community awal (run inkremental).
+
+    Returns:
+        bool: `True` if communities were successfully written, `False` otherwise."""
+    if isinstance(gds, CypherRunner):
+        return write_communities_in_process(gds, NODE_PROJECTION, max_levels=MAX_COMMUNITY_LEVELS, seeded=seeded)
+    graph_project = create_community_graph_projection(gds, seeded=seeded)
+    return write_communities(gds, graph_project, seed_property="seed" if seeded else None)
+
+def create_community_graph_projection(gds, project_name=COMMUNITY_PROJECTION_NAME, node_projection=NODE_PROJECTION, seeded=False):
     """[ENG] : Creates a community graph projection using the Neo4j GDS library. 
     If a projection with the same name already exists, it is dropped before creating a new one. 
     The function constructs a Cypher query using the given node projection and executes it to generate the graph. 
@@ -213,6 +376,7 @@ def create_community_graph_projection(gds, project_name=COMMUNITY_PROJECTION_NAM
         gds (GraphDataScience): The Neo4j GDS object.
         project_name (str, optional): The name of the graph projection. Defaults to "communities".
         node_projection (str, optional): The node projection filter. Defaults to "!Chunk&!Document&!__Community__".
+        seeded (bool, optional): Project the previous level 0 (most detailed) community of every node as the `seed` property. Defaults to `False`.
 
     Returns:
         Graph: The created graph projection object.
@@ -228,7 +392,8 @@ def create_community_graph_projection(gds, project_name=COMMUNITY_PROJECTION_NAM
             gds.graph.drop(project_name)
         
         logging.info(f"Creating new graph project '{project_name}'.")
-        projection_query = CREATE_COMMUNITY_GRAPH_PROJECTION.format(node_projection=node_projection,project_name=project_name)
+        projection_template = CREATE_SEEDED_COMMUNITY_GRAPH_PROJECTION if seeded else CREATE_COMMUNITY_GRAPH_PROJECTION
+        projection_query = projection_template.format(node_projection=node_projection,project_name=project_name)
         graph_projection_result = gds.run_cypher(projection_query)
         projection_result = graph_projection_result.to_dict(orient="records")[0]
         logging.info(f"Graph projection '{projection_result['graph_name']}' created successfully with {projection_result['nodes']} nodes and {projection_result['rels']} relationships.")
@@ -239,7 +404,7 @@ def create_community_graph_projection(gds, project_name=COMMUNITY_PROJECTION_NAM
         logging.error(err)
         raise Exception(err)
     
-def write_communities(gds, graph_project, project_name=COMMUNITY_PROJECTION_NAME):
+def write_communities(gds, graph_project, project_name=COMMUNITY_PROJECTION_NAME, seed_property=None):
     """[ENG] : Writes community detection results to the given graph project using the Leiden algorithm. 
     The function logs the process, applies the algorithm with specified parameters, and stores the results in the graph. 
     If successful, it returns `True`, otherwise, it logs the error and returns `False`.
@@ -252,11 +417,13 @@ def write_communities(gds, graph_project, project_name=COMMUNITY_PROJECTION_NAME
         gds (GraphDataScience): The Neo4j GDS object.
         graph_project (Graph): The graph projection where communities will be written.
         project_name (str, optional): The name of the property where community labels will be stored. Defaults to "communities".
+        seed_property (str, optional): Node property with the initial community of every node (incremental runs). Defaults to `None`.
 
     Returns:
         bool: `True` if communities were successfully written, `False` otherwise."""
     try:
         logging.info(f"Writing communities to the graph project '{project_name}'.")
+        seed_config = {"seedProperty": seed_property, "randomSeed": COMMUNITY_RANDOM_SEED, "concurrency": 1} if seed_property else {}
         gds.leiden.write(
             graph_project,
             writeProperty = project_name,
@@ -264,6 +431,7 @@ def write_communities(gds, graph_project, project_name=COMMUNITY_PROJECTION_NAME
             relationshipWeightProperty = "weight",
             maxLevels = MAX_COMMUNITY_LEVELS,
             minCommunitySize = MIN_COMMUNITY_SIZE,
+            **seed_config,
         )
         logging.info("Communities written successfully.")
         return True
@@ -271,6 +439,22 @@ def write_communities(gds, graph_project, project_name=COMMUNITY_PROJECTION_NAME
         logging.error(f"Failed to write communities: {e}")
         return False
     
+def get_community_memberships(gds):
+    """[ENG]: Return the membership of every community in the `communities` property of the entities as {community id: (level, hash)}.
+    The hash is computed from the sorted element ids of all member entities (including those of the child communities),
+    so a community with the same members has the same hash in the next run, whatever its id.
+    [IDN]: Mengembalikan keanggotaan setiap community pada properti `communities` dari entitas sebagai {id community: (level, hash)}.
+    Hash dihitung dari element id yang sudah diurutkan dari semua entitas anggota (termasuk anggota dari community anak),
+    sehingga community dengan anggota yang sama memiliki hash yang sama pada run berikutnya, apapun id-nya."""
+    members = {}
+    for row in gds.run_cypher(GET_ENTITY_COMMUNITIES).to_dict(orient="records"):
+        for level, community in enumerate(row["communities"]):
+            members.setdefault((level, f"{level}-{community}"), []).append(row["elementId"])
+    return {
+        community_id: (level, hashlib.sha256("|".join(sorted(element_ids)).encode()).hexdigest())
+        for (level, community_id), element_ids in members.items()
+    }
+
 def get_community_chain(model, is_parent=False, community_template=COMMUNITY_TEMPLATE, system_template=COMMUNITY_SYSTEM_TEMPLATE):
     """[ENG] : Creates a community chain using a language model. The function selects the appropriate templates based on whether the community is a parent or not. 
     It constructs a chat prompt template and processes it through the language model, returning the final chain. 
@@ -335,6 +519,43 @@ def prepare_string(community_data):
         logging.error(err)
         raise
 
+def stream_community_info(gds, community_ids=None, page_size=COMMUNITY_INFO_PAGE_SIZE):
+    """[ENG]: Read the level 0 communities (members and the relationships between them) page by page, so only one page is held in memory
+    and the summaries of a page can start while the next one is read. Communities with a single member are skipped.
+    [IDN]: Membaca community level 0 (anggota dan relasi di antaranya) halaman demi halaman, sehingga hanya satu halaman yang disimpan di memori
+    dan ringkasan satu halaman bisa dimulai selagi halaman berikutnya dibaca. Community dengan satu anggota dilewati."""
+    after, pages, total = "", 0, 0
+    while True:
+        page = gds.run_cypher(GET_COMMUNITY_INFO, params={"community_ids": community_ids, "after": after, "page_size": page_size}).to_dict(orient="records")
+        if not page:
+            break
+        after = page[-1]["communityId"]
+        pages += 1
+        total += len(page)
+        yield [community for community in page if len(community["nodes"]) > 1]
+        if len(page) < page_size:
+            break
+    logging.info(f"Read {total} communities in {pages} pages.")
+
+def summarize_community(community, chain, is_parent=False):
+    """[ENG]: Generate the title and summary of one community, errors are raised to the caller (see `process_community_info`).
+    [IDN]: Menghasilkan judul dan ringkasan dari satu community, error diteruskan ke pemanggil (lihat `process_community_info`)."""
+    if is_parent:
+        combined_text = " ".join(f"Summary {i + 1}: {summary}" for i, summary in enumerate(community.get("texts", [])))
+    else:
+        combined_text = prepare_string(community)
+    summary_response = chain.invoke({'community_info': combined_text})
+    lines = summary_response.splitlines()
+    title = "Untitled Community"
+    summary = ""
+    for line in lines:
+        if line.lower().startswith("title"):
+            title = line.split(":", 1)[-1].strip()
+        elif line.lower().startswith("summary"):
+            summary = line.split(":", 1)[-1].strip()
+    logging.info(f"Community Title : {title}")
+    return {"community": community['communityId'], "title":title, "summary": summary}
+
 def process_community_info(community, chain, is_parent=False):
     """[ENG] : Processes community information and generates a title and summary using a given processing chain. 
     If the community is a parent, summaries of its texts are combined; otherwise, a prepared string representation is used. 
@@ -354,72 +575,80 @@ def process_community_info(community, chain, is_parent=False):
         dict or None: A dictionary containing the community ID, title, and summary, or `None` if processing fails.
     """
     try:
-        if is_parent:
-            combined_text = " ".join(f"Summary {i + 1}: {summary}" for i, summary in enumerate(community.get("texts", [])))
-        else:
-            combined_text = prepare_string(community)
-        summary_response = chain.invoke({'community_info': combined_text})
-        lines = summary_response.splitlines()
-        title = "Untitled Community"
-        summary = ""
-        for line in lines:
-            if line.lower().startswith("title"):
-                title = line.split(":", 1)[-1].strip()
-            elif line.lower().startswith("summary"):
-                summary = line.split(":", 1)[-1].strip()
-        logging.info(f"Community Title : {title}")
-        return {"community": community['communityId'], "title":title, "summary": summary}
-    
+        return summarize_community(community, chain, is_parent)
     except Exception as e:
         logging.error(f"Failed to process community {community.get('communityId', 'unknown')}: {e}")
         return None
 
-def create_community_summaries(gds, model):
+def get_summary_prompt_version(is_parent=False):
+    """Short hash of the summary prompt templates, part of the summary cache key so a prompt change summarizes the communities again."""
+    templates = (PARENT_COMMUNITY_SYSTEM_TEMPLATE, PARENT_COMMUNITY_TEMPLATE) if is_parent else (COMMUNITY_SYSTEM_TEMPLATE, COMMUNITY_TEMPLATE)
+    return hashlib.sha256("\n".join(templates).encode()).hexdigest()[:16]
+
+def summarize_communities(gds, pages, chain, model, summary_cache=None, is_parent=False):
+    """[ENG]: Summarize the communities, given as pages (lists) of communities, and store the summaries in batches while the others are still summarized
+    (see `CommunitySummarizer`). With a `summary_cache`, a community whose hash (members, descriptions and relationships, or the child summaries for a parent)
+    was summarized before reuses that summary and the LLM is only called for the others.
+    [IDN]: Meringkas community, yang diberikan per halaman (list) community, dan menyimpan ringkasannya per batch selagi yang lain masih diringkas
+    (lihat `CommunitySummarizer`). Dengan `summary_cache`, community yang hash-nya (anggota, deskripsi, dan relasi, atau ringkasan anak untuk parent)
+    pernah diringkas memakai ulang ringkasan tersebut dan LLM hanya dipanggil untuk sisanya."""
+    get_hash = get_parent_community_hash if is_parent else get_community_hash
+    prompt_version = get_summary_prompt_version(is_parent)
+    cached_count = 0
+
+    def pending_pages():
+        nonlocal cached_count
+        for communities in pages:
+            for community in communities:
+                community["hash"] = get_hash(community, model, prompt_version)
+            cached = summary_cache.get_many(community["hash"] for community in communities) if summary_cache is not None else {}
+
+            summaries = [{"community": community["communityId"], **cached[community["hash"]]} for community in communities if community["hash"] in cached]
+            for i in range(0, len(summaries), COMMUNITY_SUMMARY_WRITE_BATCH_SIZE):
+                gds.run_cypher(STORE_COMMUNITY_SUMMARIES, params={"data": summaries[i:i + COMMUNITY_SUMMARY_WRITE_BATCH_SIZE]})
+            cached_count += len(summaries)
+            yield [community for community in communities if community["hash"] not in cached]
+
+    def summarize(community):
+        return {**summarize_community(community, chain, is_parent), "hash": community["hash"]}
+
+    def write_batch(rows):
+        gds.run_cypher(STORE_COMMUNITY_SUMMARIES, params={"data": [{key: row[key] for key in ("community", "title", "summary")} for row in rows]})
+        if summary_cache is not None:
+            summary_cache.put_many(rows)
+
+    concurrency = int(os.getenv("COMMUNITY_SUMMARY_CONCURRENCY", COMMUNITY_SUMMARY_CONCURRENCY))
+    report = CommunitySummarizer(summarize, write_batch, concurrency=concurrency, name="parent community" if is_parent else "community").run_pages(pending_pages())
+    logging.info(f"{'Parent community' if is_parent else 'Community'} summaries: {cached_count} reused from the cache, {report['total']} summarized.")
+    return {**report, "cached": cached_count}
+
+def create_community_summaries(gds, model, community_ids=None):
     """[ENG] : Generates summaries for communities and parent communities using a language model and stores them in a graph database. 
-    The function retrieves community data, processes summaries in parallel using threading, and stores the results. 
+    The function retrieves community data, processes summaries with bounded concurrency and retries, and stores the results in batches. 
     If an error occurs, it logs the issue and raises an exception.
 
     [IDN] : 
     Menghasilkan ringkasan untuk komunitas dan komunitas induk menggunakan language model dan menyimpannya dalam database graf.
-    Fungsi ini mengambil data komunitas, memproses ringkasan secara paralel menggunakan threading, dan menyimpan hasilnya. 
+    Fungsi ini mengambil data komunitas, memproses ringkasan dengan konkurensi terbatas dan percobaan ulang, dan menyimpan hasilnya per batch. 
     Jika terjadi kesalahan, fungsi akan mencatat dan melempar pengecualian.
 
     Args:
         gds (GraphDataScience): The Neo4j GDS object.
         model (str): The name of the language model used for generating summaries.
+        community_ids (list, optional): Only summarize these level 0 communities (incremental runs). Defaults to all.
     """
     try:
-        community_info_list = gds.run_cypher(GET_COMMUNITY_INFO)
+        summary_cache = create_community_summary_cache(os.getenv("COMMUNITY_SUMMARY_CACHE_PATH"))
         community_chain = get_community_chain(model)
+        summarize_communities(gds, stream_community_info(gds, community_ids), community_chain, model, summary_cache)
 
-        summaries = []
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(process_community_info, community, community_chain) for community in community_info_list.to_dict(orient="records")]
-   
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    summaries.append(result)
-                else:
-                    logging.error("community summaries could not be processed.")
-
-        gds.run_cypher(STORE_COMMUNITY_SUMMARIES, params={"data": summaries})
-
-        parent_community_info = gds.run_cypher(GET_PARENT_COMMUNITY_INFO)
+        # Level by level, so every parent is summarized from the finished summaries of its direct children.
         parent_community_chain = get_community_chain(model, is_parent=True)
-
-        parent_summaries = []
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(process_community_info, community, parent_community_chain, is_parent=True) for community in parent_community_info.to_dict(orient="records")]
-            
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    parent_summaries.append(result)
-                else:
-                    logging.error("parent community summaries could not be processed.")
-
-        gds.run_cypher(STORE_COMMUNITY_SUMMARIES, params={"data": parent_summaries})
+        max_level = int(gds.run_cypher(GET_MAX_COMMUNITY_LEVEL)["max_level"][0])
+        for level in range(1, max_level + 1):
+            parent_community_info = gds.run_cypher(GET_PARENT_COMMUNITY_INFO, params={"level": level})
+            logging.info(f"Summarizing {len(parent_community_info)} parent communities of level {level}.")
+            summarize_communities(gds, [parent_community_info.to_dict(orient="records")], parent_community_chain, model, summary_cache, is_parent=True)
 
     except Exception as e:
         err = f"Failed to create community summaries with error {e}"
@@ -445,7 +674,7 @@ def create_community_embeddings(gds):
 
     try:
         embedding_model = os.getenv('EMBEDDING_MODEL')
-        embeddings, dimension = load_embedding_model(embedding_model)
+        embeddings, dimension = load_shared_embedding_model(embedding_model)
         logging.info(f"Embedding model '{embedding_model}' loaded successfully.")
         
         logging.info("Fetching community details.")
@@ -453,20 +682,23 @@ def create_community_embeddings(gds):
         rows = rows[['communityId', 'text']].to_dict(orient='records')
         logging.info(f"Fetched {len(rows)} communities.")
         
-        batch_size = 100
+        batch_size = int(os.getenv("COMMUNITY_EMBEDDING_BATCH_SIZE", COMMUNITY_EMBEDDING_BATCH_SIZE))
+        written = 0
         for i in range(0, len(rows), batch_size):
-            batch_rows = rows[i:i+batch_size]            
-            for row in batch_rows:
-                try:
-                    row['embedding'] = embeddings.embed_query(row['text'])
-                except Exception as e:
-                    logging.error(f"Failed to embed text for community ID {row['communityId']}: {e}")
-                    row['embedding'] = None
-            
+            batch_rows = rows[i:i+batch_size]
+            try:
+                vectors = embeddings.embed_documents([row['text'] for row in batch_rows])
+            except Exception as e:
+                logging.error(f"Failed to embed {len(batch_rows)} communities starting at {batch_rows[0]['communityId']}: {e}")
+                continue
+
             try:
-                logging.info("Writing embeddings to the database.")
-                gds.run_cypher(WRITE_COMMUNITY_EMBEDDINGS, params={'rows': batch_rows})
-                logging.info("Embeddings written successfully.")
+                # One transaction per batch, the community id lookup uses the __Community__ constraint index.
+                gds.run_cypher(WRITE_COMMUNITY_EMBEDDINGS, params={'rows': [
+                    {'communityId': row['communityId'], 'embedding': vector} for row, vector in zip(batch_rows, vectors)
+                ]})
+                written += len(batch_rows)
+                logging.info(f"Community embeddings written: {written}/{len(rows)}")
             except Exception as e:
                 logging.error(f"Failed to write embeddings to the database: {e}")
                 continue
@@ -474,7 +706,7 @@ def create_community_embeddings(gds):
     except Exception as e:
         logging.error(f"An error occurred during the community embedding process: {e}")
 
-def create_vector_index(gds, index_type, embedding_dimension=None):
+def create_vector_index(gds, index_type, embedding_dimension=None, recreate=True):
     """[ENG] : Generates and stores community embeddings using a pre-trained embedding model. 
     The function retrieves community details from the graph database, processes text embeddings in batches, and writes the embeddings back to the database. 
     If an error occurs during embedding or writing, it logs the issue and continues processing.
@@ -512,8 +744,9 @@ def create_vector_index(gds, index_type, embedding_dimension=None):
     try:
         logging.info("Starting the process to create vector index.")
 
-        logging.info(f"Executing drop query: {drop_query}")
-        gds.run_cypher(drop_query)
+        if recreate:
+            logging.info(f"Executing drop query: {drop_query}")
+            gds.run_cypher(drop_query)
 
         logging.info(f"Executing create query: {query}")
         gds.run_cypher(query)
@@ -524,7 +757,7 @@ def create_vector_index(gds, index_type, embedding_dimension=None):
         logging.error("An error occurred while creating the vector index.", exc_info=True)
         logging.error(f"Error details: {str(e)}")
 
-def create_fulltext_index(gds, index_type):
+def create_fulltext_index(gds, index_type, recreate=True):
     """
     [ENG] : 
     Creates a full-text index in the graph database. 
@@ -554,8 +787,9 @@ def create_fulltext_index(gds, index_type):
     try:
         logging.info("Starting the process to create full-text index.")
 
-        logging.info(f"Executing drop query: {drop_query}")
-        gds.run_cypher(drop_query)
+        if recreate:
+            logging.info(f"Executing drop query: {drop_query}")
+            gds.run_cypher(drop_query)
 
         logging.info(f"Executing create query: {query}")
         gds.run_cypher(query)
@@ -566,7 +800,43 @@ def create_fulltext_index(gds, index_type):
         logging.error("An error occurred while creating the full-text index.", exc_info=True)
         logging.error(f"Error details: {str(e)}")
 
-def create_community_properties(gds, model):
+def create_community_ranks_and_weights(gds, community_ids=None):
+    """
+    [ENG]: Set the rank (distinct documents) and weight (distinct chunks) of every community in one bottom-up pass. The chunk and document sets
+    of the level 0 communities are read with one aggregation and each parent gets the union of the sets of its children, level by level.
+    [IDN]: Mengisi rank (jumlah dokumen berbeda) dan weight (jumlah chunk berbeda) dari setiap community dalam satu proses bottom-up. Himpunan chunk dan dokumen
+    dari community level 0 dibaca dengan satu agregasi dan setiap parent mendapat gabungan himpunan dari anak-anaknya, level demi level.
+
+    Args:
+        gds: The Graph Data Science (GDS) instance to execute Cypher commands.
+        community_ids: Only write the ranks and weights of these communities (incremental runs). Defaults to all.
+    """
+    sources = {
+        row["communityId"]: (set(row["chunks"]), {document for document in row["documents"] if document is not None})
+        for row in gds.run_cypher(GET_COMMUNITY_SOURCES).to_dict(orient="records")
+    }
+    children = {}
+    for row in gds.run_cypher(GET_COMMUNITY_HIERARCHY).to_dict(orient="records"):
+        children.setdefault((row["level"], row["parentId"]), []).append(row["childId"])
+    for level, parent_id in sorted(children):
+        chunks, documents = set(), set()
+        for child_id in children[(level, parent_id)]:
+            child_chunks, child_documents = sources.get(child_id, (set(), set()))
+            chunks |= child_chunks
+            documents |= child_documents
+        sources[parent_id] = (chunks, documents)
+
+    selected = set(community_ids) if community_ids is not None else None
+    rows = [
+        {"communityId": community_id, "rank": len(documents), "weight": len(chunks)}
+        for community_id, (chunks, documents) in sources.items()
+        if selected is None or community_id in selected
+    ]
+    for i in range(0, len(rows), COMMUNITY_RANK_WRITE_BATCH_SIZE):
+        gds.run_cypher(WRITE_COMMUNITY_RANKS_AND_WEIGHTS, params={"rows": rows[i:i + COMMUNITY_RANK_WRITE_BATCH_SIZE]})
+    logging.info(f"Ranks and weights written for {len(rows)} communities.")
+
+def create_community_properties(gds, model, community_ids=None, recreate_indexes=True):
     """
     [ENG]: Creates various community-related properties in the graph using GDS.
     [IDN]: Membuat berbagai properti komunitas dalam graf menggunakan GDS.
@@ -574,42 +844,63 @@ def create_community_properties(gds, model):
     Args:
         gds: The Graph Data Science (GDS) instance to execute Cypher commands.
         model: The model used for generating community summaries.
+        community_ids: Only write the ranks, weights and summaries of these communities (incremental runs). Defaults to all.
+        recreate_indexes: Drop and recreate the vector and full-text indexes instead of only creating the missing ones.
 
     Return:
         None
     """
     commands = [
         (CREATE_COMMUNITY_CONSTRAINT, "created community constraint to the graph."),
+        (CREATE_COMMUNITY_LEVEL_INDEX, "created community level index to the graph."),
         (CREATE_COMMUNITY_LEVELS, "Successfully created community levels."),
-        (CREATE_COMMUNITY_RANKS, "Successfully created community ranks."),
-        (CREATE_PARENT_COMMUNITY_RANKS, "Successfully created parent community ranks."),
-        (CREATE_COMMUNITY_WEIGHTS, "Successfully created community weights."),
-        (CREATE_PARENT_COMMUNITY_WEIGHTS, "Successfully created parent community weights."),
     ]
     try:
         for command, message in commands:
             gds.run_cypher(command)
             logging.info(message)
 
-        create_community_summaries(gds, model)
+        create_community_ranks_and_weights(gds, community_ids)
+        logging.info("Successfully created community ranks and weights.")
+
+        create_community_summaries(gds, model, community_ids)
         logging.info("Successfully created community summaries.")
 
         embedding_dimension = create_community_embeddings(gds)
         logging.info("Successfully created community embeddings.")
 
-        create_vector_index(gds=gds,index_type=ENTITY_VECTOR_INDEX_NAME,embedding_dimension=embedding_dimension)
+        create_vector_index(gds=gds,index_type=ENTITY_VECTOR_INDEX_NAME,embedding_dimension=embedding_dimension,recreate=recreate_indexes)
         logging.info("Successfully created Entity Vector Index.")
 
-        create_vector_index(gds=gds,index_type=COMMUNITY_VECTOR_INDEX_NAME,embedding_dimension=embedding_dimension)
+        create_vector_index(gds=gds,index_type=COMMUNITY_VECTOR_INDEX_NAME,embedding_dimension=embedding_dimension,recreate=recreate_indexes)
         logging.info("Successfully created community Vector Index.")
 
-        create_fulltext_index(gds=gds,index_type=COMMUNITY_FULLTEXT_INDEX_NAME)
+        create_fulltext_index(gds=gds,index_type=COMMUNITY_FULLTEXT_INDEX_NAME,recreate=recreate_indexes)
         logging.info("Successfully created community fulltext Index.")
 
     except Exception as e:
         logging.error(f"Error during community properties creation: {e}")
         raise
 
+def run_in_batches(gds, query, description, batch_size=None):
+    """[ENG]: Run a delete or update query written with `CALL { ... } IN TRANSACTIONS OF $batch_size ROWS` until it has no rows left,
+    so no transaction holds the whole graph and the progress is logged. The batch size can be set with `COMMUNITY_DELETE_BATCH_SIZE`.
+    [IDN]: Menjalankan query hapus atau update yang ditulis dengan `CALL { ... } IN TRANSACTIONS OF $batch_size ROWS` hingga tidak ada baris tersisa,
+    sehingga tidak ada transaksi yang memegang seluruh graf dan progresnya dicatat. Ukuran batch dapat diatur dengan `COMMUNITY_DELETE_BATCH_SIZE`.
+
+    Returns:
+        int: The number of rows processed."""
+    batch_size = batch_size or int(os.getenv("COMMUNITY_DELETE_BATCH_SIZE", COMMUNITY_DELETE_BATCH_SIZE))
+    limit = batch_size * COMMUNITY_DELETE_BATCHES_PER_QUERY
+    total = 0
+    while True:
+        count = int(gds.run_cypher(query, params={"batch_size": batch_size, "limit": limit})["count"][0])
+        total += count
+        if count:
+            logging.info(f"{description}: {total} so far.")
+        if count < limit:
+            return total
+
 def clear_communities(gds):
     """
     [ENG]: Clears community-related properties from the graph using GDS.
@@ -625,23 +916,100 @@ def clear_communities(gds):
         logging.info("Starting to clear communities.")
 
         logging.info("Dropping communities...")
-        gds.run_cypher(DROP_COMMUNITIES)
-        logging.info(f"Communities dropped successfully")
+        dropped = run_in_batches(gds, DROP_COMMUNITIES, "Communities dropped")
+        logging.info(f"{dropped} communities dropped successfully")
 
         logging.info("Dropping community property from entities...")
-        gds.run_cypher(DROP_COMMUNITY_PROPERTY)
-        logging.info(f"Community property dropped successfully")
+        cleared = run_in_batches(gds, DROP_COMMUNITY_PROPERTY, "Community property dropped from entities")
+        logging.info(f"Community property dropped successfully from {cleared} entities")
 
     except Exception as e:
         logging.error(f"An error occurred while clearing communities: {e}")
         raise
 
-def create_communities(uri, username, password, database,model=COMMUNITY_CREATION_DEFAULT_MODEL):
+def restore_row(row):
+    """Community properties read through pandas, with the missing values (NaN) back to None and the embedding as a list."""
+    restored = {key: None if isinstance(value, float) and value != value else value for key, value in row.items() if key != "embedding"}
+    embedding = row.get("embedding")
+    restored["embedding"] = [float(value) for value in embedding] if hasattr(embedding, "__len__") else None
+    return restored
+
+def update_communities(gds, model):
+    """
+    [ENG]: Incremental community detection. Leiden is seeded with the previous assignment, and the communities whose members did not
+    change keep their rank, weight, summary and embedding. Only the new or changed communities are ranked, summarized and embedded again.
+    The community nodes are updated in place, so the communities stay available to the chat while they are updated.
+    [IDN]: Deteksi komunitas inkremental. Leiden diberi seed dari penugasan sebelumnya, dan komunitas yang anggotanya tidak
+    berubah mempertahankan rank, weight, ringkasan, dan embedding-nya. Hanya komunitas baru atau yang berubah yang diberi rank, diringkas, dan di-embed ulang.
+    Node komunitas diperbarui di tempat, sehingga komunitas tetap tersedia untuk chat selama diperbarui.
+
+    Args:
+        gds: The Graph Data Science (GDS) instance to execute Cypher commands.
+        model: The model used for community summaries.
+
+    Return:
+        bool: `True` if the communities were updated, `False` when the Leiden write failed.
+    """
+    previous_memberships = get_community_memberships(gds)
+    previous_properties = {row["communityId"]: row for row in gds.run_cypher(GET_COMMUNITY_PROPERTIES).to_dict(orient="records")}
+    previous_by_hash = {membership: community_id for community_id, membership in previous_memberships.items()}
+
+    if not detect_and_write_communities(gds, seeded=True):
+        return False
+    run_in_batches(gds, DROP_STALE_COMMUNITY_PROPERTY, "Stale community property dropped from entities")
+
+    unchanged, changed = [], []
+    current_memberships = get_community_memberships(gds)
+    for community_id, membership in current_memberships.items():
+        previous = previous_properties.get(previous_by_hash.get(membership))
+        if previous is not None and previous.get("summary"):
+            unchanged.append({**previous, "communityId": community_id})
+        else:
+            changed.append(community_id)
+    logging.info(f"Incremental communities: {len(unchanged)} unchanged, {len(changed)} new or changed.")
+    previous_level_0 = {membership for membership in previous_memberships.values() if membership[0] == 0}
+    current_level_0 = {membership for membership in current_memberships.values() if membership[0] == 0}
+    if changed and previous_level_0 == current_level_0 and len(current_memberships) == len(previous_memberships):
+        # Same level 0 communities seed the same hierarchy, an unchanged graph must give 0 changed communities.
+        logging.warning(f"The level 0 communities did not change but {len(changed)} communities did, the seeded detection did not reproduce the previous hierarchy.")
+
+    # The community ids of the previous run may now belong to other members. The nodes are updated in place (never all deleted first),
+    # so the previous communities and summaries stay readable until their replacements are written.
+    gds.run_cypher(CREATE_COMMUNITY_CONSTRAINT)
+    gds.run_cypher(CREATE_COMMUNITY_LEVELS)
+    for i in range(0, len(unchanged), RESTORE_COMMUNITY_BATCH_SIZE):
+        rows = [restore_row(row) for row in unchanged[i:i + RESTORE_COMMUNITY_BATCH_SIZE]]
+        gds.run_cypher(RESTORE_COMMUNITY_PROPERTIES, params={"rows": rows})
+    logging.info("Restored the properties of the unchanged communities.")
+
+    run_in_batches(gds, DROP_STALE_IN_COMMUNITY, "Stale community memberships dropped")
+    parents = {(row["childId"], row["parentId"]) for row in gds.run_cypher(GET_COMMUNITY_PARENTS).to_dict(orient="records")}
+    stale_parents = [
+        {"childId": row["childId"], "parentId": row["parentId"]}
+        for row in gds.run_cypher(GET_COMMUNITY_HIERARCHY).to_dict(orient="records")
+        if (row["childId"], row["parentId"]) not in parents
+    ]
+    for i in range(0, len(stale_parents), RESTORE_COMMUNITY_BATCH_SIZE):
+        gds.run_cypher(DROP_PARENT_COMMUNITY_RELATIONSHIPS, params={"rows": stale_parents[i:i + RESTORE_COMMUNITY_BATCH_SIZE]})
+    for i in range(0, len(changed), RESTORE_COMMUNITY_BATCH_SIZE):
+        gds.run_cypher(CLEAR_COMMUNITY_PROPERTIES, params={"community_ids": changed[i:i + RESTORE_COMMUNITY_BATCH_SIZE]})
+    removed = sorted(set(previous_properties) - set(current_memberships))
+    if removed:
+        batch_size = int(os.getenv("COMMUNITY_DELETE_BATCH_SIZE", COMMUNITY_DELETE_BATCH_SIZE))
+        gds.run_cypher(DROP_COMMUNITIES_BY_ID, params={"community_ids": removed, "batch_size": batch_size})
+    logging.info(f"Dropped {len(stale_parents)} stale parent relationships and {len(removed)} communities that disappeared.")
+
+    create_community_properties(gds, model, community_ids=changed, recreate_indexes=False)
+    return True
+
+def create_communities(uri, username, password, database,model=COMMUNITY_CREATION_DEFAULT_MODEL, incremental=False):
     """
     [ENG]: Creates communities in the graph by projecting the graph, writing community structures, 
-           and generating community properties.
+           and generating community properties. With `incremental`, the previous communities are kept and
+           only the changed ones are rebuilt (see `update_communities`).
     [IDN]: Membuat komunitas dalam graf dengan memproyeksikan graf, menulis struktur komunitas, 
-           dan menghasilkan properti komunitas.
+           dan menghasilkan properti komunitas. Dengan `incremental`, komunitas sebelumnya dipertahankan dan
+           hanya yang berubah yang dibangun ulang (lihat `update_communities`).
 
     Args:
         uri: The URI of the Neo4j database.
@@ -649,16 +1017,24 @@ def create_communities(uri, username, password, database,model=COMMUNITY_CREATIO
         password: The password for authentication.
         database: The name of the database.
         model: The model used for community creation (default: COMMUNITY_CREATION_DEFAULT_MODEL).
+        incremental: Update the existing communities instead of recreating them (default: False).
 
     Return:
         None
     """
+    gds = None
     try:
-        gds = get_gds_driver(uri, username, password, database)
+        gds = get_community_runner(uri, username, password, database)
+        if incremental and gds.run_cypher(GET_ENTITY_COMMUNITIES + " LIMIT 1").shape[0]:
+            logging.info("Starting incremental community update.")
+            if update_communities(gds, model):
+                logging.info("Communities update process completed successfully.")
+            else:
+                logging.warning("Failed to write communities. Existing communities were kept.")
+            return
         clear_communities(gds)
 
-        graph_project = create_community_graph_projection(gds)
-        write_communities_sucess = write_communities(gds, graph_project)
+        write_communities_sucess = detect_and_write_communities(gds)
         if write_communities_sucess:
             logging.info("Starting Community properties creation process.")
             create_community_properties(gds,model)
@@ -667,3 +1043,6 @@ def create_communities(uri, username, password, database,model=COMMUNITY_CREATIO
             logging.warning("Failed to write communities. Constraint was not applied.")
     except Exception as e:
         logging.error(f"Failed to create communities: {e}")
+    finally:
+        if gds is not None:
+            gds.close()
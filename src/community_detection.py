@@ -0,0 +1,195 @@
+import time
+import logging
+import numpy as np
+from neo4j import GraphDatabase
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+# One page of the entity graph: the outgoing relationships of a page of nodes (keyset pagination on the internal id).
+# Nodes without relationships are part of the page (for the cursor) but not of the graph, like in the GDS projection.
+EXPORT_ENTITY_GRAPH_PAGE = """
+MATCH (source:{node_projection})
+WHERE id(source) > $after
+WITH source ORDER BY id(source) LIMIT $page_size
+OPTIONAL MATCH (source)-->(target:{node_projection})
+RETURN id(source) AS source, source.communities[0] AS seed, collect(id(target)) AS targets
+"""
+
+WRITE_ENTITY_COMMUNITIES = """
+UNWIND $rows AS row
+MATCH (e) WHERE id(e) = row.nodeId
+SET e.communities = row.communities
+"""
+
+EXPORT_PAGE_SIZE = 10000
+WRITE_BATCH_SIZE = 1000
+MAX_LOCAL_MOVING_ITERATIONS = 50
+MOVE_PROBABILITY = 0.5
+RANDOM_SEED = 42
+
+class CypherRunner:
+    """
+    [ENG]: Runs Cypher with the Neo4j driver and returns pandas DataFrames like `GraphDataScience.run_cypher`,
+    so the community pipeline also works on databases without the Graph Data Science plugin.
+    [IDN]: Menjalankan Cypher dengan driver Neo4j dan mengembalikan DataFrame pandas seperti `GraphDataScience.run_cypher`,
+    sehingga pipeline community juga berjalan pada database tanpa plugin Graph Data Science.
+    """
+    def __init__(self, uri, username, password, database):
+        self.database = database
+        self.driver = GraphDatabase.driver(uri, auth=(username, password))
+
+    def run_cypher(self, query, params=None):
+        # Auto-commit transaction like GDS, `CALL { ... } IN TRANSACTIONS` is not allowed in a managed transaction.
+        with self.driver.session(database=self.database) as session:
+            return session.run(query, params or {}).to_df()
+
+    def close(self):
+        self.driver.close()
+
+def export_entity_graph(runner, node_projection, page_size=EXPORT_PAGE_SIZE):
+    """
+    [ENG]: Read the entity graph page by page into a symmetric CSR adjacency matrix, weighted by the number of relationships between two nodes
+    (the undirected GDS projection). Returns the matrix, the internal node id of every row and the previous level 0 community of every row (or -1).
+    [IDN]: Membaca graf entitas halaman demi halaman ke matriks adjacency CSR yang simetris, dengan bobot jumlah relasi antara dua node
+    (proyeksi GDS tak berarah). Mengembalikan matriks, id internal node dari setiap baris, dan community level 0 sebelumnya dari setiap baris (atau -1).
+    """
+    query = EXPORT_ENTITY_GRAPH_PAGE.format(node_projection=node_projection)
+    sources, targets, seeds = [], [], {}
+    after = -1
+    while True:
+        page = runner.run_cypher(query, params={"after": after, "page_size": page_size}).to_dict(orient="records")
+        if not page:
+            break
+        for row in page:
+            node_targets = row["targets"]
+            sources.extend([row["source"]] * len(node_targets))
+            targets.extend(node_targets)
+            seed = row["seed"]
+            if seed is not None and seed == seed:
+                seeds[row["source"]] = int(seed)
+        after = max(row["source"] for row in page)
+        if len(page) < page_size:
+            break
+
+    node_ids, positions = np.unique(np.array(sources + targets, dtype=np.int64), return_inverse=True)
+    rows, columns = positions[:len(sources)], positions[len(sources):]
+    adjacency = sparse.coo_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(node_ids), len(node_ids))).tocsr()
+    adjacency = (adjacency + adjacency.T).tocsr()
+    node_seeds = np.array([seeds.get(int(node_id), -1) for node_id in node_ids], dtype=np.int64)
+    return adjacency, node_ids, node_seeds
+
+def get_membership_matrix(communities, count):
+    return sparse.csr_matrix((np.ones(len(communities)), (np.arange(len(communities)), communities)), shape=(len(communities), count))
+
+def move_nodes(adjacency, communities, rng, max_iterations=MAX_LOCAL_MOVING_ITERATIONS):
+    """
+    Louvain local moving phase, vectorized: every iteration computes the modularity gain of moving each node to each neighbouring community
+    with sparse products and moves a random half of the nodes with a positive gain (all at once, the random half prevents two nodes from swapping forever).
+    """
+    communities = np.unique(communities, return_inverse=True)[1]
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    total_weight = degrees.sum()
+    if total_weight == 0:
+        return communities
+    self_loops = adjacency.diagonal()
+    node_count = len(communities)
+
+    for _ in range(max_iterations):
+        totals = np.bincount(communities, weights=degrees, minlength=node_count)
+        # Weight from every node to every neighbouring community.
+        links = (adjacency @ get_membership_matrix(communities, node_count)).tocoo()
+        own = links.col == communities[links.row]
+        own_links = np.zeros(node_count)
+        own_links[links.row[own]] = links.data[own]
+        stay = own_links - self_loops - degrees * (totals[communities] - degrees) / total_weight
+
+        gains = links.data - degrees[links.row] * totals[links.col] / total_weight
+        gains[own] = -np.inf
+        order = np.lexsort((gains, links.row))
+        last = np.r_[links.row[order][1:] != links.row[order][:-1], True]
+        best = order[last]
+        best_rows, best_communities, best_gains = links.row[best], links.col[best], gains[best]
+
+        movable = (best_gains > stay[best_rows] + 1e-12) & (rng.random(len(best_rows)) < MOVE_PROBABILITY)
+        if not movable.any():
+            if not (best_gains > stay[best_rows] + 1e-12).any():
+                break
+            continue
+        communities = communities.copy()
+        communities[best_rows[movable]] = best_communities[movable]
+        communities = np.unique(communities, return_inverse=True)[1]
+    return communities
+
+def refine_communities(adjacency, communities):
+    """Leiden guarantee: every community is connected, a community made of disconnected parts is split into its connected components."""
+    internal = adjacency.tocoo()
+    keep = communities[internal.row] == communities[internal.col]
+    graph = sparse.csr_matrix((internal.data[keep], (internal.row[keep], internal.col[keep])), shape=adjacency.shape)
+    return connected_components(graph, directed=False)[1]
+
+def detect_communities(adjacency, seeds=None, max_levels=3, random_seed=RANDOM_SEED):
+    """
+    [ENG]: Hierarchical community detection (Louvain local moving with the connected community refinement of Leiden). Returns one array per level
+    with the community of every node, the first level is the most detailed like the intermediate communities of `gds.leiden`.
+    With `seeds`, nodes start in their previous level 0 community (-1 for new nodes), every level uses its own random generator,
+    so the same level 0 communities give the same hierarchy.
+    [IDN]: Deteksi community hierarkis (local moving Louvain dengan penyempurnaan community terhubung dari Leiden). Mengembalikan satu array per level
+    berisi community dari setiap node, level pertama adalah yang paling detail seperti intermediate communities dari `gds.leiden`.
+    Dengan `seeds`, node dimulai pada community level 0 sebelumnya (-1 untuk node baru), setiap level memakai random generator sendiri,
+    sehingga community level 0 yang sama menghasilkan hierarki yang sama.
+    """
+    node_count = adjacency.shape[0]
+    if seeds is not None:
+        # New nodes start alone, after the seeded communities.
+        initial = np.where(seeds >= 0, seeds, seeds.max(initial=0) + 1 + np.arange(node_count))
+    else:
+        initial = np.arange(node_count)
+
+    levels, membership, graph = [], np.arange(node_count), adjacency
+    for level in range(max_levels):
+        rng = np.random.default_rng([random_seed, level])
+        communities = refine_communities(graph, move_nodes(graph, initial, rng))
+        count = communities.max() + 1 if len(communities) else 0
+        if levels and count == graph.shape[0]:
+            break
+        membership = communities[membership]
+        levels.append(membership)
+        if count == graph.shape[0]:
+            break
+        assignment = get_membership_matrix(communities, count)
+        graph = (assignment.T @ graph @ assignment).tocsr()
+        initial = np.arange(count)
+    return levels
+
+def write_entity_communities(runner, node_ids, levels, batch_size=WRITE_BATCH_SIZE):
+    """Write the `communities` property (one community per level) of every node in batches."""
+    assignments = np.stack(levels, axis=1) if levels else np.empty((len(node_ids), 0), dtype=np.int64)
+    for start in range(0, len(node_ids), batch_size):
+        rows = [
+            {"nodeId": int(node_id), "communities": [int(community) for community in communities]}
+            for node_id, communities in zip(node_ids[start:start + batch_size], assignments[start:start + batch_size])
+        ]
+        runner.run_cypher(WRITE_ENTITY_COMMUNITIES, params={"rows": rows})
+
+def write_communities_in_process(runner, node_projection, max_levels=3, seeded=False):
+    """
+    [ENG]: Detect the communities of the entity graph in this process and write them to the `communities` property of the entities,
+    used when the Graph Data Science plugin is not available. Returns `True` if the communities were written.
+    [IDN]: Mendeteksi community dari graf entitas di proses ini dan menulisnya ke properti `communities` dari entitas,
+    digunakan jika plugin Graph Data Science tidak tersedia. Mengembalikan `True` jika community berhasil ditulis.
+    """
+    try:
+        start = time.time()
+        adjacency, node_ids, seeds = export_entity_graph(runner, node_projection)
+        logging.info(f"Exported the entity graph in {time.time() - start:.2f} seconds: {len(node_ids)} nodes, {adjacency.nnz} relationships.")
+        if not len(node_ids):
+            logging.warning("The entity graph has no relationships, no communities were written.")
+            return False
+        levels = detect_communities(adjacency, seeds if seeded else None, max_levels=max_levels)
+        logging.info(f"Detected communities in {time.time() - start:.2f} seconds: {[int(level.max()) + 1 for level in levels]} communities per level.")
+        write_entity_communities(runner, node_ids, levels)
+        logging.info(f"Communities written in process in {time.time() - start:.2f} seconds.")
+        return True
+    except Exception as e:
+        logging.error(f"Failed to write communities in process: {e}")
+        return False
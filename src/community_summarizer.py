@@ -0,0 +1,150 @@
+import time
+import random
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from src.shared.constants import (
+    COMMUNITY_SUMMARY_CONCURRENCY,
+    COMMUNITY_SUMMARY_WRITE_BATCH_SIZE,
+    COMMUNITY_SUMMARY_MAX_RETRIES,
+    COMMUNITY_SUMMARY_RETRY_BASE_DELAY,
+    COMMUNITY_SUMMARY_RETRY_MAX_DELAY,
+)
+
+def get_retry_after(error) -> Optional[float]:
+    """Seconds from the `Retry-After` header of a provider error, if the error carries the HTTP response."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def is_rate_limit_error(error) -> bool:
+    """True for the 429 / rate limit errors of the Groq and OpenAI clients (and of any client exposing the status code)."""
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status_code == 429:
+        return True
+    message = f"{type(error).__name__} {error}".lower()
+    return "ratelimit" in message or "rate limit" in message or "rate_limit" in message or "error code: 429" in message
+
+def get_backoff_delay(attempt, error, base_delay=COMMUNITY_SUMMARY_RETRY_BASE_DELAY, max_delay=COMMUNITY_SUMMARY_RETRY_MAX_DELAY):
+    """Exponential backoff with full jitter, the provider `Retry-After` wins when it is longer."""
+    delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+    retry_after = get_retry_after(error)
+    return max(delay, retry_after) if retry_after else delay
+
+class CommunitySummarizer:
+    """
+    [ENG]: Summarizes communities with at most `concurrency` LLM calls at a time. Rate limit (429) errors are retried with exponential backoff
+    (and `Retry-After`), other errors are retried up to `max_retries` times. Results are passed to `write_batch` every `batch_size` summaries,
+    so the finished work is stored while the rest is still running, and the progress and throughput are logged with every batch.
+
+    [IDN]: Meringkas community dengan maksimal `concurrency` pemanggilan LLM sekaligus. Error rate limit (429) diulang dengan exponential backoff
+    (dan `Retry-After`), error lain diulang hingga `max_retries` kali. Hasil diteruskan ke `write_batch` setiap `batch_size` ringkasan,
+    sehingga pekerjaan yang selesai tersimpan selagi sisanya masih berjalan, dan progres serta throughput dicatat pada setiap batch.
+    """
+    def __init__(
+        self,
+        summarize: Callable[[Dict[str, Any]], Dict[str, Any]],
+        write_batch: Callable[[List[Dict[str, Any]]], None],
+        concurrency=COMMUNITY_SUMMARY_CONCURRENCY,
+        batch_size=COMMUNITY_SUMMARY_WRITE_BATCH_SIZE,
+        max_retries=COMMUNITY_SUMMARY_MAX_RETRIES,
+        name="community",
+    ):
+        self.summarize = summarize
+        self.write_batch = write_batch
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.name = name
+
+    async def _summarize(self, executor, semaphore, community):
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            async with semaphore:
+                try:
+                    return await loop.run_in_executor(executor, self.summarize, community)
+                except Exception as e:
+                    error = e
+            rate_limited = is_rate_limit_error(error)
+            # Rate limits are retried longer than other errors, the provider recovers on its own.
+            if attempt >= (self.max_retries * 2 if rate_limited else self.max_retries):
+                logging.error(f"Giving up on {self.name} {community.get('communityId', 'unknown')} after {attempt + 1} attempts: {error}")
+                return None
+            delay = get_backoff_delay(attempt, error)
+            logging.warning(f"{'Rate limited' if rate_limited else 'Failed'} on {self.name} {community.get('communityId', 'unknown')}, retrying in {delay:.1f}s: {error}")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def arun(self, pages: Iterable[List[Dict[str, Any]]]) -> Dict[str, int]:
+        """
+        Summarize the communities of `pages` (an iterable of lists, e.g. a paged reader). The next page is read in a worker thread
+        as soon as fewer than `concurrency` summaries are left, so the LLM calls keep running while the pages are read.
+        """
+        start = time.time()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        iterator = iter(pages)
+        total, done, failed, written = 0, 0, 0, 0
+        buffer = []
+
+        async def flush():
+            nonlocal written, buffer
+            rows, buffer = buffer, []
+            if rows:
+                await loop.run_in_executor(None, self.write_batch, rows)
+                written += len(rows)
+                elapsed = time.time() - start
+                logging.info(f"{self.name.capitalize()} summaries: {done}/{total} done, {written} written, {failed} failed, {done / elapsed:.2f}/s")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="community_summary") as executor:
+            running = set()
+            next_page, exhausted = None, False
+            try:
+                while True:
+                    if next_page is None and not exhausted and len(running) < self.concurrency:
+                        next_page = loop.run_in_executor(None, next, iterator, None)
+                    waiting = running | {next_page} if next_page is not None else running
+                    if not waiting:
+                        break
+                    finished, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                    for future in finished:
+                        if future is next_page:
+                            next_page = None
+                            page = future.result()
+                            if page is None:
+                                exhausted = True
+                            else:
+                                total += len(page)
+                                running.update(asyncio.ensure_future(self._summarize(executor, semaphore, community)) for community in page)
+                            continue
+                        running.discard(future)
+                        done += 1
+                        result = future.result()
+                        if result:
+                            buffer.append(result)
+                        else:
+                            failed += 1
+                        if len(buffer) >= self.batch_size:
+                            await flush()
+                await flush()
+            finally:
+                for task in running:
+                    task.cancel()
+
+        logging.info(f"{self.name.capitalize()} summaries finished in {time.time() - start:.2f} seconds: {written} written, {failed} failed")
+        return {"total": total, "written": written, "failed": failed}
+
+    def run(self, communities: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Blocking entry point, the community pipeline runs in a worker thread without an event loop."""
+        if not communities:
+            return {"total": 0, "written": 0, "failed": 0}
+        return asyncio.run(self.arun([communities]))
+
+    def run_pages(self, pages: Iterable[List[Dict[str, Any]]]) -> Dict[str, int]:
+        """Blocking entry point for communities that arrive in pages (see `stream_community_info`)."""
+        return asyncio.run(self.arun(pages))
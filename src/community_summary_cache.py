@@ -0,0 +1,96 @@
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+from contextlib import closing
+from typing import Dict, Iterable, List
+from src.shared.constants import COMMUNITY_SUMMARY_CACHE_MAX_AGE_SECONDS, COMMUNITY_SUMMARY_CACHE_MAX_ENTRIES
+
+# Part of every hash, bump it when the way a community is turned into a prompt changes.
+COMMUNITY_SUMMARY_CACHE_VERSION = 1
+
+def get_community_hash(community, model, prompt_version):
+    """
+    [ENG]: Stable hash of a level 0 community: its sorted members (id, type, description) and relationships, the summary model and the prompt version.
+    [IDN]: Hash stabil dari community level 0: anggota yang sudah diurutkan (id, tipe, deskripsi) dan relasinya, model peringkas, dan versi prompt.
+    """
+    nodes = sorted((str(node.get("id")), str(node.get("type")), str(node.get("description") or "")) for node in community["nodes"])
+    rels = sorted((str(rel.get("start")), str(rel.get("type")), str(rel.get("end"))) for rel in community["rels"])
+    key = {"version": COMMUNITY_SUMMARY_CACHE_VERSION, "prompt": prompt_version, "model": model, "nodes": nodes, "rels": rels}
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+def get_parent_community_hash(community, model, prompt_version):
+    """
+    [ENG]: Stable hash of a parent community: the sorted summaries of its children, the summary model and the prompt version.
+    [IDN]: Hash stabil dari community parent: ringkasan anak-anaknya yang sudah diurutkan, model peringkas, dan versi prompt.
+    """
+    key = {"version": COMMUNITY_SUMMARY_CACHE_VERSION, "prompt": prompt_version, "model": model, "texts": sorted(community.get("texts", []))}
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+class CommunitySummaryCache:
+    """
+    [ENG]: Community titles and summaries stored in a SQLite file keyed by the community hash, so a community with the same content
+    is never summarized twice, also after the communities are recreated. Entries older than `max_age_seconds` and the oldest entries
+    above `max_entries` are pruned when the cache is opened.
+    [IDN]: Judul dan ringkasan community yang disimpan di file SQLite dengan kunci hash community, sehingga community dengan isi yang sama
+    tidak pernah diringkas dua kali, juga setelah community dibuat ulang. Entri yang lebih lama dari `max_age_seconds` dan entri tertua
+    di atas `max_entries` dihapus saat cache dibuka.
+    """
+    def __init__(self, path, max_age_seconds=COMMUNITY_SUMMARY_CACHE_MAX_AGE_SECONDS, max_entries=COMMUNITY_SUMMARY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        with closing(sqlite3.connect(self.path)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS community_summaries (hash TEXT PRIMARY KEY, title TEXT, summary TEXT NOT NULL, created_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS community_summaries_created_at ON community_summaries (created_at)")
+            conn.commit()
+        self.prune()
+
+    def prune(self):
+        removed = 0
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            if self.max_age_seconds:
+                removed += conn.execute("DELETE FROM community_summaries WHERE created_at < ?", (time.time() - self.max_age_seconds,)).rowcount
+            if self.max_entries:
+                removed += conn.execute(
+                    "DELETE FROM community_summaries WHERE hash NOT IN (SELECT hash FROM community_summaries ORDER BY created_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                ).rowcount
+            conn.commit()
+        if removed:
+            logging.info(f"Pruned {removed} community summaries from the cache")
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        hashes = list(set(hashes))
+        found = {}
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            # Stay below the SQLite variable limit.
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                rows = conn.execute(f"SELECT hash, title, summary FROM community_summaries WHERE hash IN ({','.join('?' * len(batch))})", batch).fetchall()
+                found.update({row[0]: {"title": row[1], "summary": row[2]} for row in rows})
+        return found
+
+    def put_many(self, rows: List[Dict[str, str]]):
+        rows = [row for row in rows if row.get("hash") and row.get("summary")]
+        if not rows:
+            return
+        now = time.time()
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO community_summaries (hash, title, summary, created_at) VALUES (?, ?, ?, ?)",
+                [(row["hash"], row.get("title"), row["summary"], now) for row in rows]
+            )
+            conn.commit()
+
+def create_community_summary_cache(path=None):
+    """
+    [ENG]: Create the community summary cache, or return None when no `path` is configured (every community is summarized).
+    [IDN]: Membuat cache ringkasan community, atau mengembalikan None jika `path` tidak dikonfigurasi (setiap community diringkas).
+    """
+    if not path:
+        return None
+    logging.info(f"Community summaries cached in SQLite: {path}")
+    return CommunitySummaryCache(path)
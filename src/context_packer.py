@@ -0,0 +1,164 @@
+import logging
+from functools import lru_cache
+import tiktoken
+from src.shared.constants import (
+    CHAT_CONTEXT_TOKEN_BUDGET,
+    CHAT_CONTEXT_DEFAULT_TOKEN_BUDGET,
+    CHAT_CONTEXT_UNIT_WEIGHTS,
+    CHAT_CONTEXT_MIN_TRUNCATED_TOKENS,
+)
+
+CHUNK_UNIT = "chunk"
+ENTITY_UNIT = "entity"
+RELATIONSHIP_UNIT = "relationship"
+
+SECTION_SEPARATOR = "\n----\n"
+TEXT_CONTENT_HEADER = "Text Content:\n"
+ENTITIES_HEADER = "Entities:\n"
+RELATIONSHIPS_HEADER = "Relationships:\n"
+MIN_OVERLAP_CHARS = 32
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model):
+    """
+    [ENG]: Tokenizer used to count the context tokens of a chat model. The OpenAI models use their own encoding,
+    the other providers do not publish a tiktoken encoding, so `cl100k_base` is used as a close estimate.
+    [IDN]: Tokenizer untuk menghitung token konteks dari model chat. Model OpenAI menggunakan encoding miliknya,
+    provider lain tidak menyediakan encoding tiktoken, sehingga `cl100k_base` dipakai sebagai perkiraan yang dekat.
+    """
+    model = (model or "").lower()
+    encoding = "o200k_base" if "gpt_4o" in model or "gpt-4o" in model else "cl100k_base"
+    return tiktoken.get_encoding(encoding)
+
+def get_context_token_budget(model):
+    for model_names, budget in CHAT_CONTEXT_TOKEN_BUDGET.items():
+        if any(model == model_name for model_name in model_names):
+            return budget
+    return CHAT_CONTEXT_DEFAULT_TOKEN_BUDGET
+
+def split_document_units(text):
+    """
+    Split a retrieved document into packable (kind, text) units. The graph vector documents are split into their chunks,
+    entity lines and relationship lines, any other document is a single chunk unit.
+    """
+    if not text.startswith(TEXT_CONTENT_HEADER):
+        return [(CHUNK_UNIT, text)]
+    units = []
+    kind = CHUNK_UNIT
+    for part in text[len(TEXT_CONTENT_HEADER):].split(SECTION_SEPARATOR):
+        if part.startswith(ENTITIES_HEADER):
+            kind, part = ENTITY_UNIT, part[len(ENTITIES_HEADER):]
+        elif part.startswith(RELATIONSHIPS_HEADER):
+            kind, part = RELATIONSHIP_UNIT, part[len(RELATIONSHIPS_HEADER):]
+        if kind == CHUNK_UNIT:
+            units.append((kind, part))
+        else:
+            units.extend((kind, line) for line in part.split("\n") if line.strip())
+    return units
+
+def join_document_units(units):
+    """Inverse of `split_document_units` for the units that were packed."""
+    chunks = [text for kind, text in units if kind == CHUNK_UNIT]
+    entities = [text for kind, text in units if kind == ENTITY_UNIT]
+    relationships = [text for kind, text in units if kind == RELATIONSHIP_UNIT]
+    if not entities and not relationships:
+        return SECTION_SEPARATOR.join(chunks)
+    return (
+        TEXT_CONTENT_HEADER + SECTION_SEPARATOR.join(chunks)
+        + SECTION_SEPARATOR + ENTITIES_HEADER + "\n".join(entities)
+        + SECTION_SEPARATOR + RELATIONSHIPS_HEADER + "\n".join(relationships)
+    )
+
+def remove_overlap(text, packed_chunks):
+    """
+    Remove the part of a chunk that overlaps the start or the end of an already packed chunk
+    (neighbouring chunks share their split overlap). Returns None when the chunk is fully contained in one.
+    """
+    for packed in packed_chunks:
+        if text in packed:
+            return None
+        anchor = text[:MIN_OVERLAP_CHARS]
+        if len(anchor) == MIN_OVERLAP_CHARS:
+            position = packed.find(anchor)
+            while position != -1:
+                if text.startswith(packed[position:]):
+                    text = text[len(packed) - position:]
+                    break
+                position = packed.find(anchor, position + 1)
+        anchor = text[-MIN_OVERLAP_CHARS:]
+        if len(anchor) == MIN_OVERLAP_CHARS:
+            position = packed.rfind(anchor)
+            while position != -1:
+                end = position + MIN_OVERLAP_CHARS
+                if text.endswith(packed[:end]):
+                    text = text[:len(text) - end]
+                    break
+                position = packed.rfind(anchor, 0, end - 1)
+    return text.strip() or None
+
+class ContextPacker:
+    """
+    [ENG]: Greedily packs the retrieved documents into a token budget. Every chunk, entity line and relationship line is a unit
+    valued by the rank of its document and the weight of its kind, the most valuable units are taken first.
+    Duplicate units and the overlapping text of neighbouring chunks are removed, and the last chunk that does not fit is truncated.
+
+    [IDN]: Menyusun dokumen yang diambil secara greedy ke dalam batas token. Setiap chunk, baris entitas, dan baris relasi adalah unit
+    yang dinilai dari peringkat dokumennya dan bobot jenisnya, unit yang paling bernilai diambil lebih dulu.
+    Unit duplikat dan teks tumpang tindih dari chunk yang bersebelahan dihapus, dan chunk terakhir yang tidak muat dipotong.
+    """
+    def __init__(self, model, budget=None):
+        self.tokenizer = get_tokenizer(model)
+        self.budget = budget or get_context_token_budget(model)
+
+    def count_tokens(self, text):
+        return len(self.tokenizer.encode(text, disallowed_special=()))
+
+    def truncate(self, text, max_tokens):
+        return self.tokenizer.decode(self.tokenizer.encode(text, disallowed_special=())[:max_tokens])
+
+    def pack(self, documents, format_document):
+        """
+        Pack `documents` (best first) and return the (document, packed text) pairs that were kept, in the same order.
+        `format_document(document, text)` renders a document, its empty rendering is counted as the document overhead.
+        """
+        candidates = []
+        for rank, doc in enumerate(documents):
+            for position, (kind, text) in enumerate(split_document_units(doc.page_content)):
+                value = CHAT_CONTEXT_UNIT_WEIGHTS[kind] / (rank + 1)
+                candidates.append((value, rank, position, kind, text))
+        candidates.sort(key=lambda candidate: (-candidate[0], candidate[1], candidate[2]))
+
+        remaining = self.budget
+        packed = {}
+        seen = set()
+        packed_chunks = []
+        truncated = 0
+        for _, rank, position, kind, text in candidates:
+            key = (kind, " ".join(text.split()).lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            if kind == CHUNK_UNIT:
+                text = remove_overlap(text, packed_chunks)
+                if text is None:
+                    continue
+            # One extra token for the separator, and the document wrapper is paid by its first unit.
+            tokens = self.count_tokens(text) + 1
+            overhead = 0 if rank in packed else self.count_tokens(format_document(documents[rank], ""))
+            if tokens + overhead > remaining:
+                available = remaining - overhead - 1
+                if kind != CHUNK_UNIT or available < CHAT_CONTEXT_MIN_TRUNCATED_TOKENS:
+                    continue
+                text = self.truncate(text, available)
+                tokens = available + 1
+                truncated += 1
+            remaining -= tokens + overhead
+            packed.setdefault(rank, []).append((position, kind, text))
+            if kind == CHUNK_UNIT:
+                packed_chunks.append(text)
+
+        logging.info(f"Packed {sum(len(units) for units in packed.values())} of {len(candidates)} context units from {len(packed)} of {len(documents)} documents into {self.budget - remaining}/{self.budget} tokens ({truncated} truncated)")
+        return [
+            (documents[rank], join_document_units([(kind, text) for _, kind, text in sorted(packed[rank])]))
+            for rank in sorted(packed)
+        ]
@@ -0,0 +1,229 @@
+import json
+import asyncio
+import math
+import time
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+from neo4j import RoutingControl
+from langchain_core.messages import SystemMessage, HumanMessage
+from src.llm import get_llm
+from src.symptom_state import normalize_symptom
+from src.shared.constants import (
+    DIAGNOSIS_SYMPTOM_LABELS,
+    DIAGNOSIS_DISEASE_LABELS,
+    DIAGNOSIS_COOCCURRENCE_WEIGHT,
+    DIAGNOSIS_DEFAULT_TOP_K,
+    DIAGNOSIS_SUBGRAPH_MAX_NEIGHBOURS,
+    DIAGNOSIS_EXPLANATION_PROMPT,
+    DIAGNOSIS_INDEX_LABEL,
+)
+
+DISEASE_SYMPTOM_RELATIONSHIPS_QUERY = """
+MATCH (d) WHERE d.id IS NOT NULL AND any(label IN labels(d) WHERE label IN $disease_labels)
+MATCH (d)-[r]-(s) WHERE s.id IS NOT NULL AND any(label IN labels(s) WHERE label IN $symptom_labels)
+RETURN elementId(d) AS element_id, d.id AS disease, s.id AS symptom, count(r) AS relationships
+"""
+
+DISEASE_SYMPTOM_COOCCURRENCES_QUERY = """
+MATCH (c:Chunk)-[:HAS_ENTITY]->(d) WHERE d.id IS NOT NULL AND any(label IN labels(d) WHERE label IN $disease_labels)
+MATCH (c)-[:HAS_ENTITY]->(s) WHERE s.id IS NOT NULL AND any(label IN labels(s) WHERE label IN $symptom_labels)
+RETURN elementId(d) AS element_id, d.id AS disease, s.id AS symptom, count(DISTINCT c) AS cooccurrences
+"""
+
+DISEASE_SUBGRAPH_QUERY = """
+UNWIND $element_ids AS element_id
+MATCH (d) WHERE elementId(d) = element_id
+OPTIONAL MATCH (d)-[r]-(n) WHERE NOT (n:Chunk OR n:Document OR n:`__Community__`)
+WITH d, collect(CASE WHEN n IS NULL THEN NULL ELSE {
+    relationship: type(r), neighbour: n.id, labels: [label IN labels(n) WHERE label <> '__Entity__'], outgoing: startNode(r) = d
+} END)[..$max_neighbours] AS neighbours
+RETURN elementId(d) AS element_id, d.id AS disease, coalesce(d.description, '') AS description, neighbours
+"""
+
+# The index is stored in the database it was built from, so the API that builds it and the chat API that reads it
+# do not need to share a filesystem.
+WRITE_DIAGNOSIS_INDEX_QUERY = """
+MERGE (i:`{label}` {{id: $id}})
+SET i.version = $version, i.built_at = $built_at, i.data = $data
+""".format(label=DIAGNOSIS_INDEX_LABEL)
+
+GET_DIAGNOSIS_INDEX_VERSION_QUERY = """
+MATCH (i:`{label}` {{id: $id}})
+RETURN i.version AS version
+""".format(label=DIAGNOSIS_INDEX_LABEL)
+
+GET_DIAGNOSIS_INDEX_QUERY = """
+MATCH (i:`{label}` {{id: $id}})
+RETURN i.data AS data
+""".format(label=DIAGNOSIS_INDEX_LABEL)
+
+DIAGNOSIS_INDEX_ID = "symptom_disease"
+
+def build_diagnosis_index(graph, symptom_labels=DIAGNOSIS_SYMPTOM_LABELS, disease_labels=DIAGNOSIS_DISEASE_LABELS):
+    """
+    [ENG]: Build the symptom to disease inverted index of a database and store it in a `__DiagnosisIndex__` node. Every (symptom, disease) pair
+    is weighted by the relationships between both entities and the chunks that mention both, the symptoms are normalized
+    like the session symptom state and weighted by how specific they are (inverse disease frequency).
+    [IDN]: Membangun inverted index gejala ke penyakit dari sebuah database dan menyimpannya di node `__DiagnosisIndex__`. Setiap pasangan (gejala, penyakit)
+    diberi bobot dari relasi antara kedua entitas dan chunk yang menyebut keduanya, gejala dinormalisasi
+    seperti state gejala sesi dan diberi bobot berdasarkan seberapa spesifik gejala tersebut (inverse disease frequency).
+    """
+    start = time.time()
+    params = {"symptom_labels": list(symptom_labels), "disease_labels": list(disease_labels)}
+    pairs = {}
+    for row in graph.query(DISEASE_SYMPTOM_RELATIONSHIPS_QUERY, params):
+        pair = pairs.setdefault((row["element_id"], row["disease"], normalize_symptom(row["symptom"])), [0, 0])
+        pair[0] += row["relationships"]
+    for row in graph.query(DISEASE_SYMPTOM_COOCCURRENCES_QUERY, params):
+        pair = pairs.setdefault((row["element_id"], row["disease"], normalize_symptom(row["symptom"])), [0, 0])
+        pair[1] += row["cooccurrences"]
+
+    diseases, disease_positions, postings = [], {}, {}
+    for (element_id, disease, symptom), (relationships, cooccurrences) in pairs.items():
+        if not symptom:
+            continue
+        if element_id not in disease_positions:
+            disease_positions[element_id] = len(diseases)
+            diseases.append({"id": disease, "element_id": element_id})
+        weight = math.log1p(relationships) + DIAGNOSIS_COOCCURRENCE_WEIGHT * math.log1p(cooccurrences)
+        postings.setdefault(symptom, {})[disease_positions[element_id]] = round(weight, 4)
+
+    idf = {symptom: round(math.log(1 + len(diseases) / len(entries)), 4) for symptom, entries in postings.items()}
+    norms = [0.0] * len(diseases)
+    for symptom, entries in postings.items():
+        for position, weight in entries.items():
+            norms[position] += (weight * idf[symptom]) ** 2
+    index = {
+        "diseases": diseases,
+        "norms": [round(math.sqrt(norm), 4) for norm in norms],
+        "idf": idf,
+        "postings": {symptom: sorted(entries.items()) for symptom, entries in postings.items()},
+    }
+    index["version"] = hashlib.sha256(json.dumps(index, sort_keys=True).encode()).hexdigest()[:16]
+    index["built_at"] = time.time()
+
+    graph.query(WRITE_DIAGNOSIS_INDEX_QUERY, {
+        "id": DIAGNOSIS_INDEX_ID,
+        "version": index["version"],
+        "built_at": index["built_at"],
+        "data": json.dumps(index, separators=(",", ":")),
+    })
+    logging.info(f"Diagnosis index built in {time.time() - start:.2f} seconds: {len(postings)} symptoms, {len(diseases)} diseases, {len(pairs)} pairs")
+    return {"symptoms": len(postings), "diseases": len(diseases), "version": index["version"]}
+
+class DiagnosisIndex:
+    """
+    [ENG]: Loaded symptom to disease inverted index. `rank` scores the diseases of a symptom set with a lookup per symptom.
+    [IDN]: Inverted index gejala ke penyakit yang sudah dimuat. `rank` memberi skor penyakit dari sekumpulan gejala dengan satu lookup per gejala.
+    """
+    def __init__(self, data):
+        self.version = data["version"]
+        self.built_at = data["built_at"]
+        self.diseases = data["diseases"]
+        self.norms = data["norms"]
+        self.idf = data["idf"]
+        self.postings = data["postings"]
+
+    def rank(self, symptoms: List[str], negated: Optional[List[str]] = None, top_k=DIAGNOSIS_DEFAULT_TOP_K) -> Dict[str, Any]:
+        """
+        Cosine-like score of every disease sharing a symptom: the matched symptom weights (times their specificity) over the norm
+        of the disease, denied symptoms of a disease lower its score. Unknown symptoms are reported back.
+        """
+        scores, matched = {}, {}
+        known, unknown = [], []
+        for sign, names in ((1.0, symptoms), (-1.0, negated or [])):
+            for name in dict.fromkeys(normalize_symptom(symptom) for symptom in names):
+                if name not in self.postings:
+                    if sign > 0 and name:
+                        unknown.append(name)
+                    continue
+                if sign > 0:
+                    known.append(name)
+                for position, weight in self.postings[name]:
+                    scores[position] = scores.get(position, 0.0) + sign * weight * self.idf[name]
+                    if sign > 0:
+                        matched.setdefault(position, []).append(name)
+
+        ranked = sorted(
+            ((score / self.norms[position], position) for position, score in scores.items() if position in matched and self.norms[position]),
+            key=lambda item: -item[0]
+        )[:top_k]
+        candidates = [
+            {**self.diseases[position], "score": round(score, 4), "matched_symptoms": matched[position]}
+            for score, position in ranked
+        ]
+        return {"candidates": candidates, "known_symptoms": known, "unknown_symptoms": unknown, "index_version": self.version}
+
+class DiagnosisIndexRegistry:
+    """
+    [ENG]: Loads the diagnosis indexes stored by the post-processing task. Every lookup reads the version of the stored index,
+    an index rebuilt by any process is loaded on the next lookup.
+    [IDN]: Memuat index diagnosis yang disimpan oleh task post-processing. Setiap lookup membaca versi index yang tersimpan,
+    index yang dibangun ulang oleh proses mana pun dimuat pada lookup berikutnya.
+    """
+    def __init__(self):
+        self._indexes = {}
+
+    async def aget(self, driver, database) -> Optional[DiagnosisIndex]:
+        records, _, _ = await driver.execute_query(
+            GET_DIAGNOSIS_INDEX_VERSION_QUERY, {"id": DIAGNOSIS_INDEX_ID}, database_=database, routing_=RoutingControl.READ
+        )
+        if not records:
+            return None
+        key = (id(driver), database)
+        cached = self._indexes.get(key)
+        if cached is not None and cached.version == records[0]["version"]:
+            return cached
+        records, _, _ = await driver.execute_query(
+            GET_DIAGNOSIS_INDEX_QUERY, {"id": DIAGNOSIS_INDEX_ID}, database_=database, routing_=RoutingControl.READ
+        )
+        if not records:
+            return None
+        index = await asyncio.to_thread(lambda: DiagnosisIndex(json.loads(records[0]["data"])))
+        self._indexes[key] = index
+        logging.info(f"Loaded diagnosis index {index.version} for database {database}")
+        return index
+
+async def afetch_disease_subgraphs(driver, database, candidates, max_neighbours=DIAGNOSIS_SUBGRAPH_MAX_NEIGHBOURS) -> List[Dict[str, Any]]:
+    records, _, _ = await driver.execute_query(
+        DISEASE_SUBGRAPH_QUERY, {"element_ids": [candidate["element_id"] for candidate in candidates], "max_neighbours": max_neighbours},
+        database_=database, routing_=RoutingControl.READ
+    )
+    return [record.data() for record in records]
+
+def format_disease_subgraph(subgraph) -> str:
+    lines = [f"Penyakit: {subgraph['disease']}"]
+    if subgraph["description"]:
+        lines.append(f"Deskripsi: {subgraph['description']}")
+    for neighbour in subgraph["neighbours"]:
+        label = neighbour["labels"][0] if neighbour["labels"] else "Entity"
+        if neighbour["outgoing"]:
+            lines.append(f"{subgraph['disease']} -[{neighbour['relationship']}]-> {neighbour['neighbour']} ({label})")
+        else:
+            lines.append(f"{neighbour['neighbour']} ({label}) -[{neighbour['relationship']}]-> {subgraph['disease']}")
+    return "\n".join(lines)
+
+async def aexplain_candidates(driver, database, model, symptoms, negated, candidates) -> Dict[str, Any]:
+    """
+    [ENG]: Explain the ranked candidates with the LLM, grounded on the subgraph around each candidate disease.
+    [IDN]: Menjelaskan kandidat yang sudah diurutkan dengan LLM, berdasarkan subgraph di sekitar setiap kandidat penyakit.
+    """
+    subgraphs = await afetch_disease_subgraphs(driver, database, candidates)
+    positions = {candidate["element_id"]: position for position, candidate in enumerate(candidates)}
+    subgraphs.sort(key=lambda subgraph: positions.get(subgraph["element_id"], len(positions)))
+    context = "\n\n".join(format_disease_subgraph(subgraph) for subgraph in subgraphs)
+
+    llm, model_name = get_llm(model)
+    question = f"Gejala pasien: {', '.join(symptoms)}."
+    if negated:
+        question += f" Pasien tidak mengalami: {', '.join(negated)}."
+    question += "\nKandidat penyakit (urut dari skor tertinggi): " + ", ".join(candidate["id"] for candidate in candidates)
+    response = await llm.ainvoke([
+        SystemMessage(content=DIAGNOSIS_EXPLANATION_PROMPT.format(context=context)),
+        HumanMessage(content=question),
+    ])
+    return {"explanation": response.content, "model": model_name, "subgraphs": subgraphs}
+
+def create_diagnosis_index_registry():
+    return DiagnosisIndexRegistry()
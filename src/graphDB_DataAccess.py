@@ -6,7 +6,7 @@ from langchain_neo4j import Neo4jGraph
 from src.entities.source_node import sourceNode
 from src.communities import MAX_COMMUNITY_LEVELS
 from src.shared.utils import create_gcs_bucket_folder_name_hashed, delete_uploaded_local_file, load_embedding_model
-from src.shared.constants import NODEREL_COUNT_QUERY_WITH_COMMUNITY, NODEREL_COUNT_QUERY_WITHOUT_COMMUNITY
+from src.shared.constants import NODEREL_COUNT_QUERY_WITH_COMMUNITY, NODEREL_COUNT_QUERY_WITHOUT_COMMUNITY, COMMUNITY_DELETE_BATCH_SIZE
 
 load_dotenv()
 
@@ -320,23 +320,22 @@ class graphDBdataAccess:
             DETACH DELETE d
             } IN TRANSACTIONS OF 1 ROWS
             """
+        # Level by level, the parents left without children are only known once the level below is deleted.
         query_to_delete_communities = """
             MATCH (c:`__Community__`)
-            WHERE c.level = 0 AND NOT EXISTS { ()-[:IN_COMMUNITY]->(c) }
-            DETACH DELETE c
-            WITH 1 AS dummy
-            UNWIND range(1, $max_level)  AS level
-            CALL (level) {
-                MATCH (c:`__Community__`)
-                WHERE c.level = level AND NOT EXISTS { ()-[:PARENT_COMMUNITY]->(c) }
+            WHERE c.level = $level AND NOT EXISTS { ()-[:IN_COMMUNITY|PARENT_COMMUNITY]->(c) }
+            CALL (c) {
                 DETACH DELETE c
-                }
-        """   
+            } IN TRANSACTIONS OF $batch_size ROWS
+            RETURN count(*) AS deleted
+        """
         param = {"filename_list" : filename_list, "source_types_list": source_types_list}
-        community_param = {"max_level":MAX_COMMUNITY_LEVELS}
+        batch_size = int(os.getenv("COMMUNITY_DELETE_BATCH_SIZE", COMMUNITY_DELETE_BATCH_SIZE))
         if deleteEntities == "true":
             result = self.execute_query(query_to_delete_document_and_entities, param)
-            _ = self.execute_query(query_to_delete_communities,community_param)
+            for level in range(0, MAX_COMMUNITY_LEVELS + 1):
+                deleted = self.execute_query(query_to_delete_communities, {"level": level, "batch_size": batch_size})[0]["deleted"]
+                logging.info(f"Deleted {deleted} empty communities of level {level}")
             logging.info(f"Deleting {len(filename_list)} documents = '{filename_list}' from '{source_types_list}' from database")
         else :
             result = self.execute_query(query_to_delete_document, param)    
@@ -345,8 +344,8 @@ class graphDBdataAccess:
 
     def list_unconnected_nodes(self):
         query = """
-        MATCH (e:!Chunk&!Document&!`__Community__`) 
-        WHERE NOT exists { (e)--(:!Chunk&!Document&!`__Community__`) }
+        MATCH (e:!Chunk&!Document&!`__Community__`&!`__DiagnosisIndex__`) 
+        WHERE NOT exists { (e)--(:!Chunk&!Document&!`__Community__`&!`__DiagnosisIndex__`) }
         OPTIONAL MATCH (doc:Document)<-[:PART_OF]-(c:Chunk)-[:HAS_ENTITY]->(e)
         RETURN 
         e {
@@ -366,8 +365,8 @@ class graphDBdataAccess:
         LIMIT 100
         """
         query_total_nodes = """
-        MATCH (e:!Chunk&!Document&!`__Community__`) 
-        WHERE NOT exists { (e)--(:!Chunk&!Document&!`__Community__`) }
+        MATCH (e:!Chunk&!Document&!`__Community__`&!`__DiagnosisIndex__`) 
+        WHERE NOT exists { (e)--(:!Chunk&!Document&!`__Community__`&!`__DiagnosisIndex__`) }
         RETURN count(*) as total
         """
         nodes_list = self.execute_query(query)
@@ -542,7 +541,7 @@ class graphDBdataAccess:
         node_query = """
                     CALL db.labels() YIELD label
                     WITH label
-                    WHERE NOT label IN ['Document', 'Chunk', '_Bloom_Perspective_', '__Community__', '__Entity__']
+                    WHERE NOT label IN ['Document', 'Chunk', '_Bloom_Perspective_', '__Community__', '__Entity__', '__DiagnosisIndex__']
                     CALL apoc.cypher.run("MATCH (n:`" + label + "`) RETURN count(n) AS count",{}) YIELD value
                     WHERE value.count > 0
                     RETURN label order by label
@@ -566,4 +565,48 @@ class graphDBdataAccess:
         
 
 
-        
\ No newline at end of file
+        
+class asyncGraphDBdataAccess:
+    """
+    [ENG]: Async counterpart of `graphDBdataAccess` for the chat endpoints, running its queries on a shared async Neo4j driver.
+    [IDN]: Pasangan async dari `graphDBdataAccess` untuk endpoint chat, menjalankan query pada driver Neo4j async bersama.
+    """
+    def __init__(self, driver, database):
+        self.driver = driver
+        self.database = database
+
+    async def execute_query(self, query, param=None):
+        records, _, _ = await self.driver.execute_query(query, param or {}, database_=self.database)
+        return [record.data() for record in records]
+
+    async def check_account_access(self):
+        try:
+            result_dbms_componenet = await self.execute_query("call dbms.components() yield edition")
+
+            if result_dbms_componenet[0]["edition"] == "enterprise":
+                query = """
+                SHOW USER PRIVILEGES 
+                YIELD * 
+                WHERE graph = $database AND action IN ['read'] 
+                RETURN COUNT(*) AS readAccessCount
+                """
+                logging.info(f"Checking access for database: {self.database}")
+
+                result = await self.execute_query(query, {"database": self.database})
+                read_access_count = result[0]["readAccessCount"] if result else 0
+
+                logging.info(f"Read access count: {read_access_count}")
+
+                if read_access_count > 0:
+                    logging.info("The account has read access.")
+                    return False
+                logging.info("The account has write access.")
+                return True
+            else:
+                #Community version have no roles to execute admin command, so assuming write access as TRUE
+                logging.info("The account has write access.")
+                return True
+
+        except Exception as e:
+            logging.error(f"Error checking account access: {e}")
+            return False
@@ -0,0 +1,145 @@
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import CallbackManagerForChainRun
+from langchain_neo4j import GraphCypherQAChain
+from src.shared.constants import (
+    CHAT_GRAPH_SCHEMA_TTL_SECONDS,
+    CHAT_CYPHER_CACHE_MAX_ENTRIES,
+    CHAT_CYPHER_CACHE_TTL_SECONDS,
+)
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop the trailing punctuation, so trivially different questions share a cache entry."""
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?.!")
+
+def get_schema_version(schema):
+    return hashlib.sha256(schema.encode()).hexdigest()[:16]
+
+class GraphSchemaCache:
+    """
+    [ENG]: Snapshots of the database schema used by the graph chat mode, refreshed once they are older than `ttl_seconds`
+    or after `invalidate`. The version is a hash of the schema, so Cypher translations of an older schema are never reused.
+
+    [IDN]: Snapshot skema database yang digunakan oleh mode chat graph, diperbarui setelah lebih tua dari `ttl_seconds`
+    atau setelah `invalidate`. Versinya adalah hash dari skema, sehingga terjemahan Cypher dari skema lama tidak pernah dipakai ulang.
+    """
+    def __init__(self, ttl_seconds=CHAT_GRAPH_SCHEMA_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def apply(self, graph, uri, database):
+        """Set the cached schema on a `Neo4jGraph` created with `refresh_schema=False`, refreshing it when needed. Returns the schema version."""
+        key = (uri, database)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        if snapshot is None or time.time() - snapshot["fetched_at"] > self.ttl_seconds:
+            start = time.time()
+            graph.refresh_schema()
+            snapshot = {
+                "schema": graph.schema,
+                "structured_schema": graph.structured_schema,
+                "version": get_schema_version(graph.schema),
+                "fetched_at": time.time(),
+            }
+            with self._lock:
+                self._snapshots[key] = snapshot
+            logging.info(f"Graph schema refreshed in {time.time() - start:.2f} seconds (version {snapshot['version']})")
+        else:
+            graph.schema = snapshot["schema"]
+            graph.structured_schema = snapshot["structured_schema"]
+        return snapshot["version"]
+
+    def invalidate(self, uri, database):
+        with self._lock:
+            self._snapshots.pop((uri, database), None)
+
+class CypherCache:
+    """
+    [ENG]: LRU cache of question to Cypher translations keyed by schema version and normalized question.
+    Only queries that ran and returned results are stored.
+
+    [IDN]: Cache LRU untuk terjemahan pertanyaan ke Cypher dengan kunci versi skema dan pertanyaan yang sudah dinormalisasi.
+    Hanya query yang berhasil dijalankan dan mengembalikan hasil yang disimpan.
+    """
+    def __init__(self, max_entries=CHAT_CYPHER_CACHE_MAX_ENTRIES, ttl_seconds=CHAT_CYPHER_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, schema_version, question):
+        key = (schema_version, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, schema_version, question, cypher_query):
+        key = (schema_version, normalize_question(question))
+        with self._lock:
+            self._entries[key] = (cypher_query, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, schema_version, question):
+        with self._lock:
+            self._entries.pop((schema_version, normalize_question(question)), None)
+
+class CachedGraphCypherQAChain(GraphCypherQAChain):
+    """
+    [ENG]: `GraphCypherQAChain` that reuses the Cypher of a previously answered question (same schema version)
+    instead of generating it again. A cached query that fails falls back to generation.
+
+    [IDN]: `GraphCypherQAChain` yang memakai ulang Cypher dari pertanyaan yang pernah dijawab (versi skema yang sama)
+    alih-alih membuatnya lagi. Query dari cache yang gagal akan kembali ke proses pembuatan.
+    """
+    cypher_cache: Optional[Any] = None
+    schema_version: str = ""
+
+    def _call(self, inputs: Dict[str, Any], run_manager: Optional[CallbackManagerForChainRun] = None) -> Dict[str, Any]:
+        question = inputs[self.input_key]
+        if self.cypher_cache is None:
+            return super()._call(inputs, run_manager)
+
+        cypher_query = self.cypher_cache.get(self.schema_version, question)
+        if cypher_query is not None:
+            try:
+                context = self.graph.query(cypher_query)[: self.top_k]
+            except Exception as e:
+                logging.warning(f"Cached Cypher query failed, generating a new one: {e}")
+                self.cypher_cache.discard(self.schema_version, question)
+            else:
+                logging.info("Cypher query served from cache")
+                return self._answer(question, cypher_query, context, run_manager)
+
+        result = super()._call(inputs, run_manager)
+        steps = result.get("intermediate_steps", [])
+        generated = next((step["query"] for step in steps if "query" in step), None)
+        context = next((step["context"] for step in steps if "context" in step), None)
+        if generated and context:
+            self.cypher_cache.put(self.schema_version, question, generated)
+        return result
+
+    def _answer(self, question: str, cypher_query: str, context: List[Dict[str, Any]], run_manager: Optional[CallbackManagerForChainRun]) -> Dict[str, Any]:
+        """The answering half of `GraphCypherQAChain._call` for an already known query."""
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        if self.return_direct:
+            final_result = context
+        else:
+            final_result = self.qa_chain.invoke({"question": question, "context": context}, callbacks=_run_manager.get_child())
+        result = {self.output_key: final_result}
+        if self.return_intermediate_steps:
+            result["intermediate_steps"] = [{"query": cypher_query}, {"context": context}]
+        return result
@@ -1,15 +1,82 @@
 import os
+import httpx
 import logging
+import threading
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 from langchain.docstore.document import Document
 from langchain_experimental.graph_transformers.diffbot import DiffbotGraphTransformer
 from langchain_experimental.graph_transformers import LLMGraphTransformer
-from src.shared.constants import ADDITIONAL_INSTRUCTIONS
+from src.shared.constants import (
+    ADDITIONAL_INSTRUCTIONS,
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    LLM_HTTP_TIMEOUT_SECONDS,
+    LLM_HTTP_CONNECT_TIMEOUT_SECONDS,
+)
 
-def get_llm(model: str):
+_LLM_CLIENTS = {}
+_LLM_CLIENTS_LOCK = threading.Lock()
+_HTTP_CLIENTS = {}
+
+def get_http_clients():
+    """[ENG]: Return the shared keep-alive (sync, async) HTTP clients used by every Groq and OpenAI chat model,
+    so the connections (and their TLS sessions) to the providers are reused across requests.
+    [IDN]: Mengembalikan HTTP client keep-alive (sync, async) bersama yang digunakan oleh setiap model chat Groq dan OpenAI,
+    sehingga koneksi (dan sesi TLS-nya) ke provider digunakan ulang antar request."""
+    with _LLM_CLIENTS_LOCK:
+        if not _HTTP_CLIENTS:
+            limits = httpx.Limits(
+                max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            )
+            timeout = httpx.Timeout(LLM_HTTP_TIMEOUT_SECONDS, connect=LLM_HTTP_CONNECT_TIMEOUT_SECONDS)
+            _HTTP_CLIENTS["sync"] = httpx.Client(limits=limits, timeout=timeout)
+            _HTTP_CLIENTS["async"] = httpx.AsyncClient(limits=limits, timeout=timeout)
+        return _HTTP_CLIENTS["sync"], _HTTP_CLIENTS["async"]
+
+def create_llm(model, env_value, temperature):
+    model_name, api_key = env_value.split(",")
+    if "groq" in model:
+        http_client, http_async_client = get_http_clients()
+        llm = ChatGroq(api_key=api_key, model_name=model_name, temperature=temperature,
+                       http_client=http_client, http_async_client=http_async_client)
+
+    elif "diffbot" in model:
+        llm = DiffbotGraphTransformer(
+            diffbot_api_key=api_key,
+            extract_types=["entities", "facts"],
+        )
+
+    elif "openai" in model:
+        http_client, http_async_client = get_http_clients()
+        if "o3-mini" in model:
+            llm= ChatOpenAI(
+            api_key=api_key,
+            model=model_name,
+            http_client=http_client,
+            http_async_client=http_async_client)
+        else:
+            llm = ChatOpenAI(
+            api_key=api_key,
+            model=model_name,
+            temperature=temperature,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            )
+    else:
+        raise ValueError(f"Unsupported model '{model}'")
+    return llm, model_name
+
+def get_llm(model: str, temperature: float = 0):
     """[ENG]: Retrieve the specified language model based on the model name.
+    The client is created once per (model, configuration, temperature) and reused by every later call,
+    release them with `close_llm_clients` on shutdown.
     [IDN]: Mendapatkan model LLM yang ditentukan berdasarkan nama modelnya.
+    Client dibuat sekali per (model, konfigurasi, temperature) dan digunakan ulang oleh setiap pemanggilan berikutnya,
+    lepaskan dengan `close_llm_clients` saat shutdown.
     Model Option: groq, diffbot"""
     model = model.lower().strip()
     env_key = f"LLM_MODEL_CONFIG_{model}"
@@ -19,40 +86,38 @@ def get_llm(model: str):
         err = f"Environment variable '{env_key}' is not defined as per format or missing"
         logging.error(err)
         raise Exception(err)
-    
+
+    # The configuration is part of the key, so a changed API key or model name creates a new client.
+    key = (model, env_value, temperature)
+    with _LLM_CLIENTS_LOCK:
+        cached = _LLM_CLIENTS.get(key)
+    if cached is not None:
+        return cached
+
     logging.info("Model: {}".format(env_key))
     try:
-        if "groq" in model:
-            model_name, api_key = env_value.split(",")
-            llm = ChatGroq(api_key=api_key, model_name=model_name, temperature=0)
-
-        elif "diffbot" in model:
-            model_name, api_key = env_value.split(",")
-            llm = DiffbotGraphTransformer(
-                diffbot_api_key=api_key,
-                extract_types=["entities", "facts"],
-            )
-        
-        elif "openai" in model:
-            model_name, api_key = env_value.split(",")
-            if "o3-mini" in model:
-                llm= ChatOpenAI(
-                api_key=api_key,
-                model=model_name)
-            else:
-                llm = ChatOpenAI(
-                api_key=api_key,
-                model=model_name,
-                temperature=0,
-                )
-
+        created = create_llm(model, env_value, temperature)
     except Exception as e:
         err = f"Error while creating LLM '{model}': {str(e)}"
         logging.error(err)
         raise Exception(err)
- 
+
+    with _LLM_CLIENTS_LOCK:
+        # Another thread may have created the same client in the meantime, keep the first one.
+        cached = _LLM_CLIENTS.setdefault(key, created)
     logging.info(f"Model created - Model Version: {model}")
-    return llm, model_name
+    return cached
+
+async def close_llm_clients():
+    """[ENG]: Forget the cached LLM clients and close the shared HTTP connection pools.
+    [IDN]: Menghapus client LLM yang tersimpan dan menutup connection pool HTTP bersama."""
+    with _LLM_CLIENTS_LOCK:
+        _LLM_CLIENTS.clear()
+        http_clients = dict(_HTTP_CLIENTS)
+        _HTTP_CLIENTS.clear()
+    if http_clients:
+        http_clients["sync"].close()
+        await http_clients["async"].aclose()
 
 def get_combined_chunks(chunkId_chunkDoc_list):
     """[ENG]: Combine the chunks based on the chunks to combine.
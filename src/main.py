@@ -571,7 +571,7 @@ def get_labels_and_relationtypes(graph):
     query = """
             RETURN collect { 
             CALL db.labels() yield label 
-            WHERE NOT label  IN ['Document','Chunk','_Bloom_Perspective_', '__Community__', '__Entity__'] 
+            WHERE NOT label  IN ['Document','Chunk','_Bloom_Perspective_', '__Community__', '__Entity__', '__DiagnosisIndex__'] 
             return label order by label limit 100 } as labels, 
             collect { 
             CALL db.relationshipTypes() yield relationshipType  as type 
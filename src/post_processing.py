@@ -1,19 +1,21 @@
 import os
 import time
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from neo4j import GraphDatabase
 from langchain_neo4j import Neo4jGraph
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from src.llm import get_llm
-from src.shared.utils import load_embedding_model
+from src.shared.utils import load_embedding_model, load_shared_embedding_model
 from src.graphDB_DataAccess import graphDBdataAccess
-from src.shared.constants import GRAPH_CLEANUP_PROMPT
+from src.shared.constants import GRAPH_CLEANUP_PROMPT, ENTITY_EMBEDDING_BATCH_SIZE, ENTITY_EMBEDDING_WRITE_WORKERS
 
 DROP_INDEX_QUERY = "DROP INDEX entities IF EXISTS;"
 LABELS_QUERY = "CALL db.labels()"
 FULL_TEXT_QUERY = "CREATE FULLTEXT INDEX entities FOR (n{labels_str}) ON EACH [n.id, n.description];"
-FILTER_LABELS = ["Chunk","Document","__Community__"]
+FILTER_LABELS = ["Chunk","Document","__Community__","__DiagnosisIndex__"]
 
 HYBRID_SEARCH_INDEX_DROP_QUERY = "DROP INDEX keyword IF EXISTS;"
 HYBRID_SEARCH_FULL_TEXT_QUERY = "CREATE FULLTEXT INDEX keyword FOR (n:Chunk) ON EACH [n.text]" 
@@ -35,6 +37,20 @@ OPTIONS {{
 }}
 """
 
+ENTITIES_FOR_EMBEDDING_FILTER = "NOT (e:Chunk OR e:Document OR e:`__Community__` OR e:`__DiagnosisIndex__`) AND e.embedding IS NULL AND e.id IS NOT NULL"
+COUNT_ENTITIES_FOR_EMBEDDING_QUERY = f"MATCH (e) WHERE {ENTITIES_FOR_EMBEDDING_FILTER} RETURN count(e) AS count"
+FETCH_ENTITIES_FOR_EMBEDDING_QUERY = f"""
+MATCH (e)
+WHERE {ENTITIES_FOR_EMBEDDING_FILTER} AND elementId(e) > $after
+WITH e ORDER BY elementId(e) LIMIT $limit
+RETURN elementId(e) AS elementId, e.id + " " + coalesce(e.description, "") AS text
+"""
+UPDATE_ENTITY_EMBEDDINGS_QUERY = """
+UNWIND $rows AS row
+MATCH (e) WHERE elementId(e) = row.elementId
+CALL db.create.setNodeVectorProperty(e, "embedding", row.embedding)
+"""
+
 def create_vector_index(driver, index_type, embedding_dimension=None):
     drop_query = ""
     query = ""
@@ -166,31 +182,49 @@ def create_vector_fulltext_indexes(uri, username, password, database):
     logging.info("Full-text and vector index creation process completed.")
 
 def create_entity_embedding(graph:Neo4jGraph):
-    rows = fetch_entities_for_embedding(graph)
-    for i in range(0, len(rows), 1000):
-        update_embeddings(rows[i:i+1000],graph)
-            
-def fetch_entities_for_embedding(graph):
-    query = """
-                MATCH (e)
-                WHERE NOT (e:Chunk OR e:Document OR e:`__Community__`) AND e.embedding IS NULL AND e.id IS NOT NULL
-                RETURN elementId(e) AS elementId, e.id + " " + coalesce(e.description, "") AS text
-                """
-    result = graph.query(query)           
+    """
+    [ENG]: Embed the entities without an embedding as a pipeline: the entities are read page by page (keyset pagination on the element id),
+    every page is embedded with `embed_documents` on a worker thread while the next page is read, and the embeddings are written by
+    `ENTITY_EMBEDDING_WRITE_WORKERS` concurrent writers. Only entities without an embedding are read, so a stopped run resumes where it ended.
+    [IDN]: Melakukan embedding entitas yang belum memiliki embedding sebagai pipeline: entitas dibaca halaman demi halaman (keyset pagination pada element id),
+    setiap halaman di-embed dengan `embed_documents` di thread worker selagi halaman berikutnya dibaca, dan embedding ditulis oleh
+    `ENTITY_EMBEDDING_WRITE_WORKERS` penulis secara bersamaan. Hanya entitas tanpa embedding yang dibaca, sehingga run yang terhenti dilanjutkan dari posisi terakhir.
+    """
+    embeddings, dimension = load_shared_embedding_model(os.getenv('EMBEDDING_MODEL'))
+    batch_size = int(os.getenv("ENTITY_EMBEDDING_BATCH_SIZE", ENTITY_EMBEDDING_BATCH_SIZE))
+    total = graph.query(COUNT_ENTITIES_FOR_EMBEDDING_QUERY)[0]["count"]
+    logging.info(f"Embedding {total} entities in batches of {batch_size}.")
+    start = time.time()
+    written = 0
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="entity_embedding") as embedder, \
+         ThreadPoolExecutor(max_workers=ENTITY_EMBEDDING_WRITE_WORKERS, thread_name_prefix="entity_embedding_write") as writers:
+        writes = deque()
+        rows = fetch_entities_for_embedding(graph, limit=batch_size)
+        while rows:
+            vectors = embedder.submit(embeddings.embed_documents, [row["text"] for row in rows])
+            next_rows = fetch_entities_for_embedding(graph, after=rows[-1]["elementId"], limit=batch_size) if len(rows) == batch_size else []
+            batch = [{"elementId": row["elementId"], "embedding": vector} for row, vector in zip(rows, vectors.result())]
+            writes.append(writers.submit(update_embeddings, batch, graph))
+            # Wait for the oldest write when all writers are busy, so at most a few batches are held in memory.
+            while len(writes) > ENTITY_EMBEDDING_WRITE_WORKERS or (writes and not next_rows):
+                written += writes.popleft().result()
+                elapsed = time.time() - start
+                logging.info(f"Entity embeddings: {written}/{total} written, {written / elapsed:.2f}/s")
+            rows = next_rows
+
+    logging.info(f"Entity embeddings finished in {time.time() - start:.2f} seconds: {written} written.")
+    return written
+
+def fetch_entities_for_embedding(graph, after="", limit=ENTITY_EMBEDDING_BATCH_SIZE):
+    """One page of the entities without an embedding, after the element id `after`."""
+    result = graph.query(FETCH_ENTITIES_FOR_EMBEDDING_QUERY, params={"after": after, "limit": limit})
     return [{"elementId": record["elementId"], "text": record["text"]} for record in result]
 
 def update_embeddings(rows, graph):
-    embedding_model = os.getenv('EMBEDDING_MODEL')
-    embeddings, dimension = load_embedding_model(embedding_model)
-    logging.info(f"update embedding for entities")
-    for row in rows:
-        row['embedding'] = embeddings.embed_query(row['text'])                        
-    query = """
-      UNWIND $rows AS row
-      MATCH (e) WHERE elementId(e) = row.elementId
-      CALL db.create.setNodeVectorProperty(e, "embedding", row.embedding)
-      """  
-    return graph.query(query,params={'rows':rows})          
+    """Write the embeddings of one batch in one transaction, returns the number of rows."""
+    graph.query(UPDATE_ENTITY_EMBEDDINGS_QUERY, params={'rows': rows})
+    return len(rows)
 
 def graph_schema_consolidation(graph):
     graphDb_data_Access = graphDBdataAccess(graph)
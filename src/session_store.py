@@ -0,0 +1,216 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from typing import List, Sequence
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage, message_to_dict, messages_from_dict
+from src.shared.constants import CHAT_SESSION_MAX_SESSIONS, CHAT_SESSION_TTL_SECONDS, CHAT_SESSION_MAX_MESSAGES
+
+def trim_messages(messages: List[BaseMessage], max_messages: int) -> List[BaseMessage]:
+    """
+    [ENG]: Keep the latest `max_messages` messages. A leading system message (the doctor prompt) is always kept.
+    [IDN]: Menyimpan `max_messages` pesan terakhir. Pesan system di awal (prompt dokter) selalu dipertahankan.
+    """
+    if not max_messages or len(messages) <= max_messages:
+        return messages
+    if isinstance(messages[0], SystemMessage):
+        return [messages[0]] + messages[len(messages) - max_messages + 1:]
+    return messages[len(messages) - max_messages:]
+
+def trim_messages_ids(rows, max_messages):
+    """Ids of the (id, is_system) rows that `trim_messages` would keep."""
+    if rows[0][1]:
+        return {rows[0][0]} | {row[0] for row in rows[len(rows) - max_messages + 1:]}
+    return {row[0] for row in rows[len(rows) - max_messages:]}
+
+class BoundedChatMessageHistory(InMemoryChatMessageHistory):
+    """In-memory chat history that keeps at most `max_messages` messages."""
+    max_messages: int = CHAT_SESSION_MAX_MESSAGES
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.messages = trim_messages(self.messages + list(messages), self.max_messages)
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+class MemorySessionStore:
+    """
+    [ENG]: Local chat histories kept in worker memory, bounded by `max_sessions` (least recently used sessions are evicted first),
+    `ttl_seconds` of inactivity and `max_messages` per session. Only visible to the worker that holds it.
+
+    [IDN]: Riwayat chat lokal yang disimpan di memori worker, dibatasi oleh `max_sessions` (sesi yang paling lama tidak digunakan dihapus lebih dulu),
+    `ttl_seconds` tanpa aktivitas, dan `max_messages` per sesi. Hanya terlihat oleh worker yang menyimpannya.
+    """
+    def __init__(self, max_sessions=CHAT_SESSION_MAX_SESSIONS, ttl_seconds=CHAT_SESSION_TTL_SECONDS, max_messages=CHAT_SESSION_MAX_MESSAGES):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Sessions are ordered by last access, so the expired ones are at the front.
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if self.ttl_seconds and now - last_access > self.ttl_seconds:
+                self._sessions.popitem(last=False)
+                logging.info(f"Chat session expired: {session_id}")
+            elif self.max_sessions and len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                logging.info(f"Chat session evicted: {session_id}")
+            else:
+                break
+
+    def get_history(self, session_id) -> BaseChatMessageHistory:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is None or (self.ttl_seconds and now - entry[1] > self.ttl_seconds):
+                logging.info(f"Creating new ChatMessageHistory Local for session ID: {session_id}")
+                history = BoundedChatMessageHistory(max_messages=self.max_messages)
+            else:
+                logging.info(f"Retrieved existing ChatMessageHistory Local for session ID: {session_id}")
+                history = entry[0]
+            self._sessions[session_id] = (history, now)
+            self._evict(now)
+            return history
+
+    def __len__(self):
+        return len(self._sessions)
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat history of one session stored in the SQLite session store. The sync methods block on SQLite, async callers use
+    the `a*` methods (run in the default executor) or `asyncio.to_thread`.
+    """
+
+    def __init__(self, store, session_id):
+        self._store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._store.connect() as conn:
+            rows = conn.execute("SELECT message FROM chat_messages WHERE session_id = ? ORDER BY id", (self.session_id,)).fetchall()
+        return messages_from_dict([json.loads(row[0]) for row in rows])
+
+    @messages.setter
+    def messages(self, messages: List[BaseMessage]) -> None:
+        raise NotImplementedError("Direct assignment to 'messages' is not allowed. Use the 'add_messages' instead.")
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        with self._store.connect() as conn:
+            conn.executemany(
+                "INSERT INTO chat_messages (session_id, is_system, message) VALUES (?, ?, ?)",
+                [(self.session_id, isinstance(message, SystemMessage), json.dumps(message_to_dict(message))) for message in messages]
+            )
+            if self._store.max_messages:
+                rows = conn.execute("SELECT id, is_system FROM chat_messages WHERE session_id = ? ORDER BY id", (self.session_id,)).fetchall()
+                if len(rows) > self._store.max_messages:
+                    kept = trim_messages_ids(rows, self._store.max_messages)
+                    conn.executemany("DELETE FROM chat_messages WHERE id = ?", [(row[0],) for row in rows if row[0] not in kept])
+
+    def clear(self) -> None:
+        with self._store.connect() as conn:
+            conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (self.session_id,))
+
+class SQLiteSessionStore:
+    """
+    [ENG]: Local chat histories stored in a SQLite file, so every gunicorn worker on the host sees the same sessions.
+    Sessions inactive for `ttl_seconds` and the least recently used sessions above `max_sessions` are removed,
+    at most once every `sweep_interval` seconds.
+
+    [IDN]: Riwayat chat lokal yang disimpan di file SQLite, sehingga setiap worker gunicorn pada host melihat sesi yang sama.
+    Sesi yang tidak aktif selama `ttl_seconds` dan sesi yang paling lama tidak digunakan di atas `max_sessions` dihapus,
+    paling sering sekali setiap `sweep_interval` detik.
+    """
+    def __init__(self, path, max_sessions=CHAT_SESSION_MAX_SESSIONS, ttl_seconds=CHAT_SESSION_TTL_SECONDS, max_messages=CHAT_SESSION_MAX_MESSAGES, sweep_interval=60):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0
+        with closing(sqlite3.connect(self.path)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS chat_sessions (session_id TEXT PRIMARY KEY, last_access REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS chat_sessions_last_access ON chat_sessions (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS chat_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, is_system INTEGER NOT NULL DEFAULT 0, message TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS chat_messages_session ON chat_messages (session_id, id)")
+            conn.commit()
+
+    def connect(self):
+        """Open a connection used as a transaction: `with store.connect() as conn` commits on success and closes the connection."""
+        return SQLiteTransaction(self.path)
+
+    def _sweep(self, conn, now):
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM chat_sessions WHERE last_access < ?", (now - self.ttl_seconds,))
+        if self.max_sessions:
+            conn.execute(
+                "DELETE FROM chat_sessions WHERE session_id NOT IN (SELECT session_id FROM chat_sessions ORDER BY last_access DESC LIMIT ?)",
+                (self.max_sessions,)
+            )
+        removed = conn.execute("DELETE FROM chat_messages WHERE session_id NOT IN (SELECT session_id FROM chat_sessions)").rowcount
+        if removed:
+            logging.info(f"Removed {removed} messages of expired or evicted chat sessions")
+
+    def get_history(self, session_id) -> BaseChatMessageHistory:
+        now = time.time()
+        with self.connect() as conn:
+            row = conn.execute("SELECT last_access FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None or (self.ttl_seconds and now - row[0] > self.ttl_seconds):
+                logging.info(f"Creating new ChatMessageHistory Local for session ID: {session_id}")
+                conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            else:
+                logging.info(f"Retrieved existing ChatMessageHistory Local for session ID: {session_id}")
+            conn.execute(
+                "INSERT INTO chat_sessions (session_id, last_access) VALUES (?, ?) ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, now)
+            )
+            if now - self._last_sweep > self.sweep_interval:
+                self._last_sweep = now
+                self._sweep(conn, now)
+        return SQLiteChatMessageHistory(self, session_id)
+
+    def __len__(self):
+        with self.connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+class SQLiteTransaction:
+    """
+    [ENG]: Connection to a local SQLite file used as a context manager: commits on success, rolls back on error and always closes.
+    [IDN]: Koneksi ke file SQLite lokal yang digunakan sebagai context manager: commit jika berhasil, rollback jika error dan selalu ditutup.
+    """
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=30)
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
+
+def create_session_store(backend="memory", path=None, **kwargs):
+    """
+    [ENG]: Create the local chat session store: `memory` (per worker) or `sqlite` (shared by the workers through `path`).
+    [IDN]: Membuat penyimpanan sesi chat lokal: `memory` (per worker) atau `sqlite` (digunakan bersama oleh worker melalui `path`).
+    """
+    if backend == "sqlite":
+        logging.info(f"Chat sessions stored in SQLite: {path}")
+        return SQLiteSessionStore(path, **kwargs)
+    if backend != "memory":
+        logging.warning(f"Unknown chat session store '{backend}', using memory")
+    return MemorySessionStore(**kwargs)
@@ -252,11 +252,102 @@ CHAT_SEARCH_KWARG_SCORE_THRESHOLD = 0.5
 CHAT_DOC_SPLIT_SIZE = 3000
 CHAT_EMBEDDING_FILTER_SCORE_THRESHOLD = 0.10
 
-CHAT_TOKEN_CUT_OFF = {
-     ('openai_gpt_3.5','azure_ai_gpt_35',"gemini_1.0_pro","gemini_1.5_pro", "gemini_1.5_flash","groq-llama3",'groq_llama3_70b','anthropic_claude_3_5_sonnet','fireworks_llama_v3_70b','bedrock_claude_3_5_sonnet', ) : 4, 
-     ("openai-gpt-4","diffbot" ,'azure_ai_gpt_4o',"openai_gpt_4o", "openai_gpt_4o_mini") : 28,
-     ("ollama_llama3") : 2  
+# The chat history is summarized once it holds this many messages (or estimated tokens), otherwise the turn is only appended.
+# Keep the message threshold below the history read window (7 messages) so nothing falls out of the window before it is summarized.
+CHAT_SUMMARY_MESSAGE_THRESHOLD = 6
+CHAT_SUMMARY_TOKEN_THRESHOLD = 1500
+CHAT_SUMMARY_MAX_WORKERS = 4
+
+# Local chat sessions (chat_interaction and chats without write access), see src/session_store.py
+CHAT_SESSION_MAX_SESSIONS = 10000
+CHAT_SESSION_TTL_SECONDS = 60 * 60 * 6
+CHAT_SESSION_MAX_MESSAGES = 50
+
+# Write-behind cache of the Neo4j chat histories, see src/chat_history.py
+# Short TTL: without session-affine routing another worker may have written the session since it was cached.
+CHAT_HISTORY_CACHE_TTL_SECONDS = 5
+CHAT_HISTORY_CACHE_MAX_SESSIONS = 10000
+CHAT_HISTORY_FLUSH_INTERVAL_SECONDS = 0.5
+
+# Shared keep-alive HTTP connection pools of the cached LLM clients, see get_llm in src/llm.py
+LLM_HTTP_MAX_CONNECTIONS = 100
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS = 60
+LLM_HTTP_TIMEOUT_SECONDS = 120
+LLM_HTTP_CONNECT_TIMEOUT_SECONDS = 10
+
+# Local ANN index mirror of the vector indexes, enabled with CHAT_ANN_INDEX_DIR, see src/ann_index.py
+CHAT_ANN_INDEX_REFRESH_SECONDS = 60 * 15
+CHAT_ANN_INDEX_NPROBE = 8
+CHAT_ANN_INDEX_MIN_LIST_SIZE = 256
+CHAT_ANN_INDEX_KMEANS_SAMPLE_SIZE = 50000
+CHAT_ANN_INDEX_KMEANS_ITERATIONS = 10
+
+# Graph chat mode: schema snapshots and question to Cypher translations, see src/graph_chain_cache.py
+CHAT_GRAPH_SCHEMA_TTL_SECONDS = 60 * 10
+CHAT_CYPHER_CACHE_MAX_ENTRIES = 2000
+CHAT_CYPHER_CACHE_TTL_SECONDS = 60 * 60 * 24
+
+# Batch QA endpoint (/chat_bot/batch), see src/batch_qa.py
+CHAT_BATCH_MAX_QUESTIONS = 1000
+CHAT_BATCH_DEFAULT_CONCURRENCY = 4
+CHAT_BATCH_MAX_CONCURRENCY = 16
+
+# Local tiers of the /check-symptoms classifier, see src/symptom_classifier.py
+CHAT_SYMPTOM_EMBEDDING_MIN_SIMILARITY = 0.35
+CHAT_SYMPTOM_EMBEDDING_MIN_MARGIN = 0.08
+CHAT_SYMPTOM_SHORT_ANSWER_MAX_WORDS = 8
+# Lexicon matches on ambiguous terms only (cold, pain) are below this confidence and fall through to the next tier.
+CHAT_SYMPTOM_LEXICON_MIN_CONFIDENCE = 0.8
+
+# Symptom to disease inverted index (post-processing task `build_diagnosis_index`), see src/diagnosis_index.py
+DIAGNOSIS_INDEX_LABEL = "__DiagnosisIndex__"
+DIAGNOSIS_SYMPTOM_LABELS = ["Symptom", "Gejala"]
+DIAGNOSIS_DISEASE_LABELS = ["Disease", "Penyakit"]
+# Chunks mentioning both entities count less than a relationship between them.
+DIAGNOSIS_COOCCURRENCE_WEIGHT = 0.5
+DIAGNOSIS_DEFAULT_TOP_K = 5
+DIAGNOSIS_MAX_TOP_K = 20
+DIAGNOSIS_SUBGRAPH_MAX_NEIGHBOURS = 25
+
+# Community summarization (LLM calls at a time, summaries per write and retries), see src/community_summarizer.py
+COMMUNITY_SUMMARY_CONCURRENCY = 8
+COMMUNITY_SUMMARY_WRITE_BATCH_SIZE = 50
+COMMUNITY_SUMMARY_MAX_RETRIES = 4
+COMMUNITY_SUMMARY_RETRY_BASE_DELAY = 1
+COMMUNITY_SUMMARY_RETRY_MAX_DELAY = 60
+# Community summaries embedded (and written) per batch, see create_community_embeddings in src/communities.py
+COMMUNITY_EMBEDDING_BATCH_SIZE = 256
+# Entities read, embedded and written per batch, and concurrent writers, see create_entity_embedding in src/post_processing.py
+ENTITY_EMBEDDING_BATCH_SIZE = 1000
+ENTITY_EMBEDDING_WRITE_WORKERS = 2
+# Communities deleted (or entities updated) per transaction when the communities are cleared, see src/communities.py
+COMMUNITY_DELETE_BATCH_SIZE = 1000
+# Pruning of the optional community summary cache (COMMUNITY_SUMMARY_CACHE_PATH), see src/community_summary_cache.py
+COMMUNITY_SUMMARY_CACHE_MAX_AGE_SECONDS = 30 * 24 * 3600
+COMMUNITY_SUMMARY_CACHE_MAX_ENTRIES = 100000
+
+# Prompt token budget of the retrieved context per model, see src/context_packer.py
+CHAT_CONTEXT_TOKEN_BUDGET = {
+     ('openai_gpt_3.5','azure_ai_gpt_35',"gemini_1.0_pro","gemini_1.5_pro", "gemini_1.5_flash","groq-llama3",'groq_llama3_70b','anthropic_claude_3_5_sonnet','fireworks_llama_v3_70b','bedrock_claude_3_5_sonnet', ) : 6000, 
+     ("openai-gpt-4","diffbot" ,'azure_ai_gpt_4o',"openai_gpt_4o", "openai_gpt_4o_mini") : 24000,
+     ("ollama_llama3",) : 2000  
 }  
+CHAT_CONTEXT_DEFAULT_TOKEN_BUDGET = 4000
+# Chunks are packed before the entity and relationship lines of a document with the same rank.
+CHAT_CONTEXT_UNIT_WEIGHTS = {"chunk": 1.0, "entity": 0.6, "relationship": 0.4}
+CHAT_CONTEXT_MIN_TRUNCATED_TOKENS = 64
+
+DIAGNOSIS_EXPLANATION_PROMPT = """
+Anda adalah seorang dokter. Kandidat penyakit di bawah ini sudah diurutkan berdasarkan kecocokan dengan gejala pasien di knowledge graph.
+Jelaskan secara singkat mengapa setiap kandidat cocok atau kurang cocok dengan gejala pasien, hanya berdasarkan konteks di bawah ini.
+Jangan membuat informasi baru dan jawab dalam bahasa Indonesia.
+
+### Konteks:
+<context>
+{context}
+</context>
+"""
 
 ### CHAT TEMPLATES 
 CHAT_SYSTEM_TEMPLATE = """
@@ -662,6 +753,12 @@ CHAT_GLOBAL_VECTOR_FULLTEXT_MODE = "global_vector"
 CHAT_GRAPH_MODE = "graph"
 CHAT_DEFAULT_MODE = "graph_vector_fulltext"
 
+# "fusion" runs several retrieval modes concurrently and fuses their results with reciprocal-rank fusion.
+# The modes can be selected with "fusion:vector,entity_vector", otherwise CHAT_FUSION_DEFAULT_MODES is used.
+CHAT_FUSION_MODE = "fusion"
+CHAT_FUSION_DEFAULT_MODES = [CHAT_VECTOR_GRAPH_FULLTEXT_MODE, CHAT_ENTITY_VECTOR_MODE, CHAT_GLOBAL_VECTOR_FULLTEXT_MODE]
+CHAT_FUSION_RRF_K = 60
+
 CHAT_MODE_CONFIG_MAP= {
         CHAT_VECTOR_MODE : {
             "retrieval_query": VECTOR_SEARCH_QUERY,
@@ -3,8 +3,10 @@ import re
 import logging
 import hashlib
 from typing import List
+from functools import lru_cache
 from pathlib import Path
 from urllib.parse import urlparse
+from neo4j import AsyncGraphDatabase
 from langchain_neo4j import Neo4jGraph
 from langchain_openai import OpenAIEmbeddings
 from langchain_huggingface import HuggingFaceEmbeddings
@@ -70,6 +72,44 @@ def create_graph_database_connection(uri, userName, password, database):
     graph = Neo4jGraph(url=uri, database=database, username=userName, password=password, refresh_schema=False, sanitize=True)    
   return graph
 
+_ASYNC_GRAPH_DRIVERS = {}
+
+async def get_async_graph_driver(uri, userName, password):
+  """[ENG]: Return a shared async Neo4j driver for the given credentials. The driver keeps its own connection pool, 
+  so it is created once per worker and reused by every async chat request instead of opening a connection per request.
+  Connectivity is verified before a new driver is cached, so invalid credentials are not kept.
+  [IDN]: Mengembalikan driver Neo4j async bersama untuk kredensial yang diberikan. Driver menyimpan connection pool sendiri, 
+  sehingga dibuat sekali per worker dan digunakan ulang oleh setiap request chat async, bukan membuka koneksi per request.
+  Konektivitas diverifikasi sebelum driver baru disimpan, sehingga kredensial yang tidak valid tidak disimpan."""
+  key = (uri, userName, hashlib.sha256(password.encode()).hexdigest())
+  driver = _ASYNC_GRAPH_DRIVERS.get(key)
+  if driver is not None:
+    return driver
+
+  enable_user_agent = os.environ.get("ENABLE_USER_AGENT", "False").lower() in ("true", "1", "yes")
+  if enable_user_agent:
+    driver = AsyncGraphDatabase.driver(uri, auth=(userName, password), user_agent=os.getenv('NEO4J_USER_AGENT'))
+  else:
+    driver = AsyncGraphDatabase.driver(uri, auth=(userName, password))
+  try:
+    await driver.verify_connectivity()
+  except Exception:
+    await driver.close()
+    raise
+
+  # Another request may have created the driver while this one was verifying the connection.
+  if key in _ASYNC_GRAPH_DRIVERS:
+    await driver.close()
+    return _ASYNC_GRAPH_DRIVERS[key]
+  _ASYNC_GRAPH_DRIVERS[key] = driver
+  logging.info(f"Created async Neo4j driver for {uri}")
+  return driver
+
+async def close_async_graph_drivers():
+  while _ASYNC_GRAPH_DRIVERS:
+    _, driver = _ASYNC_GRAPH_DRIVERS.popitem()
+    await driver.close()
+
 def save_graphDocuments_in_neo4j(graph:Neo4jGraph, graph_document_list:List[GraphDocument]):
   graph.add_graph_documents(graph_document_list, baseEntityLabel=True)
   # graph.add_graph_documents(graph_document_list)
@@ -108,6 +148,12 @@ def load_embedding_model(embedding_model_name: str):
         raise Exception(err)
     return embeddings, dimension
 
+@lru_cache(maxsize=None)
+def load_shared_embedding_model(embedding_model_name: str):
+    """[ENG]: `load_embedding_model` loaded once per process, for the post-processing tasks that embed in many batches.
+    [IDN]: `load_embedding_model` yang dimuat sekali per proses, untuk task post-processing yang melakukan embedding dalam banyak batch."""
+    return load_embedding_model(embedding_model_name)
+
 def handle_backticks_nodes_relationship_id_type(graph_document_list:List[GraphDocument]):
     """[ENG]: Cleans node and relationship identifiers by removing backticks and ensuring 
     that only valid nodes and relationships with non-empty identifiers and types are retained.
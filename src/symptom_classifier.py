@@ -0,0 +1,185 @@
+import re
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+import numpy as np
+from src.shared.constants import (
+    CHAT_SYMPTOM_EMBEDDING_MIN_SIMILARITY,
+    CHAT_SYMPTOM_EMBEDDING_MIN_MARGIN,
+    CHAT_SYMPTOM_SHORT_ANSWER_MAX_WORDS,
+    CHAT_SYMPTOM_LEXICON_MIN_CONFIDENCE,
+)
+
+LEXICON_TIER = "lexicon"
+EMBEDDING_TIER = "embedding"
+LLM_TIER = "llm"
+
+# Indonesian (including common informal and Javanese words) and English symptom terms, matched as whole words.
+# English inflections are listed explicitly, word stems would match unrelated words (fluent, painting, sweater).
+SYMPTOM_TERMS = [
+    "gejala", "keluhan", "sakit", "nyeri", "ngilu", "linu", "pegal", "pegel", "perih", "pusing", "puyeng", "nggeliyeng", "kliyengan",
+    "vertigo", "migrain", "demam", "meriang", "panas dingin", "menggigil", "batuk", "pilek", "flu", "bersin", "hidung tersumbat",
+    "tenggorokan", "dahak", "berdahak", "riak", "sesak", "napas", "nafas", "mual", "muntah", "diare", "mencret", "sembelit", "susah bab",
+    "mules", "mulas", "kembung", "begah", "maag", "lemas", "lemes", "lelah", "capek", "letih", "lesu", "gatal", "gatel", "ruam",
+    "bintik", "bentol", "biduran", "bengkak", "memar", "benjolan", "luka", "berdarah", "pendarahan", "mimisan", "kesemutan",
+    "kebas", "mati rasa", "kram", "kejang", "kaku", "pingsan", "berdebar", "deg-degan", "keringat", "kesulitan ereksi",
+    "susah tidur", "sulit tidur", "insomnia", "nafsu makan", "berat badan turun", "haus", "sering kencing", "anyang",
+    "penglihatan kabur", "pandangan kabur", "sariawan", "keputihan", "haid", "menstruasi", "jerawat", "rontok",
+    "bernapas", "bernafas", "symptom", "pain", "painful", "ache", "aching", "hurt", "hurting", "sore throat", "headache",
+    "dizzy", "dizziness", "fever", "feverish", "chill", "cough", "coughing", "cold", "runny nose", "sneeze", "sneezing",
+    "nausea", "nauseous", "nauseated", "vomit", "vomiting", "vomited", "diarrhea", "diarrhoea", "constipated", "constipation",
+    "bloated", "bloating", "fatigue", "fatigued", "tired", "weak", "weakness", "itch", "itchy", "itching", "rash",
+    "swelling", "swollen", "bleeding", "numb", "numbness", "tingling", "cramp", "cramping", "seizure", "faint", "fainted",
+    "palpitation", "short of breath", "shortness of breath", "breathless", "sweat", "sweating", "sweaty", "blurred vision",
+]
+# Suffixes a term may carry: Indonesian possessive and particle suffixes (pusingnya, keringatan) and the English plural (headaches).
+SYMPTOM_SUFFIXES = ["nya", "ku", "mu", "lah", "kah", "an", "s", "es"]
+# English terms that are often not about a complaint (a cold day, a pain to fill in, chill out), a match on them alone
+# gets a low confidence so the embedding or LLM tier decides.
+AMBIGUOUS_SYMPTOM_TERMS = {"cold", "pain", "chill", "faint"}
+# Phrases that contain a symptom term but are not about a complaint.
+NON_SYMPTOM_PHRASES = ["rumah sakit", "hospital"]
+
+# Messages made only of these words are small talk.
+SMALL_TALK_WORDS = {
+    "halo", "hallo", "hai", "hi", "hello", "hey", "pagi", "siang", "sore", "malam", "selamat", "assalamualaikum", "permisi",
+    "terima", "kasih", "makasih", "trims", "thanks", "thank", "you", "oke", "ok", "okay", "baik", "sip", "siap", "bye",
+    "dadah", "sampai", "jumpa", "dok", "dokter", "doc", "doctor", "ya", "iya", "good", "morning", "afternoon", "evening",
+}
+
+# Short answers to a doctor question (confirmations, denials and durations).
+SHORT_ANSWER_WORDS = {
+    "ya", "iya", "iy", "yap", "yup", "yes", "betul", "benar", "bener", "ada", "sudah", "udah", "pernah", "sering", "kadang",
+    "jarang", "lumayan", "sedikit", "dikit", "parah", "banget", "sekali", "tidak", "tdk", "gak", "ga", "nggak", "engga",
+    "enggak", "belum", "no", "nope", "not", "sometimes", "often", "little", "bit", "very",
+}
+DURATION_PATTERN = re.compile(r"\b\d+\s*(jam|hari|minggu|bulan|tahun|hour|day|week|month|year)s?\b|\b(kemarin|tadi|semalam|sejak|since|yesterday)\b")
+
+# Example messages of both classes, embedded once and compared with the patient message.
+SYMPTOM_PROTOTYPES = [
+    "Saya merasa pusing dan mual sejak kemarin",
+    "Kepala saya sakit sekali dok",
+    "Badan saya demam dan menggigil",
+    "Saya batuk berdahak sudah seminggu",
+    "Perut saya terasa perih setelah makan",
+    "Anak saya diare dan muntah",
+    "Saya sulit bernapas kalau naik tangga",
+    "Kulit saya gatal dan muncul bintik merah",
+    "I have a headache and feel dizzy",
+    "My throat hurts and I have a fever",
+]
+NON_SYMPTOM_PROTOTYPES = [
+    "Halo dok, selamat pagi",
+    "Terima kasih atas informasinya",
+    "Siapa nama Anda?",
+    "Berapa biaya konsultasinya?",
+    "Jam berapa klinik buka?",
+    "Bagaimana cara mendaftar akun?",
+    "Oke dok, sampai jumpa",
+    "Hello, how are you?",
+    "Thank you doctor",
+    "What is the weather today?",
+]
+
+def normalize_message(message):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s-]", " ", message.lower())).strip()
+
+SYMPTOM_TERMS_PATTERN = "|".join(re.escape(term) for term in sorted(SYMPTOM_TERMS, key=len, reverse=True))
+SYMPTOM_PATTERN = re.compile(r"\b(" + SYMPTOM_TERMS_PATTERN + r")(?:" + "|".join(SYMPTOM_SUFFIXES) + r")?\b")
+# Medicine named after a symptom (obat sakit kepala, obat flu) is not a complaint.
+MEDICINE_PATTERN = re.compile(r"\b(?:obat|medicine|medication) (?:untuk |buat |for )?(?:" + SYMPTOM_TERMS_PATTERN + r")\b")
+
+def classify_by_lexicon(message, previous_ai_message=None) -> Optional[Dict[str, Any]]:
+    """
+    [ENG]: Decide with the symptom lexicon, the small talk words and short answers to a doctor question. Returns None when undecided.
+    [IDN]: Memutuskan dengan leksikon gejala, kata basa-basi, dan jawaban singkat atas pertanyaan dokter. Mengembalikan None jika belum dapat diputuskan.
+    """
+    text = MEDICINE_PATTERN.sub(" ", normalize_message(message))
+    for phrase in NON_SYMPTOM_PHRASES:
+        text = text.replace(phrase, " ")
+    words = text.split()
+    if not words:
+        return {"is_symptoms": False, "confidence": 0.9}
+
+    matched = [match.group(1) for match in SYMPTOM_PATTERN.finditer(text)]
+    if matched:
+        unambiguous = [term for term in matched if term not in AMBIGUOUS_SYMPTOM_TERMS]
+        if unambiguous:
+            return {"is_symptoms": True, "confidence": 0.95, "matched": unambiguous[0]}
+        return {"is_symptoms": True, "confidence": 0.5, "matched": matched[0]}
+    if previous_ai_message and len(words) <= CHAT_SYMPTOM_SHORT_ANSWER_MAX_WORDS:
+        previous = normalize_message(previous_ai_message)
+        asks_symptoms = previous_ai_message.strip().endswith("?") or SYMPTOM_PATTERN.search(previous) is not None
+        # Reduplicated words (kadang-kadang) are checked by their base word.
+        if asks_symptoms and (words[0].split("-")[0] in SHORT_ANSWER_WORDS or DURATION_PATTERN.search(text)):
+            return {"is_symptoms": True, "confidence": 0.85, "matched": "answer to doctor question"}
+    if all(word in SMALL_TALK_WORDS for word in words):
+        return {"is_symptoms": False, "confidence": 0.95, "matched": "small talk"}
+    return None
+
+class EmbeddingSymptomClassifier:
+    """
+    [ENG]: Nearest-prototype classifier on the sentence embeddings used by the chat (the sentence-transformer when
+    EMBEDDING_MODEL=huggingface). A message is decided when its best similarity and the margin between both classes are high enough.
+    [IDN]: Classifier prototipe terdekat berdasarkan embedding kalimat yang digunakan oleh chat (sentence-transformer jika
+    EMBEDDING_MODEL=huggingface). Pesan diputuskan jika similarity terbaik dan selisih antara kedua kelas cukup tinggi.
+    """
+    def __init__(self, embeddings, min_similarity=CHAT_SYMPTOM_EMBEDDING_MIN_SIMILARITY, min_margin=CHAT_SYMPTOM_EMBEDDING_MIN_MARGIN):
+        self.embeddings = embeddings
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._prototypes = None
+        self._lock = threading.Lock()
+
+    def _embed(self, texts):
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def prototypes(self):
+        with self._lock:
+            if self._prototypes is None:
+                self._prototypes = (self._embed(SYMPTOM_PROTOTYPES), self._embed(NON_SYMPTOM_PROTOTYPES))
+            return self._prototypes
+
+    def classify(self, message) -> Optional[Dict[str, Any]]:
+        symptom_prototypes, other_prototypes = self.prototypes()
+        vector = self._embed([message])[0]
+        symptom_similarity = float(np.max(symptom_prototypes @ vector))
+        other_similarity = float(np.max(other_prototypes @ vector))
+        margin = abs(symptom_similarity - other_similarity)
+        if max(symptom_similarity, other_similarity) < self.min_similarity or margin < self.min_margin:
+            return None
+        return {"is_symptoms": symptom_similarity > other_similarity, "confidence": round(margin, 4)}
+
+def classify_symptom_message(message, previous_ai_message=None, embedding_classifier=None, llm_classifier=None) -> Dict[str, Any]:
+    """
+    [ENG]: Classify whether a patient message is about symptoms with the cheapest tier that is confident:
+    lexicon, then embedding similarity, then `llm_classifier(message, previous_ai_message)`.
+    The result holds `is_symptoms`, the deciding `tier`, its `confidence` and the `latency` in seconds.
+    Without a confident tier the message is treated as a symptom message (same default as the LLM check on errors).
+
+    [IDN]: Mengklasifikasi apakah pesan pasien membahas gejala dengan tingkat termurah yang yakin:
+    leksikon, lalu kemiripan embedding, lalu `llm_classifier(message, previous_ai_message)`.
+    Hasilnya berisi `is_symptoms`, `tier` yang memutuskan, `confidence`, dan `latency` dalam detik.
+    Jika tidak ada tingkat yang yakin, pesan dianggap sebagai pesan gejala (sama dengan default pemeriksaan LLM saat error).
+    """
+    start_time = time.time()
+    result, tier = classify_by_lexicon(message, previous_ai_message), LEXICON_TIER
+    if result is not None and result["confidence"] < CHAT_SYMPTOM_LEXICON_MIN_CONFIDENCE:
+        # Only ambiguous terms matched.
+        result = None
+    if result is None and embedding_classifier is not None:
+        try:
+            result, tier = embedding_classifier.classify(message), EMBEDDING_TIER
+        except Exception as e:
+            logging.warning(f"Embedding symptom classifier failed: {e}")
+            result = None
+    if result is None and llm_classifier is not None:
+        result, tier = {"is_symptoms": llm_classifier(message, previous_ai_message), "confidence": None}, LLM_TIER
+    if result is None:
+        result, tier = {"is_symptoms": True, "confidence": None}, None
+    result["tier"] = tier
+    result["latency"] = round(time.time() - start_time, 4)
+    logging.info(f"Symptom detection for '{message}' decided by {tier}: {result['is_symptoms']}")
+    return result
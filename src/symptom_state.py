@@ -0,0 +1,182 @@
+import re
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from src.session_store import SQLiteTransaction
+from src.shared.constants import CHAT_SESSION_MAX_SESSIONS, CHAT_SESSION_TTL_SECONDS
+
+# Informal and regional words mapped to the symptom name used in the knowledge graph.
+SYMPTOM_SYNONYMS = {
+    "puyeng": "pusing", "nggeliyeng": "pusing", "kliyengan": "pusing", "kepala pusing": "pusing",
+    "meriang": "demam", "panas": "demam", "badan panas": "demam",
+    "mencret": "diare", "lemes": "lemas", "badan lemas": "lemas", "capek": "lelah", "letih": "lelah",
+    "gatel": "gatal", "gatal-gatal": "gatal", "pegel": "pegal", "nafas sesak": "sesak napas", "sesak nafas": "sesak napas",
+    "mules": "sakit perut", "mulas": "sakit perut", "perut sakit": "sakit perut", "kepala sakit": "sakit kepala",
+    "susah tidur": "sulit tidur", "insomnia": "sulit tidur", "mimisan": "hidung berdarah",
+}
+# Leading words the extractor sometimes keeps ("sering pusing", "merasa mual").
+FILLER_WORDS = {"saya", "merasa", "rasa", "terasa", "sering", "agak", "sedikit", "kadang", "kadang-kadang", "sangat", "sekali"}
+
+def normalize_symptom(symptom) -> str:
+    """
+    [ENG]: Normalize an extracted symptom: lowercase, no punctuation or leading filler words, synonyms mapped to one name.
+    [IDN]: Menormalkan gejala hasil ekstraksi: huruf kecil, tanpa tanda baca atau kata pengisi di awal, sinonim dipetakan ke satu nama.
+    """
+    words = re.sub(r"[^\w\s-]", " ", str(symptom).lower()).split()
+    while words and words[0] in FILLER_WORDS:
+        words = words[1:]
+    while words and words[-1] in FILLER_WORDS:
+        words = words[:-1]
+    text = " ".join(words)
+    return SYMPTOM_SYNONYMS.get(text, text)
+
+def new_symptom_state() -> Dict[str, Any]:
+    return {"symptoms": {}, "negated": {}, "turns": 0, "updated_at": None}
+
+def merge_symptoms(state, symptoms_summary) -> Dict[str, Any]:
+    """
+    [ENG]: Add the symptoms of one turn (`{"gejala": [...], "tidak_ada": [...]}`) to the session state.
+    Symptoms are deduplicated by their normalized name, the latest turn wins when a symptom is first confirmed and later denied (or the other way around).
+    [IDN]: Menambahkan gejala dari satu giliran (`{"gejala": [...], "tidak_ada": [...]}`) ke state sesi.
+    Gejala dideduplikasi berdasarkan nama yang sudah dinormalisasi, giliran terbaru yang berlaku jika gejala dikonfirmasi lalu disangkal (atau sebaliknya).
+    """
+    turn = state["turns"] + 1
+    # Denials first, so a symptom that is both denied and confirmed in the same message counts as present.
+    for kind, key, other in (("tidak_ada", "negated", "symptoms"), ("gejala", "symptoms", "negated")):
+        for symptom in (symptoms_summary or {}).get(kind) or []:
+            name = normalize_symptom(symptom)
+            if not name:
+                continue
+            state[other].pop(name, None)
+            entry = state[key].setdefault(name, {"first_turn": turn, "mentions": 0})
+            entry["mentions"] += 1
+            entry["last_turn"] = turn
+    state["turns"] = turn
+    state["updated_at"] = time.time()
+    return state
+
+def format_symptom_state(session_id, state) -> Dict[str, Any]:
+    """Response form of a session state: the symptom names in the order they were first mentioned."""
+    state = state or new_symptom_state()
+    ordered = lambda entries: [name for name, _ in sorted(entries.items(), key=lambda item: (item[1]["first_turn"], item[0]))]
+    return {
+        "session_id": session_id,
+        "symptoms": ordered(state["symptoms"]),
+        "negated": ordered(state["negated"]),
+        "turns": state["turns"],
+        "updated_at": state["updated_at"],
+    }
+
+def build_symptom_question(symptoms: List[str], negated: Optional[List[str]] = None) -> Optional[str]:
+    """
+    [ENG]: Compact diagnosis question built from the collected symptoms, used for retrieval instead of the whole conversation.
+    [IDN]: Pertanyaan diagnosis ringkas yang dibangun dari gejala yang terkumpul, digunakan untuk retrieval alih-alih seluruh percakapan.
+    """
+    if not symptoms:
+        return None
+    question = f"Penyakit apa yang memiliki gejala {', '.join(symptoms)}?"
+    if negated:
+        question += f" Pasien tidak mengalami {', '.join(negated)}."
+    return question
+
+class MemorySymptomStateStore:
+    """
+    [ENG]: Symptom states kept in worker memory, bounded like the local chat sessions (`max_sessions` and `ttl_seconds` of inactivity).
+    [IDN]: State gejala yang disimpan di memori worker, dibatasi seperti sesi chat lokal (`max_sessions` dan `ttl_seconds` tanpa aktivitas).
+    """
+    def __init__(self, max_sessions=CHAT_SESSION_MAX_SESSIONS, ttl_seconds=CHAT_SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, session_id, now):
+        state = self._states.get(session_id)
+        if state is not None and self.ttl_seconds and now - state["updated_at"] > self.ttl_seconds:
+            del self._states[session_id]
+            return None
+        return state
+
+    def get(self, session_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            state = self._get(session_id, time.time())
+            return json.loads(json.dumps(state)) if state is not None else None
+
+    def update(self, session_id, symptoms_summary) -> Dict[str, Any]:
+        with self._lock:
+            state = merge_symptoms(self._get(session_id, time.time()) or new_symptom_state(), symptoms_summary)
+            self._states[session_id] = state
+            self._states.move_to_end(session_id)
+            while self.max_sessions and len(self._states) > self.max_sessions:
+                self._states.popitem(last=False)
+            return json.loads(json.dumps(state))
+
+    def clear(self, session_id):
+        with self._lock:
+            self._states.pop(session_id, None)
+
+class SQLiteSymptomStateStore:
+    """
+    [ENG]: Symptom states stored in the SQLite session store file, so every worker sees the same state.
+    [IDN]: State gejala yang disimpan di file SQLite penyimpanan sesi, sehingga setiap worker melihat state yang sama.
+    """
+    def __init__(self, path, max_sessions=CHAT_SESSION_MAX_SESSIONS, ttl_seconds=CHAT_SESSION_TTL_SECONDS, sweep_interval=60):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0
+        with SQLiteTransaction(self.path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS symptom_states (session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS symptom_states_updated_at ON symptom_states (updated_at)")
+
+    def _sweep(self, conn, now):
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM symptom_states WHERE updated_at < ?", (now - self.ttl_seconds,))
+        if self.max_sessions:
+            conn.execute(
+                "DELETE FROM symptom_states WHERE session_id NOT IN (SELECT session_id FROM symptom_states ORDER BY updated_at DESC LIMIT ?)",
+                (self.max_sessions,)
+            )
+
+    def _get(self, conn, session_id, now):
+        row = conn.execute("SELECT state, updated_at FROM symptom_states WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+            return None
+        return json.loads(row[0])
+
+    def get(self, session_id) -> Optional[Dict[str, Any]]:
+        with SQLiteTransaction(self.path) as conn:
+            return self._get(conn, session_id, time.time())
+
+    def update(self, session_id, symptoms_summary) -> Dict[str, Any]:
+        now = time.time()
+        with SQLiteTransaction(self.path) as conn:
+            # Lock the database for the read-modify-write, two workers may update the same session.
+            conn.execute("BEGIN IMMEDIATE")
+            state = merge_symptoms(self._get(conn, session_id, now) or new_symptom_state(), symptoms_summary)
+            conn.execute(
+                "INSERT INTO symptom_states (session_id, state, updated_at) VALUES (?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (session_id, json.dumps(state), state["updated_at"])
+            )
+            if now - self._last_sweep > self.sweep_interval:
+                self._last_sweep = now
+                self._sweep(conn, now)
+        return state
+
+    def clear(self, session_id):
+        with SQLiteTransaction(self.path) as conn:
+            conn.execute("DELETE FROM symptom_states WHERE session_id = ?", (session_id,))
+
+def create_symptom_state_store(backend="memory", path=None, **kwargs):
+    """
+    [ENG]: Create the symptom state store with the same backend as the local chat sessions (see `create_session_store`).
+    [IDN]: Membuat penyimpanan state gejala dengan backend yang sama dengan sesi chat lokal (lihat `create_session_store`).
+    """
+    if backend == "sqlite":
+        logging.info(f"Symptom states stored in SQLite: {path}")
+        return SQLiteSymptomStateStore(path, **kwargs)
+    return MemorySymptomStateStore(**kwargs)
@@ -24,7 +24,7 @@ question= "Anda seorang dokter. Anda bertugas untuk diagnosis penyakit berdasark
 session_id = "123"
 mode = "graph_vector_fulltext"
 document_names = "[]"
-print(QA_RAG(graph, model, question, document_names, session_id, mode, write_access=True))
+print(QA_RAG(uri, userName, password, database, model, question, document_names, session_id, mode, write_access=True))
 
 from src.QA_integration import *
 # initialize_neo4j_vector(graph, get_chat_mode_settings(mode))
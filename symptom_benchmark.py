@@ -0,0 +1,112 @@
+"""
+[ENG]: Accuracy and latency benchmark of the /check-symptoms classifier tiers on a labelled set of patient messages.
+[IDN]: Benchmark akurasi dan latensi dari tingkat classifier /check-symptoms pada kumpulan pesan pasien berlabel.
+
+Usage: python symptom_benchmark.py [--model groq_llama3_70b]
+Without --model only the local tiers run, undecided messages count as undecided instead of asking the LLM.
+"""
+import os
+import time
+import argparse
+import statistics
+from dotenv import load_dotenv
+from src.shared.utils import load_embedding_model
+from src.symptom_classifier import EmbeddingSymptomClassifier, classify_symptom_message
+
+load_dotenv()
+
+# (message, previous doctor question, is about symptoms)
+LABELLED_MESSAGES = [
+    ("Dok, kepala saya pusing sejak kemarin", None, True),
+    ("Akhir-akhir ini saya ngerasa kepala sering nggeliyeng", None, True),
+    ("Saya demam tinggi dan menggigil", None, True),
+    ("Batuk saya tidak sembuh-sembuh sudah dua minggu", None, True),
+    ("Perut saya mules terus dari pagi", None, True),
+    ("Anak saya muntah dan diare", None, True),
+    ("Badan rasanya lemas sekali", None, True),
+    ("Kulit saya gatal-gatal dan merah", None, True),
+    ("Saya susah tidur akhir-akhir ini", None, True),
+    ("Napas saya sering terasa sesak", None, True),
+    ("Tenggorokan saya sakit kalau menelan", None, True),
+    ("Kaki saya bengkak", None, True),
+    ("I have had a headache for three days", None, True),
+    ("My stomach hurts after eating", None, True),
+    ("I feel nauseous and tired", None, True),
+    ("Iya dok", "Apakah Anda juga merasa mual?", True),
+    ("Sudah 3 hari", "Sejak kapan Anda merasakan pusing?", True),
+    ("Tidak dok", "Apakah ada demam?", True),
+    ("Kadang-kadang", "Apakah batuknya berdahak?", True),
+    ("Yes", "Do you also have a fever?", True),
+    ("Rasanya seperti ditusuk-tusuk", "Bagaimana rasa nyerinya?", True),
+    ("Saya sering haus dan kencing terus", None, True),
+    ("Penglihatan saya kabur kalau membaca", None, True),
+    ("Halo dok", None, False),
+    ("Selamat pagi dokter", None, False),
+    ("Terima kasih dok", None, False),
+    ("Oke, makasih ya", None, False),
+    ("Siapa nama Anda?", None, False),
+    ("Berapa biaya konsultasi di sini?", None, False),
+    ("Rumah sakit terdekat di mana ya?", None, False),
+    ("Jam berapa klinik buka?", None, False),
+    ("Bagaimana cara ganti password akun saya?", None, False),
+    ("Hello, good morning", None, False),
+    ("Thank you doctor", None, False),
+    ("What time is it?", None, False),
+    ("Saya mau daftar untuk besok", None, False),
+    ("Bisa bayar pakai BPJS?", None, False),
+    ("Sampai jumpa dok", None, False),
+    # Words that contain or are a symptom term without being a complaint.
+    ("I'm fluent in English", None, False),
+    ("I like painting on weekends", None, False),
+    ("It's cold outside", None, False),
+    ("Where did I leave my sweater?", None, False),
+    ("Chilling at home today", None, False),
+    ("Saya mau beli obat sakit kepala untuk stok", None, False),
+]
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))] if values else 0.0
+
+def run(name, embedding_classifier=None, llm_classifier=None):
+    decided, correct, latencies, tiers = 0, 0, [], {}
+    for message, previous, expected in LABELLED_MESSAGES:
+        result = classify_symptom_message(message, previous, embedding_classifier, llm_classifier)
+        latencies.append(result["latency"])
+        tiers[result["tier"]] = tiers.get(result["tier"], 0) + 1
+        if result["tier"] is not None:
+            decided += 1
+            correct += result["is_symptoms"] == expected
+    total = len(LABELLED_MESSAGES)
+    print(f"{name}")
+    print(f"  decided:  {decided}/{total} ({decided / total:.0%})  tiers: {tiers}")
+    print(f"  accuracy: {correct}/{decided} ({(correct / decided if decided else 0):.0%}) of the decided messages")
+    print(f"  latency:  p50 {percentile(latencies, 0.5) * 1000:.1f} ms  p95 {percentile(latencies, 0.95) * 1000:.1f} ms  mean {statistics.mean(latencies) * 1000:.1f} ms")
+
+def run_llm_only(name, llm_classifier):
+    correct, latencies = 0, []
+    for message, previous, expected in LABELLED_MESSAGES:
+        start_time = time.time()
+        correct += llm_classifier(message, previous) == expected
+        latencies.append(time.time() - start_time)
+    total = len(LABELLED_MESSAGES)
+    print(f"{name}")
+    print(f"  accuracy: {correct}/{total} ({correct / total:.0%})")
+    print(f"  latency:  p50 {percentile(latencies, 0.5) * 1000:.1f} ms  p95 {percentile(latencies, 0.95) * 1000:.1f} ms  mean {statistics.mean(latencies) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="LLM used as the last tier and as the LLM-only baseline")
+    args = parser.parse_args()
+
+    embeddings, _ = load_embedding_model(os.getenv("EMBEDDING_MODEL", "huggingface"))
+    embedding_classifier = EmbeddingSymptomClassifier(embeddings)
+    embedding_classifier.prototypes()
+
+    run("lexicon")
+    run("lexicon + embedding", embedding_classifier)
+    if args.model:
+        from src.chat_interaction import llm_check_if_chat_is_symptoms
+        llm_classifier = lambda message, previous: llm_check_if_chat_is_symptoms(message, args.model, previous)
+        run("lexicon + embedding + llm", embedding_classifier, llm_classifier)
+        run_llm_only("llm only (previous /check-symptoms)", llm_classifier)